@@ -0,0 +1,130 @@
+import os
+import weakref
+from typing import Optional
+
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from cache import response_cache
+from orm_models import Affiliation, Character, Person, Species
+
+# Characters of one affiliation, by name (GET /procedure/characters_by_affiliation/{name}).
+#
+#   AFFILIATION_LOOKUP=query       # default: portable SELECT, any database
+#   AFFILIATION_LOOKUP=procedure   # CALL GetCharactersByAffiliation (MySQL, setup_procedure.sql)
+#
+# "query" resolves the name to its affiliation row once, through the
+# response cache (namespace "affiliations", so a write to affiliations
+# drops it). It then runs BY_AFFILIATION: one SELECT built at import time
+# with bound parameters, so SQLAlchemy compiles it once per dialect and
+# reuses the compiled form for every request. The WHERE affiliation_id = ?
+# AND character_id > ? ORDER BY character_id seeks
+# idx_characters_affiliation_cover and stops after one page. The
+# affiliation columns come from the cached row, so there is no join on
+# affiliations.
+#
+# "procedure" keeps the original stored procedure. It returns every
+# character of the affiliation, so pages are cut in Python.
+# benchmarks/bench_affiliation.py times both backends and prints the
+# setting to use, and stats(): hits / misses of the name cache and of the
+# compiled BY_AFFILIATION statement.
+
+BACKEND = os.getenv("AFFILIATION_LOOKUP", "query").strip().lower()
+
+BY_AFFILIATION = (
+    select(
+        Character.character_id,
+        Character.name.label("character_name"),
+        Person.name.label("person_name"),
+        Person.birth_year,
+        Person.role_type,
+        Species.name.label("species_name"),
+        Species.classification,
+    )
+    .join(Person, Character.person_id == Person.person_id)
+    .join(Species, Character.species_id == Species.species_id)
+    .where(Character.affiliation_id == bindparam("affiliation_id"),
+           Character.character_id > bindparam("after"))
+    .order_by(Character.character_id)
+    .limit(bindparam("limit"))
+)
+
+AFFILIATION_BY_NAME = select(Affiliation.affiliation_id, Affiliation.name, Affiliation.description) \
+    .where(Affiliation.name == bindparam("name"))
+
+CALL_PROCEDURE = text("CALL GetCharactersByAffiliation(:aff_name)")
+
+
+class ProcedureUnavailable(RuntimeError):
+    pass
+
+
+class LookupStats:
+    """Hit / miss counters of the two caches the "query" backend relies on"""
+
+    def __init__(self):
+        self.resolved = 0
+        self.name_misses = 0
+        self.executed = 0
+        self._compiled = weakref.WeakSet()  # compiled forms of BY_AFFILIATION seen so far
+
+    def statement(self, compiled):
+        self.executed += 1
+        self._compiled.add(compiled)
+
+    def as_dict(self) -> dict:
+        compiles = len(self._compiled)
+        return {
+            "name_cache": {"hits": self.resolved - self.name_misses, "misses": self.name_misses},
+            "compiled_statement": {"hits": self.executed - compiles, "misses": compiles},
+        }
+
+
+_stats = LookupStats()
+
+
+def stats() -> dict:
+    """Name cache and compiled-statement cache hits / misses of this process"""
+    return _stats.as_dict()
+
+
+def resolve(db, name: str) -> Optional[dict]:
+    """{affiliation_id, name, description} for an affiliation name (cached), or None"""
+    def load():
+        _stats.name_misses += 1
+        row = db.execute(AFFILIATION_BY_NAME, {"name": name}).first()
+        return row._asdict() if row else None
+
+    _stats.resolved += 1
+    return response_cache.get_or_load("affiliations", f"by-name:{name}", load)
+
+
+def _by_query(db, affiliation: dict, after: int, limit: int):
+    result = db.connection().execute(BY_AFFILIATION, {
+        "affiliation_id": affiliation["affiliation_id"], "after": after, "limit": limit,
+    })
+    # the same compiled object again = SQLAlchemy's compiled cache was hit
+    _stats.statement(result.context.compiled)
+    rows = result.mappings().all()
+    return [{**row, "affiliation_name": affiliation["name"], "description": affiliation["description"]}
+            for row in rows]
+
+
+def _by_procedure(db, affiliation: dict, after: int, limit: int):
+    try:
+        rows = db.execute(CALL_PROCEDURE, {"aff_name": affiliation["name"]}).mappings().all()
+    except SQLAlchemyError as e:
+        raise ProcedureUnavailable(
+            f"GetCharactersByAffiliation unavailable (MySQL only; run setup_procedure.sql first): {e}"
+        )
+    return [dict(row) for row in rows if row["character_id"] > after][:limit]
+
+
+BACKENDS = {"query": _by_query, "procedure": _by_procedure}
+if BACKEND not in BACKENDS:
+    raise ValueError(f"AFFILIATION_LOOKUP must be one of {', '.join(BACKENDS)}, not {BACKEND!r}")
+
+
+def characters_by_affiliation(db, affiliation: dict, after: int, limit: int, backend: str = None):
+    """Up to `limit` rows after character_id `after`, in the stored procedure's column layout"""
+    return BACKENDS[backend or BACKEND](db, affiliation, after, limit)
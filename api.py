@@ -1,12 +1,37 @@
-from fastapi import FastAPI, Depends, HTTPException
+import datetime
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Response, WebSocket
+from fastapi.responses import PlainTextResponse
+from fastapi.sse import EventSourceResponse, ServerSentEvent
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from database import SessionLocal, engine
-from orm_models import Base, Franchise, Film, TVSeries, Book, Species, Affiliation, Person, Character, Planet, Game
-from pydantic import BaseModel
-from typing import Optional
-
-Base.metadata.create_all(bind=engine)
+from database import Base, SessionLocal, engine
+from orm_models import Franchise, Film, TVSeries, Book, Species, Affiliation, Person, Character, Planet, Game, CharacterOverview
+from pydantic import BaseModel, ConfigDict
+from typing import Generic, List, Optional, TypeVar
+from pagination import Page, PageParams, paginate, page_envelope
+from filters import ListQuery, list_query
+from export import export_format, export_response, export_table
+from api_async import AsyncResource, build_async_router
+from pool_metrics import pool_snapshot, prometheus_text
+from cache import response_cache
+from etag import conditional_get, table_versions
+from batch import BatchResource, build_batch_router
+from replicas import ReplicaRoutingMiddleware, current_bind, replica_set
+import affiliation_lookup
+import changes
+import materialized
+import profiling
+import startup
+from serialization import fast_json, fetch_row
+from expand import expand_param, fetch_expanded
+from graphql_api import build_graphql_router, graphql_available
+import blobs
+import search
+import snapshot
+import stats
 
 description_text = """
 ## Star Wars Database API
@@ -17,6 +42,7 @@ app = FastAPI(
     title="Star Wars Database API",
     description=description_text,
     version="1.0.0",
+    lifespan=startup.lifespan,
     openapi_tags=[
         {"name": "People", "description": "Manage people - START HERE to create characters"},
         {"name": "Species", "description": "Manage species (Human, Twi'lek, etc.)"},
@@ -29,19 +55,83 @@ app = FastAPI(
         {"name": "TV Series", "description": "Manage TV series"},
         {"name": "Books", "description": "Manage books"},
         {"name": "Games", "description": "Manage video games"},
+        {"name": "Stats", "description": "Dashboard aggregates (box office, releases per year, counts) from the stats_rollup table"},
+        {"name": "Search", "description": "Prefix / typo-tolerant search over names and titles"},
+        {"name": "Changes", "description": "Change feed: what changed since version N (poll, SSE or WebSocket)"},
+        {"name": "GraphQL", "description": "POST /graphql - fetch exactly the graph you need (needs graphql-core)"},
+        {"name": "Metrics", "description": "Operational metrics (connection pool, ...)"},
     ]
 )
+# GETs to read replicas when DATABASE_REPLICA_URLS is set (replicas.py)
+app.add_middleware(ReplicaRoutingMiddleware)
+# Server-Timing + per-route histograms when REQUEST_PROFILING=1 (profiling.py);
+# added last so it is the outermost middleware
+if profiling.ENABLED:
+    app.router.route_class = profiling.TimedRoute
+    app.add_middleware(profiling.ProfilingMiddleware)
 
 # After populate.py: uvicorn api:app --reload
+# Several workers: python starwars.py serve, or uvicorn --workers N with
+# CACHE_BACKEND=redis (cache.py)
+# Schema is not created here; run `python starwars.py init-db` (see startup.py)
 
 # ------------ helper ------------
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(bind=current_bind())  # primary, or a replica for GETs (replicas.py)
     try:
         yield db
     finally:
         db.close()
 
+def record_write(table: str):
+    """Call after every commit that changes `table`: drops cached reads and
+    bumps the version behind the ETag / Last-Modified validators"""
+    response_cache.invalidate(table)
+    table_versions.bump(table)
+    changes.feed.notify()  # open /changes streams poll change_log now
+
+# table -> tables with a foreign key to it. Deleting a parent row through
+# the ORM sets those keys to NULL (films.franchise_id, characters.person_id,
+# ...), so the child tables changed too.
+def child_tables() -> dict:
+    children = {}
+    for table in Base.metadata.tables.values():
+        for fk in table.foreign_keys:
+            children.setdefault(fk.column.table.name, []).append(table.name)
+    return children
+
+CHILD_TABLES = child_tables()
+
+def record_delete(table: str, pk_value: int):
+    """record_write after deleting one row of `table`, children included"""
+    record_write(table)
+    blobs.blob_store.discard(table, pk_value)
+    for child in CHILD_TABLES.get(table, ()):
+        record_write(child)  # cached child rows hold the old foreign key
+        blobs.blob_store.drop(child)
+
+def snapshot_row(table: str, pk_value: int, label: str, expand=()):
+    """get-by-id from the in-memory snapshot (SNAPSHOT_MODE=1, snapshot.py)"""
+    row = snapshot.store.get(table, pk_value, expand)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"{label} not found")
+    return row
+
+def record_bulk_write(table: str, deleted: bool = False, children: Optional[List[str]] = None):
+    """record_write for the batch and /async routers, which do not pass row ids.
+
+    children: tables changed along with `table` (batch deletes report the
+    ones whose foreign keys they set to NULL); default: every child table
+    of a deleted row.
+    """
+    record_write(table)
+    blobs.blob_store.drop(table)
+    if children is None:
+        children = CHILD_TABLES.get(table, ()) if deleted else ()
+    for child in children:
+        record_write(child)
+        blobs.blob_store.drop(child)
+
 # ------------ Pydantic Models for POST/PUT ------------
 class CharacterCreate(BaseModel):
     name: str
@@ -77,28 +167,217 @@ class FilmCreate(BaseModel):
     rating: str
     box_office: int
 
+class FilmUpdate(BaseModel):
+    rating: Optional[str] = None
+    box_office: Optional[int] = None
+
 class PlanetCreate(BaseModel):
     name: str
     region: Optional[str] = None
     climate: Optional[str] = None
 
+# ------------ Pydantic Models for responses ------------
+# Documentation of what GET/POST/PUT return. List and get-by-id routes hand
+# back plain dicts through serialization.fast_json (no validation pass), so
+# everything but the primary key is Optional: ?fields may leave it out.
+class OutModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+class PersonOut(OutModel):
+    person_id: int
+    name: Optional[str] = None
+    birth_year: Optional[str] = None
+    role_type: Optional[str] = None
+
+class SpeciesOut(OutModel):
+    species_id: int
+    name: Optional[str] = None
+    classification: Optional[str] = None
+
+class AffiliationOut(OutModel):
+    affiliation_id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+
+class CharacterOut(OutModel):
+    character_id: int
+    name: Optional[str] = None
+    person_id: Optional[int] = None
+    species_id: Optional[int] = None
+    affiliation_id: Optional[int] = None
+
+class FranchiseOut(OutModel):
+    franchise_id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    start_year: Optional[int] = None
+
+class FilmOut(OutModel):
+    film_id: int
+    franchise_id: Optional[int] = None
+    rating: Optional[str] = None
+    box_office: Optional[int] = None
+
+class TVSeriesOut(OutModel):
+    series_id: int
+    franchise_id: Optional[int] = None
+    title: Optional[str] = None
+    start_year: Optional[int] = None
+    end_year: Optional[int] = None
+    num_seasons: Optional[int] = None
+
+class BookOut(OutModel):
+    book_id: int
+    franchise_id: Optional[int] = None
+    title: Optional[str] = None
+    publication_year: Optional[int] = None
+    author: Optional[str] = None
+
+class GameOut(OutModel):
+    game_id: int
+    franchise_id: Optional[int] = None
+    title: Optional[str] = None
+    release_year: Optional[int] = None
+    developer: Optional[str] = None
+
+class PlanetOut(OutModel):
+    planet_id: int
+    name: Optional[str] = None
+    region: Optional[str] = None
+    climate: Optional[str] = None
+
+# GET responses with ?expand= (expand.py); POST/PUT return the plain models
+class CharacterExpandedOut(CharacterOut):
+    person: Optional[PersonOut] = None
+    species: Optional[SpeciesOut] = None
+    affiliation: Optional[AffiliationOut] = None
+
+class FranchiseExpandedOut(FranchiseOut):
+    films: Optional[List[FilmOut]] = None
+    tv_series: Optional[List[TVSeriesOut]] = None
+    books: Optional[List[BookOut]] = None
+    games: Optional[List[GameOut]] = None
+
+class CharacterOverviewOut(OutModel):
+    character_id: int
+    character_name: Optional[str] = None
+    person_name: Optional[str] = None
+    birth_year: Optional[str] = None
+    role_type: Optional[str] = None
+    species_name: Optional[str] = None
+    classification: Optional[str] = None
+    affiliation_name: Optional[str] = None
+    description: Optional[str] = None
+
+class CharacterDetailedOut(OutModel):
+    character_id: int
+    character_name: Optional[str] = None
+    person_name: Optional[str] = None
+    birth_year: Optional[str] = None
+    role_type: Optional[str] = None
+    species_name: Optional[str] = None
+    classification: Optional[str] = None
+    affiliation_name: Optional[str] = None
+    affiliation_description: Optional[str] = None
+
+S = TypeVar("S")
+
+class StatsOut(BaseModel, Generic[S]):
+    source: str
+    items: List[S]
+
+class BoxOfficeStat(BaseModel):
+    franchise_id: Optional[int] = None
+    franchise: Optional[str] = None
+    rating: Optional[str] = None
+    films: int
+    box_office: int
+    share: Optional[float] = None
+    rank: int
+
+class ReleaseStat(BaseModel):
+    kind: str
+    year: Optional[int] = None
+    releases: int
+    cumulative: int
+
+class SeasonStat(BaseModel):
+    franchise_id: Optional[int] = None
+    franchise: Optional[str] = None
+    series: int
+    seasons: int
+    share: Optional[float] = None
+
+class CharacterStat(BaseModel):
+    affiliation_id: Optional[int] = None
+    affiliation: Optional[str] = None
+    species_id: Optional[int] = None
+    species: Optional[str] = None
+    characters: int
+    share: Optional[float] = None
+    rank: int
+
+class SearchHit(BaseModel):
+    type: str
+    id: int
+    title: Optional[str] = None
+    extra: Optional[str] = None
+    score: float
+    path: str
+
+class SearchResults(BaseModel):
+    query: str
+    items: List[SearchHit]
+    corrections: dict
+
+class ChangeOut(BaseModel):
+    version: int
+    entity: str
+    pk: int
+    op: str
+    changed_at: datetime.datetime
+
+class ChangesPage(BaseModel):
+    changes: List[ChangeOut]
+    next: int
+    has_more: bool
+    latest: int
+
+# ------------ Batch endpoints (/<resource>/batch) ------------
+# Registered before the /{id} routes so PUT/DELETE /x/batch is not taken
+# for an id.
+if startup.API_BATCH_ROUTES:
+    app.include_router(build_batch_router([
+        BatchResource("/people", "People", Person, PersonCreate, PersonCreate),
+        BatchResource("/species", "Species", Species, SpeciesCreate, SpeciesCreate, ("name",)),
+        BatchResource("/affiliations", "Affiliations", Affiliation, AffiliationCreate, AffiliationCreate, ("name",)),
+        BatchResource("/characters", "Characters", Character, CharacterCreate, CharacterUpdate, ("name", "species_id")),
+        BatchResource("/franchise", "Franchise", Franchise, FranchiseCreate, FranchiseCreate, ("name",)),
+        BatchResource("/films", "Films", Film, FilmCreate, FilmUpdate),
+        BatchResource("/planets", "Planets", Planet, PlanetCreate, PlanetCreate, ("name",)),
+    ], get_db, on_write=record_bulk_write))
+
 # =============================================================
 # PEOPLE - Foundation table (no dependencies)
 # =============================================================
-@app.get("/people", tags=["People"], summary="List all people")
-def get_all_people(db: Session = Depends(get_db)):
+@app.get("/people", tags=["People"], response_model=Page[PersonOut], summary="List all people", dependencies=[Depends(conditional_get("people"))])
+def get_all_people(response: Response, page: PageParams = Depends(), listing: ListQuery = Depends(list_query(Person)), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
     """**READ** - Get all people in the database"""
-    return db.query(Person).order_by(Person.person_id).all()
+    if fmt:
+        return export_table(Person, Person.person_id, fmt, page.after_pk, listing)
+    return fast_json(listing.paginate(db, page), response)
 
-@app.get("/people/{person_id}", tags=["People"], summary="Get one person")
-def get_person(person_id: int, db: Session = Depends(get_db)):
+@app.get("/people/{person_id}", tags=["People"], response_model=PersonOut, summary="Get one person", dependencies=[Depends(conditional_get("people"))])
+def get_person(person_id: int, response: Response, db: Session = Depends(get_db)):
     """**READ** - Get specific person by ID"""
-    person = db.query(Person).filter_by(person_id=person_id).first()
-    if not person:
-        raise HTTPException(status_code=404, detail="Person not found")
-    return person
+    def load():
+        person = fetch_row(db, Person, person_id)
+        if not person:
+            raise HTTPException(status_code=404, detail="Person not found")
+        return person
+    return blobs.respond("people", person_id, load, response)
 
-@app.post("/people", tags=["People"], summary="Create new person")
+@app.post("/people", tags=["People"], response_model=PersonOut, summary="Create new person")
 def create_person(person: PersonCreate, db: Session = Depends(get_db)):
     """**CREATE** - Add new person (do this FIRST before creating characters)
     
@@ -114,10 +393,11 @@ def create_person(person: PersonCreate, db: Session = Depends(get_db)):
     new_person = Person(**person.dict())
     db.add(new_person)
     db.commit()
+    record_write("people")
     db.refresh(new_person)
     return new_person
 
-@app.put("/people/{person_id}", tags=["People"], summary="Update person")
+@app.put("/people/{person_id}", tags=["People"], response_model=PersonOut, summary="Update person")
 def update_person(person_id: int, person: PersonCreate, db: Session = Depends(get_db)):
     """**UPDATE** - Modify existing person"""
     db_person = db.query(Person).filter_by(person_id=person_id).first()
@@ -132,6 +412,8 @@ def update_person(person_id: int, person: PersonCreate, db: Session = Depends(ge
         db_person.role_type = person.role_type
     
     db.commit()
+    record_write("people")
+    blobs.blob_store.discard("people", person_id)
     db.refresh(db_person)
     return db_person
 
@@ -143,34 +425,47 @@ def delete_person(person_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Person not found")
     db.delete(person)
     db.commit()
+    record_delete("people", person_id)
     return {"status": "deleted", "person_id": person_id}
 
 # =============================================================
 # 2. SPECIES - Foundation table (no dependencies)
 # =============================================================
-@app.get("/species", tags=["Species"])
-def get_all_species(db: Session = Depends(get_db)):
+@app.get("/species", tags=["Species"], response_model=Page[SpeciesOut], dependencies=[Depends(conditional_get("species"))])
+def get_all_species(response: Response, page: PageParams = Depends(), listing: ListQuery = Depends(list_query(Species)), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
     """READ - Get all species"""
-    return db.query(Species).order_by(Species.species_id).all()
+    if fmt:
+        return export_table(Species, Species.species_id, fmt, page.after_pk, listing)
+    if snapshot.ENABLED:
+        return fast_json(snapshot.store.page("species", listing, page), response)
+    return fast_json(response_cache.get_or_load(
+        "species", f"list:{listing.cache_key}",
+        lambda: listing.paginate(db, page)
+    ), response)
 
-@app.get("/species/{species_id}", tags=["Species"])
-def get_species(species_id: int, db: Session = Depends(get_db)):
+@app.get("/species/{species_id}", tags=["Species"], response_model=SpeciesOut, dependencies=[Depends(conditional_get("species"))])
+def get_species(species_id: int, response: Response, db: Session = Depends(get_db)):
     """READ - Get specific species"""
-    species = db.query(Species).filter_by(species_id=species_id).first()
-    if not species:
-        raise HTTPException(status_code=404, detail="Species not found")
-    return species
+    if snapshot.ENABLED:
+        return blobs.respond("species", species_id, lambda: snapshot_row("species", species_id, "Species"), response)
+    def load():
+        species = fetch_row(db, Species, species_id)
+        if not species:
+            raise HTTPException(status_code=404, detail="Species not found")
+        return species
+    return blobs.respond("species", species_id, lambda: response_cache.get_or_load("species", f"id:{species_id}", load), response)
 
-@app.post("/species", tags=["Species"])
+@app.post("/species", tags=["Species"], response_model=SpeciesOut)
 def create_species(species: SpeciesCreate, db: Session = Depends(get_db)):
     """CREATE - Add new species"""
     new_species = Species(**species.dict())
     db.add(new_species)
     db.commit()
+    record_write("species")
     db.refresh(new_species)
     return new_species
 
-@app.put("/species/{species_id}", tags=["Species"])
+@app.put("/species/{species_id}", tags=["Species"], response_model=SpeciesOut)
 def update_species(species_id: int, species: SpeciesCreate, db: Session = Depends(get_db)):
     """UPDATE - Modify existing species"""
     db_species = db.query(Species).filter_by(species_id=species_id).first()
@@ -183,6 +478,8 @@ def update_species(species_id: int, species: SpeciesCreate, db: Session = Depend
         db_species.classification = species.classification
     
     db.commit()
+    record_write("species")
+    blobs.blob_store.discard("species", species_id)
     db.refresh(db_species)
     return db_species
 
@@ -194,34 +491,47 @@ def delete_species(species_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Species not found")
     db.delete(species)
     db.commit()
+    record_delete("species", species_id)
     return {"status": "deleted", "species_id": species_id}
 
 # =============================================================
 # 3. AFFILIATIONS - Foundation table (no dependencies)
 # =============================================================
-@app.get("/affiliations", tags=["Affiliations"])
-def get_all_affiliations(db: Session = Depends(get_db)):
+@app.get("/affiliations", tags=["Affiliations"], response_model=Page[AffiliationOut], dependencies=[Depends(conditional_get("affiliations"))])
+def get_all_affiliations(response: Response, page: PageParams = Depends(), listing: ListQuery = Depends(list_query(Affiliation)), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
     """READ - Get all affiliations"""
-    return db.query(Affiliation).order_by(Affiliation.affiliation_id).all()
+    if fmt:
+        return export_table(Affiliation, Affiliation.affiliation_id, fmt, page.after_pk, listing)
+    if snapshot.ENABLED:
+        return fast_json(snapshot.store.page("affiliations", listing, page), response)
+    return fast_json(response_cache.get_or_load(
+        "affiliations", f"list:{listing.cache_key}",
+        lambda: listing.paginate(db, page)
+    ), response)
 
-@app.get("/affiliations/{affiliation_id}", tags=["Affiliations"])
-def get_affiliation(affiliation_id: int, db: Session = Depends(get_db)):
+@app.get("/affiliations/{affiliation_id}", tags=["Affiliations"], response_model=AffiliationOut, dependencies=[Depends(conditional_get("affiliations"))])
+def get_affiliation(affiliation_id: int, response: Response, db: Session = Depends(get_db)):
     """READ - Get specific affiliation"""
-    affiliation = db.query(Affiliation).filter_by(affiliation_id=affiliation_id).first()
-    if not affiliation:
-        raise HTTPException(status_code=404, detail="Affiliation not found")
-    return affiliation
+    if snapshot.ENABLED:
+        return blobs.respond("affiliations", affiliation_id, lambda: snapshot_row("affiliations", affiliation_id, "Affiliation"), response)
+    def load():
+        affiliation = fetch_row(db, Affiliation, affiliation_id)
+        if not affiliation:
+            raise HTTPException(status_code=404, detail="Affiliation not found")
+        return affiliation
+    return blobs.respond("affiliations", affiliation_id, lambda: response_cache.get_or_load("affiliations", f"id:{affiliation_id}", load), response)
 
-@app.post("/affiliations", tags=["Affiliations"])
+@app.post("/affiliations", tags=["Affiliations"], response_model=AffiliationOut)
 def create_affiliation(affiliation: AffiliationCreate, db: Session = Depends(get_db)):
     """CREATE - Add new affiliation"""
     new_affiliation = Affiliation(**affiliation.dict())
     db.add(new_affiliation)
     db.commit()
+    record_write("affiliations")
     db.refresh(new_affiliation)
     return new_affiliation
 
-@app.put("/affiliations/{affiliation_id}", tags=["Affiliations"])
+@app.put("/affiliations/{affiliation_id}", tags=["Affiliations"], response_model=AffiliationOut)
 def update_affiliation(affiliation_id: int, affiliation: AffiliationCreate, db: Session = Depends(get_db)):
     """UPDATE - Modify existing affiliation"""
     db_affiliation = db.query(Affiliation).filter_by(affiliation_id=affiliation_id).first()
@@ -234,6 +544,8 @@ def update_affiliation(affiliation_id: int, affiliation: AffiliationCreate, db:
         db_affiliation.description = affiliation.description
     
     db.commit()
+    record_write("affiliations")
+    blobs.blob_store.discard("affiliations", affiliation_id)
     db.refresh(db_affiliation)
     return db_affiliation
 
@@ -245,34 +557,47 @@ def delete_affiliation(affiliation_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Affiliation not found")
     db.delete(affiliation)
     db.commit()
+    record_delete("affiliations", affiliation_id)
     return {"status": "deleted", "affiliation_id": affiliation_id}
 
 # =============================================================
 # 4. CHARACTERS - Requires person_id, species_id, affiliation_id
 # =============================================================
-@app.get("/characters", tags=["Characters"])
-def get_all_characters(db: Session = Depends(get_db)):
-    """READ - Get all characters"""
-    return db.query(Character).order_by(Character.character_id).all()
-
-@app.get("/characters/{character_id}", tags=["Characters"])
-def get_character(character_id: int, db: Session = Depends(get_db)):
-    """READ - Get specific character"""
-    character = db.query(Character).filter_by(character_id=character_id).first()
-    if not character:
-        raise HTTPException(status_code=404, detail="Character not found")
-    return character
+@app.get("/characters", tags=["Characters"], response_model=Page[CharacterExpandedOut], dependencies=[Depends(conditional_get("characters", expandable=Character))])
+def get_all_characters(response: Response, page: PageParams = Depends(), listing: ListQuery = Depends(list_query(Character)), expand: List[str] = Depends(expand_param(Character)), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
+    """READ - Get all characters (?expand=person,species,affiliation)"""
+    if fmt:
+        return export_table(Character, Character.character_id, fmt, page.after_pk, listing)
+    return fast_json(listing.paginate(db, page, expand), response)
 
-@app.post("/characters", tags=["Characters"])
+@app.get("/characters/{character_id}", tags=["Characters"], response_model=CharacterExpandedOut, dependencies=[Depends(conditional_get("characters", expandable=Character))])
+def get_character(character_id: int, response: Response, expand: List[str] = Depends(expand_param(Character)), db: Session = Depends(get_db)):
+    """READ - Get specific character (?expand=person,species,affiliation)"""
+    if expand:
+        # not stored in blobs: writes to the related tables would not invalidate it
+        character = fetch_expanded(db, Character, character_id, expand)
+        if not character:
+            raise HTTPException(status_code=404, detail="Character not found")
+        return fast_json(character, response)
+
+    def load():
+        character = fetch_row(db, Character, character_id)
+        if not character:
+            raise HTTPException(status_code=404, detail="Character not found")
+        return character
+    return blobs.respond("characters", character_id, load, response)
+
+@app.post("/characters", tags=["Characters"], response_model=CharacterOut)
 def create_character(character: CharacterCreate, db: Session = Depends(get_db)):
     """CREATE - Add new character (create person/species/affiliation first!)"""
     new_char = Character(**character.dict())
     db.add(new_char)
     db.commit()
+    record_write("characters")
     db.refresh(new_char)
     return new_char
 
-@app.put("/characters/{character_id}", tags=["Characters"])
+@app.put("/characters/{character_id}", tags=["Characters"], response_model=CharacterOut)
 def update_character(character_id: int, character: CharacterUpdate, db: Session = Depends(get_db)):
     """UPDATE - Modify existing character"""
     db_char = db.query(Character).filter_by(character_id=character_id).first()
@@ -287,6 +612,8 @@ def update_character(character_id: int, character: CharacterUpdate, db: Session
         db_char.affiliation_id = character.affiliation_id
     
     db.commit()
+    record_write("characters")
+    blobs.blob_store.discard("characters", character_id)
     db.refresh(db_char)
     return db_char
 
@@ -298,15 +625,45 @@ def delete_character(character_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Character not found")
     db.delete(character)
     db.commit()
+    record_delete("characters", character_id)
     return {"status": "deleted", "character_id": character_id}
 
 # =============================================================
 # 5. ADVANCED QUERIES
 # =============================================================
-@app.get("/characters/detailed/all", tags=["Advanced Queries"])
-def get_detailed_characters(db: Session = Depends(get_db)):
-    """MULTIPLE JOINS - Character -> Person -> Species -> Affiliation"""
-    results = db.query(
+@app.get("/characters/detailed/all", tags=["Advanced Queries"], response_model=Page[CharacterDetailedOut], dependencies=[Depends(conditional_get("characters", "people", "species", "affiliations"))])
+def get_detailed_characters(response: Response, page: PageParams = Depends(), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
+    """MULTIPLE JOINS - Character -> Person -> Species -> Affiliation
+
+    Reads character_overview_mat instead when CHARACTER_OVERVIEW_MATERIALIZED=1.
+    """
+    if materialized.ENABLED:
+        pk = CharacterOverview.character_id
+        query = db.query(
+            CharacterOverview.character_id,
+            CharacterOverview.character_name,
+            CharacterOverview.person_name,
+            CharacterOverview.birth_year,
+            CharacterOverview.role_type,
+            CharacterOverview.species_name,
+            CharacterOverview.classification,
+            CharacterOverview.affiliation_name,
+            CharacterOverview.description.label('affiliation_description')
+        )
+    else:
+        pk = Character.character_id
+        query = _detailed_join(db)
+    if fmt:
+        if page.after_pk is not None:
+            query = query.filter(pk > page.after_pk)
+        return export_response(query.order_by(pk).statement, fmt, "characters_detailed")
+    result = paginate(query, pk, page)
+    # labels above already match the response keys
+    result["items"] = [r._asdict() for r in result["items"]]
+    return fast_json(result, response)
+
+def _detailed_join(db: Session):
+    return db.query(
         Character.character_id,
         Character.name.label('character_name'),
         Person.name.label('person_name'),
@@ -315,80 +672,123 @@ def get_detailed_characters(db: Session = Depends(get_db)):
         Species.name.label('species_name'),
         Species.classification,
         Affiliation.name.label('affiliation_name'),
-        Affiliation.description
+        Affiliation.description.label('affiliation_description')
     ).join(
         Person, Character.person_id == Person.person_id
     ).join(
         Species, Character.species_id == Species.species_id
     ).join(
         Affiliation, Character.affiliation_id == Affiliation.affiliation_id
-    ).order_by(Character.character_id).all()
-    
-    return [{
-        "character_id": r.character_id,
-        "character_name": r.character_name,
-        "person_name": r.person_name,
-        "birth_year": r.birth_year,
-        "role_type": r.role_type,
-        "species_name": r.species_name,
-        "classification": r.classification,
-        "affiliation_name": r.affiliation_name,
-        "affiliation_description": r.description
-    } for r in results]
-
-@app.get("/view/character_overview", tags=["Advanced Queries"])
-def get_character_overview_view(db: Session = Depends(get_db)):
-    """VIEW ACCESS - character_overview (run setup_view.sql first)"""
-    try:
-        result = db.execute(text("SELECT * FROM character_overview ORDER BY character_id"))
-        columns = result.keys()
-        rows = result.fetchall()
-        return [{col: val for col, val in zip(columns, row)} for row in rows]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"View not found. Run setup_view.sql first. Error: {str(e)}")
+    )
+
+# Columns + table for the overview endpoint, keyed by materialized.ENABLED
+VIEW_SOURCE = {
+    False: "* FROM character_overview",
+    True: f"{materialized.VIEW_COLUMNS} FROM {materialized.TABLE}",
+}
 
-@app.get("/procedure/characters_by_affiliation/{affiliation_name}", tags=["Advanced Queries"])
-def call_characters_by_affiliation(affiliation_name: str, db: Session = Depends(get_db)):
-    """STORED PROCEDURE - GetCharactersByAffiliation (run setup_procedure.sql first)"""
+@app.get("/view/character_overview", tags=["Advanced Queries"], response_model=Page[CharacterOverviewOut], dependencies=[Depends(conditional_get("characters", "people", "species", "affiliations"))])
+def get_character_overview_view(response: Response, page: PageParams = Depends(), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
+    """VIEW ACCESS - character_overview (run setup_view.sql first)
+
+    With CHARACTER_OVERVIEW_MATERIALIZED=1 the rows come from
+    character_overview_mat (run `python starwars.py overview rebuild` first).
+    """
+    source = VIEW_SOURCE[materialized.ENABLED]
     try:
+        if fmt:
+            return export_response(
+                text(f"SELECT {source} WHERE character_id > :after ORDER BY character_id"),
+                fmt, "character_overview", {"after": page.after_pk or 0}
+            )
         result = db.execute(
-            text("CALL GetCharactersByAffiliation(:aff_name)"),
-            {"aff_name": affiliation_name}
+            text(f"SELECT {source} WHERE character_id > :after "
+                 "ORDER BY character_id LIMIT :n"),
+            {"after": page.after_pk or 0, "n": page.limit + 1}
         )
-        columns = result.keys()
-        rows = result.fetchall()
-        return [{col: val for col, val in zip(columns, row)} for row in rows]
+        rows = [row._asdict() for row in result.fetchall()]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Procedure not found. Run setup_procedure.sql first. Error: {str(e)}")
+        hint = "python starwars.py overview rebuild" if materialized.ENABLED else "setup_view.sql"
+        raise HTTPException(status_code=500, detail=f"View not found. Run {hint} first. Error: {str(e)}")
+
+    next_pk = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_pk = rows[-1]["character_id"]
+    return fast_json(page_envelope(rows, next_pk, page.limit), response)
+
+@app.get("/procedure/characters_by_affiliation/{affiliation_name}", tags=["Advanced Queries"], response_model=Page[CharacterOverviewOut], dependencies=[Depends(conditional_get("characters", "people", "species", "affiliations"))])
+def call_characters_by_affiliation(affiliation_name: str, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    """Characters of one affiliation, paginated (see affiliation_lookup.py)
+
+    Portable cached query by default; AFFILIATION_LOOKUP=procedure calls the
+    GetCharactersByAffiliation stored procedure instead (MySQL, setup_procedure.sql).
+    """
+    affiliation = affiliation_lookup.resolve(db, affiliation_name)
+    if not affiliation:
+        raise HTTPException(status_code=404, detail="Affiliation not found")
+    try:
+        rows = affiliation_lookup.characters_by_affiliation(db, affiliation, page.after_pk or 0, page.limit + 1)
+    except affiliation_lookup.ProcedureUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    next_pk = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_pk = rows[-1]["character_id"]
+    return fast_json(page_envelope(rows, next_pk, page.limit), response)
 
 # =============================================================
 # 6. OTHER TABLES (Franchise, Films, TV, Books, Planets, Games)
 # =============================================================
 
 # ----------- FRANCHISE -----------
-@app.get("/franchise", tags=["Franchise"])
-def get_all_franchises(db: Session = Depends(get_db)):
-    """READ - Get all franchises"""
-    return db.query(Franchise).order_by(Franchise.franchise_id).all()
-
-@app.get("/franchise/{franchise_id}", tags=["Franchise"])
-def get_franchise(franchise_id: int, db: Session = Depends(get_db)):
-    """READ - Get specific franchise"""
-    franchise = db.query(Franchise).filter_by(franchise_id=franchise_id).first()
-    if not franchise:
-        raise HTTPException(status_code=404, detail="Franchise not found")
-    return franchise
+@app.get("/franchise", tags=["Franchise"], response_model=Page[FranchiseExpandedOut], dependencies=[Depends(conditional_get("franchise", expandable=Franchise))])
+def get_all_franchises(response: Response, page: PageParams = Depends(), listing: ListQuery = Depends(list_query(Franchise)), expand: List[str] = Depends(expand_param(Franchise)), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
+    """READ - Get all franchises (?expand=films,tv_series,books,games)"""
+    if fmt:
+        return export_table(Franchise, Franchise.franchise_id, fmt, page.after_pk, listing)
+    if snapshot.ENABLED:
+        return fast_json(snapshot.store.page("franchise", listing, page, expand), response)
+    if expand:
+        # not cached: the "franchise" namespace is not invalidated by film/game/... writes
+        return fast_json(listing.paginate(db, page, expand), response)
+    return fast_json(response_cache.get_or_load(
+        "franchise", f"list:{listing.cache_key}",
+        lambda: listing.paginate(db, page)
+    ), response)
+
+@app.get("/franchise/{franchise_id}", tags=["Franchise"], response_model=FranchiseExpandedOut, dependencies=[Depends(conditional_get("franchise", expandable=Franchise))])
+def get_franchise(franchise_id: int, response: Response, expand: List[str] = Depends(expand_param(Franchise)), db: Session = Depends(get_db)):
+    """READ - Get specific franchise (?expand=films,tv_series,books,games)"""
+    if snapshot.ENABLED:
+        if expand:
+            return fast_json(snapshot_row("franchise", franchise_id, "Franchise", expand), response)
+        return blobs.respond("franchise", franchise_id, lambda: snapshot_row("franchise", franchise_id, "Franchise"), response)
+    if expand:
+        franchise = fetch_expanded(db, Franchise, franchise_id, expand)
+        if not franchise:
+            raise HTTPException(status_code=404, detail="Franchise not found")
+        return fast_json(franchise, response)
 
-@app.post("/franchise", tags=["Franchise"])
+    def load():
+        franchise = fetch_row(db, Franchise, franchise_id)
+        if not franchise:
+            raise HTTPException(status_code=404, detail="Franchise not found")
+        return franchise
+    return blobs.respond("franchise", franchise_id, lambda: response_cache.get_or_load("franchise", f"id:{franchise_id}", load), response)
+
+@app.post("/franchise", tags=["Franchise"], response_model=FranchiseOut)
 def create_franchise(franchise: FranchiseCreate, db: Session = Depends(get_db)):
     """CREATE - Add new franchise"""
     new_franchise = Franchise(**franchise.dict())
     db.add(new_franchise)
     db.commit()
+    record_write("franchise")
     db.refresh(new_franchise)
     return new_franchise
 
-@app.put("/franchise/{franchise_id}", tags=["Franchise"])
+@app.put("/franchise/{franchise_id}", tags=["Franchise"], response_model=FranchiseOut)
 def update_franchise(franchise_id: int, franchise: FranchiseCreate, db: Session = Depends(get_db)):
     """UPDATE - Modify franchise"""
     db_franchise = db.query(Franchise).filter_by(franchise_id=franchise_id).first()
@@ -403,6 +803,8 @@ def update_franchise(franchise_id: int, franchise: FranchiseCreate, db: Session
         db_franchise.start_year = franchise.start_year
     
     db.commit()
+    record_write("franchise")
+    blobs.blob_store.discard("franchise", franchise_id)
     db.refresh(db_franchise)
     return db_franchise
 
@@ -414,32 +816,42 @@ def delete_franchise(franchise_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Franchise not found")
     db.delete(franchise)
     db.commit()
+    record_delete("franchise", franchise_id)
     return {"status": "deleted", "franchise_id": franchise_id}
 
 # ----------- FILMS -----------
-@app.get("/films", tags=["Films"])
-def get_all_films(db: Session = Depends(get_db)):
+@app.get("/films", tags=["Films"], response_model=Page[FilmOut], dependencies=[Depends(conditional_get("films"))])
+def get_all_films(response: Response, page: PageParams = Depends(), listing: ListQuery = Depends(list_query(Film)), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
     """READ - Get all films"""
-    return db.query(Film).order_by(Film.film_id).all()
+    if fmt:
+        return export_table(Film, Film.film_id, fmt, page.after_pk, listing)
+    if snapshot.ENABLED:
+        return fast_json(snapshot.store.page("films", listing, page), response)
+    return fast_json(listing.paginate(db, page), response)
 
-@app.get("/films/{film_id}", tags=["Films"])
-def get_film(film_id: int, db: Session = Depends(get_db)):
+@app.get("/films/{film_id}", tags=["Films"], response_model=FilmOut, dependencies=[Depends(conditional_get("films"))])
+def get_film(film_id: int, response: Response, db: Session = Depends(get_db)):
     """READ - Get specific film"""
-    film = db.query(Film).filter_by(film_id=film_id).first()
-    if not film:
-        raise HTTPException(status_code=404, detail="Film not found")
-    return film
+    if snapshot.ENABLED:
+        return blobs.respond("films", film_id, lambda: snapshot_row("films", film_id, "Film"), response)
+    def load():
+        film = fetch_row(db, Film, film_id)
+        if not film:
+            raise HTTPException(status_code=404, detail="Film not found")
+        return film
+    return blobs.respond("films", film_id, load, response)
 
-@app.post("/films", tags=["Films"])
+@app.post("/films", tags=["Films"], response_model=FilmOut)
 def create_film(film: FilmCreate, db: Session = Depends(get_db)):
     """CREATE - Add new film"""
     new_film = Film(**film.dict())
     db.add(new_film)
     db.commit()
+    record_write("films")
     db.refresh(new_film)
     return new_film
 
-@app.put("/films/{film_id}", tags=["Films"])
+@app.put("/films/{film_id}", tags=["Films"], response_model=FilmOut)
 def update_film(film_id: int, rating: Optional[str] = None, box_office: Optional[int] = None, db: Session = Depends(get_db)):
     """UPDATE - Modify film"""
     db_film = db.query(Film).filter_by(film_id=film_id).first()
@@ -452,6 +864,8 @@ def update_film(film_id: int, rating: Optional[str] = None, box_office: Optional
         db_film.box_office = box_office
     
     db.commit()
+    record_write("films")
+    blobs.blob_store.discard("films", film_id)
     db.refresh(db_film)
     return db_film
 
@@ -463,32 +877,45 @@ def delete_film(film_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Film not found")
     db.delete(film)
     db.commit()
+    record_delete("films", film_id)
     return {"status": "deleted", "film_id": film_id}
 
 # ----------- PLANETS -----------
-@app.get("/planets", tags=["Planets"])
-def get_all_planets(db: Session = Depends(get_db)):
+@app.get("/planets", tags=["Planets"], response_model=Page[PlanetOut], dependencies=[Depends(conditional_get("planets"))])
+def get_all_planets(response: Response, page: PageParams = Depends(), listing: ListQuery = Depends(list_query(Planet)), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
     """READ - Get all planets"""
-    return db.query(Planet).order_by(Planet.planet_id).all()
+    if fmt:
+        return export_table(Planet, Planet.planet_id, fmt, page.after_pk, listing)
+    if snapshot.ENABLED:
+        return fast_json(snapshot.store.page("planets", listing, page), response)
+    return fast_json(response_cache.get_or_load(
+        "planets", f"list:{listing.cache_key}",
+        lambda: listing.paginate(db, page)
+    ), response)
 
-@app.get("/planets/{planet_id}", tags=["Planets"])
-def get_planet(planet_id: int, db: Session = Depends(get_db)):
+@app.get("/planets/{planet_id}", tags=["Planets"], response_model=PlanetOut, dependencies=[Depends(conditional_get("planets"))])
+def get_planet(planet_id: int, response: Response, db: Session = Depends(get_db)):
     """READ - Get specific planet"""
-    planet = db.query(Planet).filter_by(planet_id=planet_id).first()
-    if not planet:
-        raise HTTPException(status_code=404, detail="Planet not found")
-    return planet
+    if snapshot.ENABLED:
+        return blobs.respond("planets", planet_id, lambda: snapshot_row("planets", planet_id, "Planet"), response)
+    def load():
+        planet = fetch_row(db, Planet, planet_id)
+        if not planet:
+            raise HTTPException(status_code=404, detail="Planet not found")
+        return planet
+    return blobs.respond("planets", planet_id, lambda: response_cache.get_or_load("planets", f"id:{planet_id}", load), response)
 
-@app.post("/planets", tags=["Planets"])
+@app.post("/planets", tags=["Planets"], response_model=PlanetOut)
 def create_planet(planet: PlanetCreate, db: Session = Depends(get_db)):
     """CREATE - Add new planet"""
     new_planet = Planet(**planet.dict())
     db.add(new_planet)
     db.commit()
+    record_write("planets")
     db.refresh(new_planet)
     return new_planet
 
-@app.put("/planets/{planet_id}", tags=["Planets"])
+@app.put("/planets/{planet_id}", tags=["Planets"], response_model=PlanetOut)
 def update_planet(planet_id: int, planet: PlanetCreate, db: Session = Depends(get_db)):
     """UPDATE - Modify planet"""
     db_planet = db.query(Planet).filter_by(planet_id=planet_id).first()
@@ -503,6 +930,8 @@ def update_planet(planet_id: int, planet: PlanetCreate, db: Session = Depends(ge
         db_planet.climate = planet.climate
     
     db.commit()
+    record_write("planets")
+    blobs.blob_store.discard("planets", planet_id)
     db.refresh(db_planet)
     return db_planet
 
@@ -514,21 +943,30 @@ def delete_planet(planet_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Planet not found")
     db.delete(planet)
     db.commit()
+    record_delete("planets", planet_id)
     return {"status": "deleted", "planet_id": planet_id}
 
 # ----------- TV SERIES -----------
-@app.get("/tvseries", tags=["TV Series"])
-def get_all_tvseries(db: Session = Depends(get_db)):
+@app.get("/tvseries", tags=["TV Series"], response_model=Page[TVSeriesOut], dependencies=[Depends(conditional_get("tv_series"))])
+def get_all_tvseries(response: Response, page: PageParams = Depends(), listing: ListQuery = Depends(list_query(TVSeries)), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
     """READ - Get all TV series"""
-    return db.query(TVSeries).order_by(TVSeries.series_id).all()
+    if fmt:
+        return export_table(TVSeries, TVSeries.series_id, fmt, page.after_pk, listing)
+    if snapshot.ENABLED:
+        return fast_json(snapshot.store.page("tv_series", listing, page), response)
+    return fast_json(listing.paginate(db, page), response)
 
-@app.get("/tvseries/{series_id}", tags=["TV Series"])
-def get_tvseries(series_id: int, db: Session = Depends(get_db)):
+@app.get("/tvseries/{series_id}", tags=["TV Series"], response_model=TVSeriesOut, dependencies=[Depends(conditional_get("tv_series"))])
+def get_tvseries(series_id: int, response: Response, db: Session = Depends(get_db)):
     """READ - Get specific TV series"""
-    series = db.query(TVSeries).filter_by(series_id=series_id).first()
-    if not series:
-        raise HTTPException(status_code=404, detail="TV Series not found")
-    return series
+    if snapshot.ENABLED:
+        return blobs.respond("tv_series", series_id, lambda: snapshot_row("tv_series", series_id, "TV Series"), response)
+    def load():
+        series = fetch_row(db, TVSeries, series_id)
+        if not series:
+            raise HTTPException(status_code=404, detail="TV Series not found")
+        return series
+    return blobs.respond("tv_series", series_id, load, response)
 
 @app.delete("/tvseries/{series_id}", tags=["TV Series"])
 def delete_tvseries(series_id: int, db: Session = Depends(get_db)):
@@ -538,21 +976,30 @@ def delete_tvseries(series_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="TV Series not found")
     db.delete(series)
     db.commit()
+    record_delete("tv_series", series_id)
     return {"status": "deleted", "series_id": series_id}
 
 # ----------- BOOKS -----------
-@app.get("/books", tags=["Books"])
-def get_all_books(db: Session = Depends(get_db)):
+@app.get("/books", tags=["Books"], response_model=Page[BookOut], dependencies=[Depends(conditional_get("books"))])
+def get_all_books(response: Response, page: PageParams = Depends(), listing: ListQuery = Depends(list_query(Book)), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
     """READ - Get all books"""
-    return db.query(Book).order_by(Book.book_id).all()
+    if fmt:
+        return export_table(Book, Book.book_id, fmt, page.after_pk, listing)
+    if snapshot.ENABLED:
+        return fast_json(snapshot.store.page("books", listing, page), response)
+    return fast_json(listing.paginate(db, page), response)
 
-@app.get("/books/{book_id}", tags=["Books"])
-def get_book(book_id: int, db: Session = Depends(get_db)):
+@app.get("/books/{book_id}", tags=["Books"], response_model=BookOut, dependencies=[Depends(conditional_get("books"))])
+def get_book(book_id: int, response: Response, db: Session = Depends(get_db)):
     """READ - Get specific book"""
-    book = db.query(Book).filter_by(book_id=book_id).first()
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    return book
+    if snapshot.ENABLED:
+        return blobs.respond("books", book_id, lambda: snapshot_row("books", book_id, "Book"), response)
+    def load():
+        book = fetch_row(db, Book, book_id)
+        if not book:
+            raise HTTPException(status_code=404, detail="Book not found")
+        return book
+    return blobs.respond("books", book_id, load, response)
 
 @app.delete("/books/{book_id}", tags=["Books"])
 def delete_book(book_id: int, db: Session = Depends(get_db)):
@@ -562,21 +1009,30 @@ def delete_book(book_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Book not found")
     db.delete(book)
     db.commit()
+    record_delete("books", book_id)
     return {"status": "deleted", "book_id": book_id}
 
 # ----------- GAMES -----------
-@app.get("/games", tags=["Games"])
-def get_all_games(db: Session = Depends(get_db)):
+@app.get("/games", tags=["Games"], response_model=Page[GameOut], dependencies=[Depends(conditional_get("games"))])
+def get_all_games(response: Response, page: PageParams = Depends(), listing: ListQuery = Depends(list_query(Game)), fmt: Optional[str] = Depends(export_format), db: Session = Depends(get_db)):
     """READ - Get all games"""
-    return db.query(Game).order_by(Game.game_id).all()
+    if fmt:
+        return export_table(Game, Game.game_id, fmt, page.after_pk, listing)
+    if snapshot.ENABLED:
+        return fast_json(snapshot.store.page("games", listing, page), response)
+    return fast_json(listing.paginate(db, page), response)
 
-@app.get("/games/{game_id}", tags=["Games"])
-def get_game(game_id: int, db: Session = Depends(get_db)):
+@app.get("/games/{game_id}", tags=["Games"], response_model=GameOut, dependencies=[Depends(conditional_get("games"))])
+def get_game(game_id: int, response: Response, db: Session = Depends(get_db)):
     """READ - Get specific game"""
-    game = db.query(Game).filter_by(game_id=game_id).first()
-    if not game:
-        raise HTTPException(status_code=404, detail="Game not found")
-    return game
+    if snapshot.ENABLED:
+        return blobs.respond("games", game_id, lambda: snapshot_row("games", game_id, "Game"), response)
+    def load():
+        game = fetch_row(db, Game, game_id)
+        if not game:
+            raise HTTPException(status_code=404, detail="Game not found")
+        return game
+    return blobs.respond("games", game_id, load, response)
 
 @app.delete("/games/{game_id}", tags=["Games"])
 def delete_game(game_id: int, db: Session = Depends(get_db)):
@@ -586,4 +1042,208 @@ def delete_game(game_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Game not found")
     db.delete(game)
     db.commit()
+    record_delete("games", game_id)
     return {"status": "deleted", "game_id": game_id}
+
+# =============================================================
+# 7. ASYNC ROUTES (/async/...) - same CRUD on the asyncio engine
+# =============================================================
+if startup.API_ASYNC_ROUTES:
+    app.include_router(build_async_router([
+        AsyncResource("/people", "People", Person, "Person", PersonCreate, PersonCreate),
+        AsyncResource("/species", "Species", Species, "Species", SpeciesCreate, SpeciesCreate),
+        AsyncResource("/affiliations", "Affiliations", Affiliation, "Affiliation", AffiliationCreate, AffiliationCreate),
+        AsyncResource("/characters", "Characters", Character, "Character", CharacterCreate, CharacterUpdate),
+        AsyncResource("/franchise", "Franchise", Franchise, "Franchise", FranchiseCreate, FranchiseCreate),
+        AsyncResource("/films", "Films", Film, "Film", FilmCreate, FilmUpdate),
+        AsyncResource("/planets", "Planets", Planet, "Planet", PlanetCreate, PlanetCreate),
+        AsyncResource("/tvseries", "TV Series", TVSeries, "TV Series"),
+        AsyncResource("/books", "Books", Book, "Book"),
+        AsyncResource("/games", "Games", Game, "Game"),
+    ], on_write=record_bulk_write))
+
+# =============================================================
+# 8. SEARCH (search.py) - index built by `python starwars.py search rebuild`
+# =============================================================
+@app.get("/search", tags=["Search"], response_model=SearchResults, dependencies=[Depends(conditional_get(*search.SEARCH_TABLES))])
+def search_catalogue(response: Response, q: str = Query(..., min_length=1, max_length=200), kinds: List[str] = Depends(search.types_param), limit: int = Query(20, ge=1, le=search.MAX_RESULTS), fuzzy: bool = True):
+    """Characters, people, planets, books, games and TV series whose name/title (or author/developer) matches q.
+
+    Every word of q matches as a prefix; with fuzzy=true, also one or two typos away.
+    """
+    try:
+        return fast_json(search.search(q, kinds, limit, fuzzy, bind=current_bind()), response)
+    except search.SearchUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+# =============================================================
+# 9. STATS (stats.py) - rollup built by `python starwars.py stats rebuild`
+# =============================================================
+STATS_SOURCE = Query("rollup", pattern="^(rollup|live)$", description="rollup: stats_rollup table; live: GROUP BY on the source tables")
+# catalogue aggregates can also come from the in-memory snapshot (snapshot.py),
+# but only when SNAPSHOT_MODE=1 loaded it: ?source=snapshot is a 422 otherwise
+if snapshot.ENABLED:
+    CATALOGUE_STATS_SOURCE = Query("snapshot", pattern="^(rollup|live|snapshot)$",
+                                   description="rollup: stats_rollup table; live: GROUP BY on the source tables; snapshot: in memory")
+else:
+    CATALOGUE_STATS_SOURCE = STATS_SOURCE
+
+def stats_response(response: Response, source: str, load, *args):
+    if source == "snapshot":  # snapshot.Snapshot has the stats.py aggregates under the same names
+        return fast_json({"source": source, "items": getattr(snapshot.store, load.__name__)(*args)}, response)
+    try:
+        return fast_json({"source": source, "items": load(*args, source=source, bind=current_bind())}, response)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"stats_rollup unavailable. Run python starwars.py stats rebuild first. Error: {str(e)}")
+
+@app.get("/stats/box-office", tags=["Stats"], response_model=StatsOut[BoxOfficeStat], dependencies=[Depends(conditional_get("films", "franchise"))])
+def get_box_office_stats(response: Response, by: str = Query("franchise", pattern="^(franchise|rating|franchise_rating)$"), source: str = CATALOGUE_STATS_SOURCE):
+    """Films, box office total, share of the grand total and rank per franchise / rating"""
+    return stats_response(response, source, stats.box_office, by)
+
+@app.get("/stats/releases", tags=["Stats"], response_model=StatsOut[ReleaseStat], dependencies=[Depends(conditional_get("books", "games", "tv_series"))])
+def get_release_stats(response: Response, kinds: Optional[str] = Query(None, pattern="^(books|games|tv_series)(,(books|games|tv_series))*$"), source: str = CATALOGUE_STATS_SOURCE):
+    """Releases per year (books: publication year, games: release year, TV: start year) with running totals"""
+    return stats_response(response, source, stats.releases, kinds.split(",") if kinds else None)
+
+@app.get("/stats/seasons", tags=["Stats"], response_model=StatsOut[SeasonStat], dependencies=[Depends(conditional_get("tv_series", "franchise"))])
+def get_season_stats(response: Response, source: str = CATALOGUE_STATS_SOURCE):
+    """TV series and seasons per franchise"""
+    return stats_response(response, source, stats.seasons)
+
+@app.get("/stats/characters", tags=["Stats"], response_model=StatsOut[CharacterStat], dependencies=[Depends(conditional_get("characters", "affiliations", "species"))])
+def get_character_stats(response: Response, by: str = Query("affiliation", pattern="^(affiliation|species)$"), source: str = STATS_SOURCE):
+    """Characters per affiliation or species, with share and rank"""
+    return stats_response(response, source, stats.characters, by)
+
+# =============================================================
+# 10. CHANGES (changes.py) - change_log built by `python starwars.py changes install`
+# =============================================================
+CHANGES_UNAVAILABLE = "change_log unavailable. Run python starwars.py changes install first. Error: "
+
+def changes_entities(entities: Optional[str] = Query(None, description=f"comma-separated: {', '.join(changes.ENTITIES)}")):
+    """Route dependency: validated ?entities= filter (None = every entity)"""
+    try:
+        return changes.parse_entities(entities.split(",") if entities else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def stream_cursor(since: Optional[int] = Query(None, ge=0, description="resume after this version (default: from now)"), last_event_id: Optional[int] = Header(None)):
+    """Route dependency: where a stream starts (Last-Event-ID wins), checked before the stream opens"""
+    if changes.feed.streams >= changes.MAX_STREAMS:
+        raise HTTPException(status_code=503, detail="Too many open change streams, retry later")
+    cursor = last_event_id if last_event_id is not None else since
+    try:
+        if cursor is not None:
+            changes.read(cursor, 1)
+        else:
+            changes.latest_version()
+    except changes.CursorGone as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=CHANGES_UNAVAILABLE + str(e))
+    return cursor
+
+@app.get("/changes", tags=["Changes"], response_model=ChangesPage)
+def get_changes(since: int = Query(0, ge=0), limit: int = Query(changes.PAGE_SIZE, ge=1, le=5000), entities=Depends(changes_entities)):
+    """Inserts, updates and deletes after version `since`, oldest first.
+
+    Pass `next` back as `since` until `has_more` is false. 410 means the
+    history after `since` was pruned: re-sync from the list endpoints.
+    """
+    try:
+        return fast_json(changes.read(since, limit, entities, bind=current_bind()))
+    except changes.CursorGone as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=CHANGES_UNAVAILABLE + str(e))
+
+@app.get("/changes/stream", tags=["Changes"], response_class=EventSourceResponse)
+async def stream_changes(since: Optional[int] = Depends(stream_cursor), entities=Depends(changes_entities)):
+    """Server-Sent Events as writes commit: event = entity, id = version, data = the change"""
+    try:
+        async for batch, _ in changes.feed.follow(since, entities):
+            for change in batch:
+                yield ServerSentEvent(data=change, event=change["entity"], id=str(change["version"]))
+    except changes.CursorGone as e:
+        yield ServerSentEvent(data={"detail": str(e)}, event="gone")
+
+@app.websocket("/changes/ws")
+async def changes_websocket(websocket: WebSocket):
+    """Send {"since": <version or null>, "entities": [...]} to (re)subscribe; receive {"changes", "next"} batches"""
+    await changes.serve_websocket(websocket)
+
+# =============================================================
+# 11. GRAPHQL (/graphql) - optional, needs graphql-core
+# =============================================================
+if graphql_available:
+    app.include_router(build_graphql_router())
+
+# =============================================================
+# 12. METRICS
+# =============================================================
+@app.get("/metrics/db-pool", tags=["Metrics"])
+def get_db_pool_metrics(format: str = Query("json", pattern="^(json|prometheus)$")):
+    """Connection pool gauges (checked out / idle / overflow) and checkout wait counters"""
+    pool = pool_snapshot(engine.pool)
+    if format == "prometheus":
+        return PlainTextResponse(prometheus_text(pool))
+    return pool
+
+@app.get("/metrics/requests", tags=["Metrics"])
+def get_request_metrics(format: str = Query("json", pattern="^(json|prometheus)$")):
+    """Per-route request / SQL / serialization time and statement counts (REQUEST_PROFILING=1)"""
+    if format == "prometheus":
+        return PlainTextResponse(profiling.registry.prometheus_text())
+    return profiling.registry.snapshot()
+
+@app.get("/metrics/replicas", tags=["Metrics"])
+def get_replica_metrics():
+    """Read replicas: health, checked-out connections, reads routed to each"""
+    return replica_set.status()
+
+@app.get("/metrics/cache", tags=["Metrics"])
+def get_cache_metrics():
+    """Reference-table response cache hit/miss counters"""
+    return response_cache.stats()
+
+@app.get("/metrics/blobs", tags=["Metrics"])
+def get_blob_metrics():
+    """Pre-encoded get-by-id bodies (JSON_BLOBS=1): hits, misses, entries, bytes, evictions"""
+    return blobs.blob_store.stats()
+
+@app.get("/metrics/snapshot", tags=["Metrics"])
+def get_snapshot_metrics():
+    """Catalogue snapshot (SNAPSHOT_MODE=1): rows, bytes per row, get-by-id latency per table"""
+    return snapshot.store.status()
+
+@app.get("/metrics/startup", tags=["Metrics"])
+def get_startup_metrics():
+    """Import / startup timings and schema version check of this worker"""
+    return getattr(app.state, "startup_report", {"import_seconds": app.state.import_seconds})
+
+@app.get("/metrics/character-overview", tags=["Metrics"])
+def get_character_overview_metrics():
+    """Materialized character_overview staleness (row drift vs the live join, refresh age)"""
+    try:
+        return materialized.status()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"character_overview_mat unavailable: {str(e)}")
+
+@app.get("/metrics/changes", tags=["Metrics"])
+def get_change_metrics():
+    """change_log size / versions, trigger count, open streams and replay buffer state"""
+    try:
+        return changes.status()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=CHANGES_UNAVAILABLE + str(e))
+
+@app.get("/metrics/stats", tags=["Metrics"])
+def get_stats_metrics():
+    """stats_rollup drift against a live GROUP BY, per metric, and last update age"""
+    try:
+        return stats.status()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"stats_rollup unavailable: {str(e)}")
+
+app.state.import_seconds = time.perf_counter() - _import_started
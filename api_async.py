@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from typing import Callable, Optional, Type
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, get_async_engine
+from pagination import PageParams, paginate_async
+
+# Async mirror of the CRUD routes in api.py, mounted under /async.
+# Handlers are coroutines on the event loop instead of threadpool workers,
+# so concurrency is bounded by the async connection pool only.
+
+# ------------ helper ------------
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@dataclass
+class AsyncResource:
+    path: str
+    tag: str
+    model: type
+    label: str
+    create_schema: Optional[Type[BaseModel]] = None
+    update_schema: Optional[Type[BaseModel]] = None
+
+
+def _register(router: APIRouter, res: AsyncResource, on_write: Optional[Callable[..., None]]):
+    model = res.model
+    pk_column = model.__mapper__.primary_key[0]
+    pk_name = pk_column.key
+    not_found = f"{res.label} not found"
+    tags = [res.tag]
+
+    def written(deleted: bool = False):
+        if on_write is not None:
+            on_write(model.__tablename__, deleted=deleted)
+
+    async def get_or_404(db: AsyncSession, item_id: int):
+        item = await db.get(model, item_id)
+        if not item:
+            raise HTTPException(status_code=404, detail=not_found)
+        return item
+
+    @router.get(res.path, tags=tags, name=f"async_list_{model.__tablename__}")
+    async def list_items(page: PageParams = Depends(), db: AsyncSession = Depends(get_async_db)):
+        """READ - List all (async)"""
+        return await paginate_async(db, model, pk_column, page)
+
+    @router.get(res.path + "/{item_id}", tags=tags, name=f"async_get_{model.__tablename__}")
+    async def get_item(item_id: int, db: AsyncSession = Depends(get_async_db)):
+        """READ - Get one by ID (async)"""
+        return await get_or_404(db, item_id)
+
+    if res.create_schema is not None:
+        create_schema = res.create_schema
+
+        @router.post(res.path, tags=tags, name=f"async_create_{model.__tablename__}")
+        async def create_item(payload: create_schema, db: AsyncSession = Depends(get_async_db)):
+            """CREATE - Add new (async)"""
+            item = model(**payload.dict())
+            db.add(item)
+            await db.commit()
+            written()
+            await db.refresh(item)
+            return item
+
+    if res.update_schema is not None:
+        update_schema = res.update_schema
+
+        @router.put(res.path + "/{item_id}", tags=tags, name=f"async_update_{model.__tablename__}")
+        async def update_item(item_id: int, payload: update_schema, db: AsyncSession = Depends(get_async_db)):
+            """UPDATE - Modify existing (async); empty fields are left unchanged"""
+            item = await get_or_404(db, item_id)
+            for field, value in payload.dict().items():
+                if value:
+                    setattr(item, field, value)
+            await db.commit()
+            written()
+            await db.refresh(item)
+            return item
+
+    @router.delete(res.path + "/{item_id}", tags=tags, name=f"async_delete_{model.__tablename__}")
+    async def delete_item(item_id: int, db: AsyncSession = Depends(get_async_db)):
+        """DELETE - Remove (async)"""
+        item = await get_or_404(db, item_id)
+        await db.delete(item)
+        await db.commit()
+        written(deleted=True)
+        return {"status": "deleted", pk_name: item_id}
+
+
+def build_async_router(resources, on_write: Optional[Callable[..., None]] = None):
+    """on_write(table_name, deleted=...) is called after every committed create/update/delete"""
+    router = APIRouter(prefix="/async")
+    for res in resources:
+        _register(router, res, on_write)
+    return router
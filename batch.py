@@ -0,0 +1,232 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from pydantic import BaseModel, ValidationError, create_model
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# Batch create / update / delete: /<resource>/batch
+#
+# One request = one transaction. Inserts go out as a single multi-row
+# INSERT (executemany / insertmanyvalues) with RETURNING where the dialect
+# supports it (SQLite, MariaDB); on MySQL the created count is returned
+# instead of the rows. Invalid items are reported per index and skipped;
+# the valid ones are still written.
+#
+# ?on_conflict=update|ignore turns the insert into an upsert keyed on the
+# model's unique constraint (see BatchResource.conflict_keys). An update
+# sets exactly the columns the item carries: omitted ones are left
+# unchanged, an explicit null stores NULL. Items are grouped by the set of
+# columns they carry, one statement per group. The response counts created,
+# updated and ignored rows separately (rows whose key already existed are
+# looked up first, in the same transaction).
+#
+# A batch delete first sets the foreign keys that point at the deleted rows
+# to NULL, as the ORM does for the single-row DELETE routes, so no child
+# row is left referring to a missing parent.
+
+MAX_BATCH_SIZE = 10000
+
+
+@dataclass
+class BatchResource:
+    path: str
+    tag: str
+    model: type
+    create_schema: Type[BaseModel]
+    update_schema: Optional[Type[BaseModel]] = None
+    conflict_keys: Tuple[str, ...] = ()    # unique constraint used for upserts
+
+
+def _validate(items: List[Dict[str, Any]], schema: Type[BaseModel], exclude_unset: bool = False):
+    """Split raw items into (index, validated dict) and per-item errors"""
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema(**item).dict(exclude_unset=exclude_unset)))
+        except (ValidationError, TypeError) as e:
+            detail = ([{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+                      if isinstance(e, ValidationError) else str(e))
+            errors.append({"index": index, "errors": detail})
+    return valid, errors
+
+
+def _check_size(items):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch larger than {MAX_BATCH_SIZE} items")
+
+
+def _insert_statement(db: Session, model, columns, on_conflict: str, conflict_keys):
+    """INSERT (or dialect-specific upsert) for rows carrying `columns`"""
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if on_conflict == "error":
+        return insert(table)
+    if not conflict_keys:
+        raise HTTPException(status_code=400, detail=f"{model.__tablename__} has no unique key to upsert on")
+
+    update_cols = [c for c in columns if c not in conflict_keys]
+    # dialect modules imported here, not at import time: only the engine's own is needed
+    if dialect == "sqlite":
+        from sqlalchemy.dialects import sqlite
+        statement = sqlite.insert(table)
+        if on_conflict == "ignore" or not update_cols:
+            return statement.on_conflict_do_nothing(index_elements=list(conflict_keys))
+        return statement.on_conflict_do_update(
+            index_elements=list(conflict_keys),
+            set_={c: statement.excluded[c] for c in update_cols},
+        )
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects import mysql
+        statement = mysql.insert(table)
+        if on_conflict == "ignore" or not update_cols:
+            # a no-op update rather than INSERT IGNORE, which would also
+            # swallow foreign key and truncation errors
+            pk = table.primary_key.columns[0]
+            return statement.on_duplicate_key_update({pk.key: pk})
+        return statement.on_duplicate_key_update({c: statement.inserted[c] for c in update_cols})
+    raise HTTPException(status_code=400, detail=f"Upsert not supported on {dialect}")
+
+
+def _existing_keys(db: Session, table, conflict_keys, rows) -> set:
+    """conflict_keys values (tuples) of the rows that already exist"""
+    columns = [table.c[k] for k in conflict_keys]
+    wanted = list({tuple(row.get(k) for k in conflict_keys) for row in rows})
+    if len(columns) == 1:
+        found = db.execute(select(*columns).where(columns[0].in_([w[0] for w in wanted])))
+    else:
+        found = db.execute(select(*columns).where(tuple_(*columns).in_(wanted)))
+    return {tuple(r) for r in found}
+
+
+def _child_keys(table) -> List[Tuple[Any, Any]]:
+    """(child table, foreign key column) for every foreign key referencing `table`"""
+    return [(child, fk.parent) for child in table.metadata.sorted_tables
+            for fk in child.foreign_keys if fk.column.table is table]
+
+
+def _register(router: APIRouter, res: BatchResource, get_db, on_write):
+    model = res.model
+    table = model.__table__
+    pk_column = table.primary_key.columns[0]
+    pk_name = pk_column.key
+    tags = [res.tag]
+    path = res.path + "/batch"
+
+    def written(children):
+        if on_write is not None:
+            on_write(model.__tablename__, children=children)
+
+    @contextmanager
+    def transaction(db: Session, children=()):
+        try:
+            yield
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=f"Batch rejected, nothing written: {e.orig}")
+        written(children)
+
+    @router.post(path, tags=tags, name=f"batch_create_{model.__tablename__}")
+    def batch_create(
+        items: List[Dict[str, Any]] = Body(...),
+        on_conflict: str = Query("error", pattern="^(error|update|ignore)$"),
+        db: Session = Depends(get_db),
+    ):
+        """BATCH CREATE - insert many rows in one transaction (optional upsert)"""
+        _check_size(items)
+        valid, errors = _validate(items, res.create_schema, exclude_unset=True)
+        result = {"created": 0, "updated": 0, "ignored": 0, "items": None, "errors": errors}
+        if not valid:
+            return result
+
+        rows = [row for _, row in valid]
+        groups = {}  # columns carried -> rows (one statement each)
+        for row in rows:
+            groups.setdefault(tuple(row), []).append(row)
+        dialect = db.get_bind().dialect
+        # RETURNING needs insertmanyvalues support (SQLite, MariaDB);
+        # MySQL has no RETURNING, so only the counts come back there.
+        returning = dialect.insert_executemany_returning
+        with transaction(db):
+            if on_conflict != "error" and res.conflict_keys:
+                seen = _existing_keys(db, table, res.conflict_keys, rows)
+                for row in rows:
+                    key = tuple(row.get(k) for k in res.conflict_keys)
+                    if key not in seen:
+                        result["created"] += 1
+                        seen.add(key)  # a later item with the same key updates this one
+                    elif on_conflict == "update" and any(c not in res.conflict_keys for c in row):
+                        result["updated"] += 1
+                    else:
+                        result["ignored"] += 1
+            else:
+                result["created"] = len(rows)
+            written_rows = []
+            for columns, group in groups.items():
+                statement = _insert_statement(db, model, columns, on_conflict, res.conflict_keys)
+                if returning:
+                    written_rows += [dict(r._mapping) for r in db.execute(statement.returning(*table.columns), group)]
+                else:
+                    db.execute(statement, group)
+            if returning:
+                result["items"] = written_rows
+        return result
+
+    if res.update_schema is not None:
+        item_schema = create_model(
+            f"{res.update_schema.__name__}Batch",
+            __base__=res.update_schema,
+            **{pk_name: (int, ...)},
+        )
+
+        @router.put(path, tags=tags, name=f"batch_update_{model.__tablename__}")
+        def batch_update(items: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)):
+            """BATCH UPDATE - each item carries its primary key; empty fields are left unchanged"""
+            _check_size(items)
+            valid, errors = _validate(items, item_schema)
+            ids = [row[pk_name] for _, row in valid]
+            existing = set(db.scalars(select(pk_column).where(pk_column.in_(ids)))) if ids else set()
+
+            rows = []
+            for index, row in valid:
+                if row[pk_name] not in existing:
+                    errors.append({"index": index, "errors": f"{pk_name}={row[pk_name]} not found"})
+                    continue
+                rows.append({k: v for k, v in row.items() if v or k == pk_name})
+            if rows:
+                # ORM bulk UPDATE by primary key: executemany grouped by column set
+                with transaction(db):
+                    db.execute(update(model), rows)
+            return {"updated": len(rows), "errors": sorted(errors, key=lambda e: e["index"])}
+
+    @router.delete(path, tags=tags, name=f"batch_delete_{model.__tablename__}")
+    def batch_delete(ids: List[int] = Body(..., embed=True), db: Session = Depends(get_db)):
+        """BATCH DELETE - body: {"ids": [1, 2, 3]}"""
+        _check_size(ids)
+        existing = set(db.scalars(select(pk_column).where(pk_column.in_(ids)))) if ids else set()
+        if existing:
+            children = []  # tables whose rows the delete changed, filled before the commit
+            with transaction(db, children):
+                for child, fk_column in _child_keys(table):
+                    nulled = db.execute(update(child).where(fk_column.in_(existing)).values({fk_column.key: None}))
+                    if nulled.rowcount:
+                        children.append(child.name)
+                db.execute(delete(table).where(pk_column.in_(existing)))
+        return {
+            "status": "deleted",
+            "deleted": sorted(existing),
+            "not_found": [i for i in ids if i not in existing],
+        }
+
+
+def build_batch_router(resources, get_db, on_write: Optional[Callable[..., None]] = None):
+    """on_write(table_name, children=[...]) is called after every committed batch;
+    children: tables whose foreign keys a batch delete set to NULL"""
+    router = APIRouter()
+    for res in resources:
+        _register(router, res, get_db, on_write)
+    return router
@@ -0,0 +1,114 @@
+# Characters-by-affiliation backends (affiliation_lookup.py), in-process.
+#
+#   python benchmarks/bench_affiliation.py --database sqlite:////tmp/sw.sqlite
+#   python benchmarks/bench_affiliation.py --database mysql+pymysql://root:@localhost/starwarsDB
+#
+# For the affiliation with the most characters, times (median of --repeat):
+#   first page   one page of --limit rows
+#   all pages    every page, following the cursor (procedure: a single CALL,
+#                which returns every row anyway)
+# for each backend that works on the database:
+#   query        cached name -> id, prepared SELECT on affiliation_id
+#   procedure    CALL GetCharactersByAffiliation (MySQL + setup_procedure.sql)
+#   name join    the pre-change portable equivalent: text() built per call,
+#                joins affiliations and filters on the name, no paging
+# and prints the AFFILIATION_LOOKUP setting to use.
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+NAME_JOIN = """
+    SELECT c.character_id, c.name AS character_name, p.name AS person_name, p.birth_year, p.role_type,
+           s.name AS species_name, s.classification, a.name AS affiliation_name, a.description
+    FROM characters c
+        INNER JOIN people p ON c.person_id = p.person_id
+        INNER JOIN species s ON c.species_id = s.species_id
+        INNER JOIN affiliations a ON c.affiliation_id = a.affiliation_id
+    WHERE a.name = :aff_name
+    ORDER BY c.character_id
+"""
+
+
+def median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="DATABASE_URL to benchmark (default: env / database.py)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=50, help="page size")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    os.environ.setdefault("DB_ECHO", "0")
+
+    from sqlalchemy import text
+
+    import affiliation_lookup
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        name, count = db.execute(text(
+            "SELECT a.name, COUNT(*) FROM characters c JOIN affiliations a ON a.affiliation_id = c.affiliation_id "
+            "GROUP BY a.name ORDER BY COUNT(*) DESC LIMIT 1"
+        )).one()
+        print(f"affiliation {name!r}: {count} characters, page size {args.limit}\n")
+
+        def walk(backend):
+            def run():
+                affiliation = affiliation_lookup.resolve(db, name)
+                after, rows = 0, 0
+                while True:
+                    page = affiliation_lookup.characters_by_affiliation(db, affiliation, after, args.limit + 1, backend)
+                    rows += min(len(page), args.limit)
+                    if len(page) <= args.limit:
+                        return rows
+                    after = page[args.limit - 1]["character_id"]
+            return run
+
+        def first_page(backend):
+            return lambda: affiliation_lookup.characters_by_affiliation(
+                db, affiliation_lookup.resolve(db, name), 0, args.limit + 1, backend)
+
+        def name_join():
+            return db.execute(text(NAME_JOIN), {"aff_name": name}).fetchall()
+
+        cases = {"query": (first_page("query"), walk("query"))}
+        try:
+            first_page("procedure")()
+            # every CALL returns the whole affiliation: one call is "all pages"
+            cases["procedure"] = (first_page("procedure"), lambda: affiliation_lookup.characters_by_affiliation(
+                db, affiliation_lookup.resolve(db, name), 0, count, "procedure"))
+        except affiliation_lookup.ProcedureUnavailable as e:
+            db.rollback()
+            print(f"procedure: skipped ({str(e).splitlines()[0][:100]})")
+        cases["name join"] = (name_join, name_join)
+
+        print(f"{'backend':<12} {'first page ms':>14} {'all pages ms':>13}")
+        results = {}
+        for backend, (first, every) in cases.items():
+            results[backend] = median_ms(first, args.repeat)
+            print(f"{backend:<12} {results[backend]:>14.3f} {median_ms(every, max(1, args.repeat // 10)):>13.2f}")
+
+        print(f"\ncache hits / misses: {affiliation_lookup.stats()}")
+        best = min((b for b in results if b in affiliation_lookup.BACKENDS), key=results.get)
+        print(f"fastest first page: AFFILIATION_LOOKUP={best}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Sync vs async handler throughput, in-process (no network).
+#
+#   python benchmarks/bench_async.py --clients 500 --requests 5000
+#
+# Fires the same GET at /people/{id} (threadpool) and /async/people/{id}
+# (event loop) from N concurrent clients and prints requests/sec for each.
+# Needs httpx and the async driver for your database (aiomysql / aiosqlite).
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from api import app  # noqa: E402
+
+
+async def run(path: str, clients: int, total: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path)  # warm-up: pool connect, route compile
+        remaining = iter(range(total))
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                r = await client.get(path)
+                if r.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    return total / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--path", default="/people/1")
+    args = parser.parse_args()
+
+    for label, path in (("sync ", args.path), ("async", "/async" + args.path)):
+        rps, errors = asyncio.run(run(path, args.clients, args.requests))
+        print(f"{label} {path:<24} {rps:8.0f} req/s  ({errors} errors, {args.clients} clients)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Pre-encoded get-by-id bodies (blobs.py) vs encoding every request, in-process.
+#
+#   python benchmarks/bench_blobs.py --database sqlite:////tmp/sw.sqlite
+#   python benchmarks/bench_blobs.py --database sqlite:////tmp/sw.sqlite --hot 5000 --requests 20000
+#
+# Each run GETs /characters/{id}, /people/{id} and /films/{id} with ids
+# drawn from a hot set of --hot ids per route (Zipf-like: a few ids get
+# most requests), first with JSON_BLOBS off, then on (from an empty
+# store, so the on-run includes its misses). Reports p50 / p99, req/s and
+# the store's hit ratio and bytes, and checks that every body served from
+# the store equals the encoded one. Exits 1 on any difference.
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_endpoints import percentile  # noqa: E402
+
+ROUTES = {"/characters": "characters", "/people": "people", "/films": "films"}
+
+
+def request_paths(ids_by_route, total: int, seed: int):
+    rng = random.Random(seed)
+    routes = list(ids_by_route)
+    paths = []
+    for _ in range(total):
+        route = rng.choice(routes)
+        ids = ids_by_route[route]
+        paths.append(f"{route}/{ids[min(int(rng.paretovariate(1.2)) - 1, len(ids) - 1)]}")
+    return paths
+
+
+async def run(client, paths, concurrency: int):
+    latencies, bodies = [], {}
+    remaining = iter(paths)
+
+    async def worker():
+        for path in remaining:
+            start = time.perf_counter()
+            r = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            bodies.setdefault(path, r.content)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ms = sorted(v * 1000 for v in latencies)
+    return {"p50": percentile(ms, 50), "p99": percentile(ms, 99), "rps": len(paths) / elapsed}, bodies
+
+
+async def main_async(args) -> int:
+    import httpx
+    from sqlalchemy import text
+
+    import blobs
+    from api import app
+    from database import engine
+
+    ids_by_route = {}
+    with engine.connect() as conn:
+        for route, table in ROUTES.items():
+            pk = {"characters": "character_id", "people": "person_id", "films": "film_id"}[table]
+            ids = conn.execute(text(f"SELECT {pk} FROM {table} ORDER BY {pk} LIMIT :n"), {"n": args.hot}).scalars().all()
+            if ids:
+                ids_by_route[route] = random.Random(1).sample(ids, len(ids))
+    paths = request_paths(ids_by_route, args.requests, seed=2)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {}
+        for enabled in (False, True):
+            blobs.ENABLED = enabled
+            results[enabled] = await run(client, paths, args.concurrency)
+            stats, _ = results[enabled]
+            print(f"JSON_BLOBS={int(enabled)}  p50 {stats['p50']:7.2f}ms  p99 {stats['p99']:7.2f}ms  "
+                  f"{stats['rps']:8.1f} req/s")
+    stats = blobs.blob_store.stats()
+    print(f"store: {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KiB, hit ratio {stats['hit_ratio']}, "
+          f"{stats['evictions']} evictions")
+    different = sum(results[False][1][p] != body for p, body in results[True][1].items())
+    if different:
+        print(f"FAIL  {different} bodies differ between the two runs")
+    return 1 if different else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="DATABASE_URL (default: env / database.py)")
+    parser.add_argument("--hot", type=int, default=2000, help="ids per route that receive traffic")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    os.environ.setdefault("DB_ECHO", "0")
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# Per-endpoint latency / throughput benchmark, in-process (no network).
+#
+#   python starwars.py generate /tmp/sw --scale 10 && DATABASE_URL=sqlite:////tmp/sw.sqlite python starwars.py load /tmp/sw
+#   python benchmarks/bench_endpoints.py --database sqlite:////tmp/sw.sqlite --out bench.json
+#   python benchmarks/bench_endpoints.py --database sqlite:////tmp/sw.sqlite --compare bench.json
+#
+# Runs each GET endpoint --requests times from --concurrency clients through
+# the ASGI app and reports p50/p95/p99 latency and requests/sec. Results are
+# written as JSON (tagged with the git commit) so runs on different commits
+# can be compared with --compare.
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_ENDPOINTS = [
+    "/people",
+    "/people/1",
+    "/species",
+    "/affiliations",
+    "/characters",
+    "/characters?limit=500",
+    "/characters/1",
+    "/characters/detailed/all",
+    "/franchise",
+    "/films",
+    "/films/1",
+    "/planets",
+    "/tvseries",
+    "/books",
+    "/games",
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def measure(client, path, total, concurrency):
+    await client.get(path)  # warm-up
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            r = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            if r.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+    }
+
+
+async def run_all(app, endpoints, total, concurrency):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in endpoints:
+            results[path] = await measure(client, path, total, concurrency)
+            r = results[path]
+            print(f"{path:<32} p50 {r['p50_ms']:8.2f}ms  p95 {r['p95_ms']:8.2f}ms  "
+                  f"p99 {r['p99_ms']:8.2f}ms  {r['rps']:9.1f} req/s  {r['errors']} errors")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} (commit {baseline['meta'].get('commit')})")
+    for path, now in current.items():
+        before = baseline["results"].get(path)
+        if not before:
+            continue
+        p95 = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0
+        rps = (now["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0
+        flag = "  <-- regression" if p95 > 10 or rps < -10 else ""
+        print(f"{path:<32} p95 {p95:+7.1f}%  rps {rps:+7.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="DATABASE_URL to benchmark (default: env / database.py)")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--endpoint", action="append", dest="endpoints", help="repeatable; default: built-in list")
+    parser.add_argument("--no-cache", action="store_true", help="CACHE_BACKEND=off")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    if args.no_cache:
+        os.environ["CACHE_BACKEND"] = "off"
+    os.environ.setdefault("DB_ECHO", "0")
+
+    from api import app
+    from database import engine
+
+    endpoints = args.endpoints or DEFAULT_ENDPOINTS
+    results = asyncio.run(run_all(app, endpoints, args.requests, args.concurrency))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": engine.url.render_as_string(hide_password=True),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cache": os.getenv("CACHE_BACKEND", "memory"),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nresults written to {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
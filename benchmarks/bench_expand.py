@@ -0,0 +1,84 @@
+# SQL statements per request for ?expand=, in-process (no network).
+#
+#   python benchmarks/bench_expand.py --database sqlite:////tmp/sw.sqlite
+#
+# Counts the statements each list request sends to the database (engine
+# before_cursor_execute) at several page sizes, next to the N+1 a client
+# pays without expand (one request per related row). Exits 1 if any
+# expansion's statement count grows with the page size.
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CASES = [
+    "/characters",
+    "/characters?expand=person",
+    "/characters?expand=person,species,affiliation",
+    "/franchise",
+    "/franchise?expand=films",
+    "/franchise?expand=films,tv_series,books,games",
+]
+
+PAGE_SIZES = (10, 100, 500)
+
+
+async def count_statements(app, engine, path: str, limit: int):
+    """(statements, rows) for one GET"""
+    import httpx
+    from sqlalchemy import event
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sep = "&" if "?" in path else "?"
+        await client.get(f"{path}{sep}limit=1")  # warm-up: pool connect, mapper setup
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            r = await client.get(f"{path}{sep}limit={limit}")
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+    r.raise_for_status()
+    return len(statements), len(r.json()["items"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="DATABASE_URL to benchmark (default: env / database.py)")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    os.environ.setdefault("DB_ECHO", "0")
+    os.environ["CACHE_BACKEND"] = "off"  # count real queries, not cache hits
+
+    from api import app
+    from database import engine
+
+    print(f"{'request':<48} " + " ".join(f"{'limit=' + str(n):>16}" for n in PAGE_SIZES))
+    failures = 0
+    for path in CASES:
+        cells, counts = [], set()
+        for limit in PAGE_SIZES:
+            statements, rows = asyncio.run(count_statements(app, engine, path, limit))
+            counts.add(statements)
+            cells.append(f"{statements:>3} sql {rows:>3} rows")
+        flag = "" if len(counts) == 1 else "  <-- grows with page size"
+        failures += bool(flag)
+        print(f"{path:<48} " + " ".join(f"{c:>16}" for c in cells) + flag)
+
+    expansions = 3
+    print(f"\nwithout expand a client fetching {PAGE_SIZES[-1]} characters with person/species/affiliation "
+          f"makes up to {1 + expansions * PAGE_SIZES[-1]} requests (one statement each)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
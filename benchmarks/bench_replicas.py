@@ -0,0 +1,119 @@
+# Read-replica routing (replicas.py) against local SQLite copies, in-process.
+#
+#   python benchmarks/bench_replicas.py --primary /tmp/sw.sqlite --replicas 3
+#   python benchmarks/bench_replicas.py --primary /tmp/sw.sqlite --replicas 3 --strategy least_connections
+#
+# Copies the primary file to N replica files (no replication between them,
+# which makes routing visible: a row written to the primary is missing on
+# every replica). Adds one replica URL that cannot be opened. Then checks:
+#   - GETs are spread over the healthy replicas; the broken one gets none
+#   - POSTs go to the primary
+#   - the writing client reads its own write from the primary while its
+#     read-your-writes cookie lasts, and from a replica after it expires
+#   - a client that did not write reads from a replica
+# Exits 1 if any check fails.
+
+import argparse
+import asyncio
+import collections
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def run(app, replica_set, requests: int, concurrency: int, window: int) -> int:
+    import httpx
+
+    failures = 0
+
+    def check(label, ok):
+        nonlocal failures
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'}  {label}")
+
+    replica_set.start()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as reader, \
+                httpx.AsyncClient(transport=transport, base_url="http://bench") as writer:
+            nodes = collections.Counter()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def get(i):
+                async with semaphore:
+                    r = await reader.get(f"/characters?limit=20&after={i % 5}")
+                    nodes[r.headers["x-db-node"]] += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(get(i) for i in range(requests)))
+            elapsed = time.perf_counter() - start
+            print(f"{requests} GETs, concurrency {concurrency}, {elapsed:.2f}s: "
+                  + ", ".join(f"{node} {count}" for node, count in sorted(nodes.items())))
+            healthy = [r.name for r in replica_set.replicas if r.healthy]
+            check("GETs served by healthy replicas only", set(nodes) == set(healthy))
+            check("broken replica marked down", not all(r.healthy for r in replica_set.replicas))
+
+            created = await writer.post("/species", json={"name": f"Replica probe {time.time()}", "classification": "x"})
+            check("POST routed to the primary", created.headers["x-db-node"] == "primary")
+            species_id = created.json()["species_id"]
+
+            own = await writer.get(f"/species/{species_id}")
+            check(f"writer reads its write from the primary (got {own.status_code}, {own.headers['x-db-node']})",
+                  own.status_code == 200 and own.headers["x-db-node"] == "primary")
+            other = await reader.get(f"/species/{species_id}")
+            check(f"other client reads from a replica (got {other.status_code}, {other.headers['x-db-node']})",
+                  other.headers["x-db-node"] != "primary")
+
+            await asyncio.sleep(window + 0.5)
+            later = await writer.get(f"/species/{species_id}")
+            check(f"after {window}s the writer reads from a replica again ({later.headers['x-db-node']})",
+                  later.headers["x-db-node"] != "primary")
+    finally:
+        replica_set.stop()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--primary", required=True, help="SQLite file used as the primary (left unchanged)")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--strategy", default="round_robin", choices=("round_robin", "least_connections"))
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="sw-replicas-")
+    primary = os.path.join(workdir, "primary.sqlite")
+    shutil.copy(args.primary, primary)
+    urls = []
+    for i in range(args.replicas):
+        path = os.path.join(workdir, f"replica{i + 1}.sqlite")
+        shutil.copy(args.primary, path)
+        urls.append(f"sqlite:///{path}")
+    urls.append(f"sqlite:///{workdir}/missing/dir/replica.sqlite")  # cannot be opened
+
+    window = 1
+    os.environ["DATABASE_URL"] = f"sqlite:///{primary}"
+    os.environ["DATABASE_REPLICA_URLS"] = ",".join(urls)
+    os.environ["DB_REPLICA_STRATEGY"] = args.strategy
+    os.environ["DB_READ_YOUR_WRITES"] = str(window)
+    os.environ.setdefault("DB_ECHO", "0")
+    os.environ["CACHE_BACKEND"] = "off"  # every GET reaches a database
+
+    from api import app
+    from replicas import replica_set
+
+    try:
+        failures = asyncio.run(run(app, replica_set, args.requests, args.concurrency, window))
+        print(replica_set.status())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# Latency of search.search() (GET /search without HTTP), in-process.
+#
+#   python starwars.py generate /tmp/sw --characters 1000000
+#   DATABASE_URL=sqlite:////tmp/sw.sqlite python starwars.py load /tmp/sw
+#   DATABASE_URL=sqlite:////tmp/sw.sqlite python starwars.py search rebuild
+#   python benchmarks/bench_search.py --database sqlite:////tmp/sw.sqlite
+#
+# Queries are drawn from indexed titles: whole words, 1-6 character
+# prefixes, words with one typo, two-word queries and misses. Reports
+# p50/p95/p99 per query class and overall; exits 1 if the overall p99 is
+# above --target milliseconds.
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word))
+    return word[:i] + word[i + 1:] if rng.random() < 0.5 else word[:i] + "x" + word[i:]
+
+
+def make_queries(titles, n: int, rng: random.Random):
+    """[(class, query)] built from sample titles"""
+    from search import tokenize
+
+    words = [w for t in titles for w in tokenize(t or "")]
+    alpha = [w for w in words if w.isalpha() and len(w) >= 4] or ["luke"]
+    queries = []
+    for _ in range(n):
+        word = rng.choice(words)
+        queries += [
+            ("word", word),
+            ("prefix", word[:rng.randint(1, 6)]),
+            ("typo", typo(rng.choice(alpha), rng)),
+            ("two words", " ".join(tokenize(rng.choice(titles) or "x")[:2])),
+            ("miss", "zq" + word),
+        ]
+    rng.shuffle(queries)
+    return queries
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="DATABASE_URL to benchmark (default: env / database.py)")
+    parser.add_argument("--queries", type=int, default=200, help="queries per class")
+    parser.add_argument("--target", type=float, default=10.0, help="p99 budget in ms")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    os.environ.setdefault("DB_ECHO", "0")
+
+    import search
+    from database import engine
+
+    print(search.status())
+    with engine.connect() as conn:
+        titles = [row[0] for row in conn.exec_driver_sql(
+            "SELECT title FROM search_fts WHERE rowid IN "
+            "(SELECT abs(random()) % (SELECT max(rowid) FROM search_fts) FROM search_fts LIMIT 500)"
+        )]
+    rng = random.Random(7)
+    queries = make_queries(titles, args.queries, rng)
+
+    search.search("warm up skywalkr")  # pool connect, vocabulary load
+    timings = {}
+    for kind, q in queries:
+        start = time.perf_counter()
+        search.search(q)
+        timings.setdefault(kind, []).append((time.perf_counter() - start) * 1000)
+
+    everything = [t for values in timings.values() for t in values]
+    print(f"\n{'class':<10} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for kind, values in list(timings.items()) + [("all", everything)]:
+        print(f"{kind:<10} {len(values):>6} {percentile(values, 50):>8.2f} {percentile(values, 95):>8.2f} "
+              f"{percentile(values, 99):>8.2f} {max(values):>8.2f}")
+    p99 = percentile(everything, 99)
+    print(f"\np99 {p99:.2f} ms (target {args.target} ms)")
+    return 0 if p99 <= args.target else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Before/after CPU cost of serializing /characters, in-process (no network).
+#
+#   python starwars.py generate /tmp/sw --characters 100000
+#   DATABASE_URL=sqlite:////tmp/sw.sqlite python starwars.py load /tmp/sw
+#   python benchmarks/bench_serialization.py --database sqlite:////tmp/sw.sqlite
+#
+# "before" is the old handler: ORM instances returned to FastAPI, which runs
+# jsonable_encoder + json.dumps. "after" is the current /characters route:
+# column tuples -> dicts -> orjson (serialization.fast_json). Both walk every
+# page of the table (--limit rows per request), sequentially, and report
+# process CPU time per request and for the whole 100k-row walk. A second
+# table times only the serialize step for all rows in one document.
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def add_before_route(app, get_db):
+    """Register the pre-fast-path implementation at /bench/characters-orm"""
+    from fastapi import Depends
+    from orm_models import Character
+    from pagination import PageParams, paginate
+
+    @app.get("/bench/characters-orm", include_in_schema=False)
+    def characters_orm(page: PageParams = Depends(), db=Depends(get_db)):
+        return paginate(db.query(Character), Character.character_id, page)
+
+
+async def walk(app, path: str, limit: int):
+    """GET every page of path; return (requests, rows, cpu seconds, wall seconds)"""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(f"{path}?limit=1")  # warm-up
+        requests = rows = 0
+        cursor = None
+        cpu, wall = time.process_time(), time.perf_counter()
+        while True:
+            url = f"{path}?limit={limit}" + (f"&after={cursor}" if cursor else "")
+            body = (await client.get(url)).json()
+            requests += 1
+            rows += len(body["items"])
+            cursor = body["next_cursor"]
+            if not cursor:
+                break
+        return requests, rows, time.process_time() - cpu, time.perf_counter() - wall
+
+
+def serialize_only():
+    """CPU seconds to turn the whole characters table into JSON bytes, each way"""
+    from fastapi.encoders import jsonable_encoder
+    from database import SessionLocal
+    from orm_models import Character
+    from serialization import FastJSONResponse
+
+    columns = list(Character.__table__.columns)
+    results = {}
+    for name, build in (
+        ("before", lambda db: json.dumps(jsonable_encoder(db.query(Character).all())).encode()),
+        ("after", lambda db: FastJSONResponse([r._asdict() for r in db.query(*columns).all()]).body),
+    ):
+        db = SessionLocal()
+        try:
+            start = time.process_time()
+            body = build(db)
+            results[name] = (time.process_time() - start, len(body))
+        finally:
+            db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="DATABASE_URL to benchmark (default: env / database.py)")
+    parser.add_argument("--limit", type=int, default=500, help="page size per request")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    os.environ.setdefault("DB_ECHO", "0")
+    os.environ.setdefault("CACHE_BACKEND", "off")
+
+    from api import app, get_db
+
+    add_before_route(app, get_db)
+
+    print(f"{'':<8} {'requests':>9} {'rows':>9} {'cpu ms/req':>11} {'cpu s total':>12} {'wall s':>8}")
+    walks = {}
+    for name, path in (("before", "/bench/characters-orm"), ("after", "/characters")):
+        requests, rows, cpu, wall = asyncio.run(walk(app, path, args.limit))
+        walks[name] = cpu
+        print(f"{name:<8} {requests:>9} {rows:>9} {cpu / requests * 1000:>11.2f} {cpu:>12.2f} {wall:>8.2f}")
+    print(f"speed-up (cpu): {walks['before'] / walks['after']:.1f}x")
+
+    print("\nserialize all rows in one document")
+    single = serialize_only()
+    for name, (cpu, size) in single.items():
+        print(f"{name:<8} {cpu * 1000:>9.0f} ms cpu  {size / 1e6:.1f} MB")
+    print(f"speed-up (cpu): {single['before'][0] / single['after'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# Catalogue snapshot (snapshot.py) vs the database path, in-process.
+#
+#   python benchmarks/bench_snapshot.py --database sqlite:////tmp/sw.sqlite
+#   python benchmarks/bench_snapshot.py --database sqlite:////tmp/sw.sqlite --requests 1000
+#
+# Reports, per catalogue table:
+#   - memory per row: the snapshot (columns + pk / FK indexes) next to the
+#     same rows held as plain dicts (what a row cache would keep)
+#   - get-by-id latency: TableSnapshot.get() vs serialization.fetch_row()
+#     on a pooled session, random ids
+# Then, through the ASGI app with the response cache off, p50 / p99 and
+# req/s of catalogue routes from the database and from the snapshot, and
+# checks that both paths return the same JSON. Exits 1 on any difference.
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_endpoints import measure  # noqa: E402
+
+ENDPOINTS = [
+    "/franchise",
+    "/franchise/1?expand=films,tv_series,books,games",
+    "/films?sort=-box_office&limit=20",
+    "/films?franchise_id=1",
+    "/films/1",
+    "/planets?region__startswith=Out&limit=50",
+    "/planets/1",
+    "/books?sort=title&limit=100",
+    "/games?release_year__gte=2010",
+    "/species",
+    "/stats/box-office",
+]
+
+
+def dict_bytes(rows) -> int:
+    return sum(sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row.values()) for row in rows)
+
+
+def memory_and_lookups(store, lookups: int):
+    from database import SessionLocal
+    from serialization import fetch_row
+
+    print(f"{'table':<13} {'rows':>6} {'snapshot B/row':>15} {'dicts B/row':>12} "
+          f"{'get() us':>9} {'fetch_row() us':>15}")
+    db = SessionLocal()
+    try:
+        for name, model in store.models.items():
+            table = store.table(name)
+            if not table.rows:
+                continue
+            rows = [table.row(i) for i in range(table.rows)]
+            ids = random.choices(list(table.offsets), k=lookups)
+
+            start = time.perf_counter()
+            for pk_value in ids:
+                table.get(pk_value)
+            in_memory = (time.perf_counter() - start) / lookups
+
+            sample = ids[: max(1, lookups // 10)]
+            start = time.perf_counter()
+            for pk_value in sample:
+                fetch_row(db, model, pk_value)
+            database = (time.perf_counter() - start) / len(sample)
+
+            print(f"{name:<13} {table.rows:>6} {table.nbytes / table.rows:>15.1f} {dict_bytes(rows) / table.rows:>12.1f} "
+                  f"{in_memory * 1e6:>9.2f} {database * 1e6:>15.1f}")
+    finally:
+        db.close()
+
+
+async def routes(app, snapshot, requests: int, concurrency: int) -> int:
+    import httpx
+
+    failures = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"\n{'route':<50} {'db p50':>8} {'snap p50':>9} {'db p99':>8} {'snap p99':>9} {'db req/s':>9} {'snap req/s':>10}")
+        for path in ENDPOINTS:
+            results, bodies = {}, {}
+            for mode in (False, True):
+                snapshot.ENABLED = mode
+                url = path
+                if path.startswith("/stats"):  # the live GROUP BY, not the rollup table
+                    url += ("&" if "?" in path else "?") + ("source=snapshot" if mode else "source=live")
+                body = (await client.get(url)).json()
+                if isinstance(body, dict):
+                    body.pop("source", None)
+                bodies[mode] = body
+                results[mode] = await measure(client, url, requests, concurrency)
+            same = bodies[False] == bodies[True]
+            failures += not same
+            db, mem = results[False], results[True]
+            print(f"{path:<50} {db['p50_ms']:>7.2f}ms {mem['p50_ms']:>8.2f}ms {db['p99_ms']:>7.2f}ms "
+                  f"{mem['p99_ms']:>8.2f}ms {db['rps']:>9.0f} {mem['rps']:>10.0f}{'' if same else '  DIFFERENT JSON'}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="DATABASE_URL (default: env / database.py)")
+    parser.add_argument("--requests", type=int, default=300, help="requests per route and mode")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=20000, help="get-by-id calls per table")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    os.environ.setdefault("DB_ECHO", "0")
+    os.environ["CACHE_BACKEND"] = "off"  # compare the database with the snapshot, not with the cache
+
+    import snapshot
+    from api import app
+
+    memory_and_lookups(snapshot.store, args.lookups)
+    failures = asyncio.run(routes(app, snapshot, args.requests, args.concurrency))
+    status = snapshot.store.status()
+    print(f"\nsnapshot: {status['rows']} rows, {status['bytes'] / 1024:.0f} KiB, {status['bytes_per_row']} B/row, "
+          f"{status['reloads']} loads")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
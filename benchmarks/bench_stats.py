@@ -0,0 +1,90 @@
+# /stats/* from stats_rollup vs a live GROUP BY, plus the trigger cost on writes.
+#
+#   python starwars.py generate /tmp/sw --characters 1000000
+#   DATABASE_URL=sqlite:////tmp/sw.sqlite python starwars.py load /tmp/sw
+#   DATABASE_URL=sqlite:////tmp/sw.sqlite python starwars.py stats rebuild
+#   python benchmarks/bench_stats.py --database sqlite:////tmp/sw.sqlite
+#
+# Read side: median wall time of each stats query, source=rollup vs
+# source=live, and whether both return the same rows. Write side: time to
+# insert --writes characters in one transaction with and without the
+# stats triggers (rolled back, the database is left unchanged).
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def median_ms(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def insert_ms(engine, rows: int) -> float:
+    """Insert rows characters in one transaction, roll back; wall ms"""
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        tx = conn.begin()
+        person, species, affiliation = conn.exec_driver_sql(
+            "SELECT person_id, species_id, affiliation_id FROM characters LIMIT 1").one()
+        start = time.perf_counter()
+        conn.execute(
+            text("INSERT INTO characters (name, person_id, species_id, affiliation_id) VALUES (:n, :p, :s, :a)"),
+            [{"n": f"bench {i}", "p": person, "s": species, "a": affiliation} for i in range(rows)],
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        tx.rollback()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="DATABASE_URL to benchmark (default: env / database.py)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--writes", type=int, default=10000, help="characters inserted for the write-cost test")
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    os.environ.setdefault("DB_ECHO", "0")
+
+    import stats
+    from database import engine
+
+    cases = [
+        ("box-office by franchise", lambda s: stats.box_office("franchise", s)),
+        ("box-office by rating", lambda s: stats.box_office("rating", s)),
+        ("releases", lambda s: stats.releases(None, s)),
+        ("seasons", lambda s: stats.seasons(s)),
+        ("characters by affiliation", lambda s: stats.characters("affiliation", s)),
+        ("characters by species", lambda s: stats.characters("species", s)),
+    ]
+    print(f"{'query':<28} {'groups':>7} {'rollup ms':>10} {'live ms':>10} {'speed-up':>9}  same")
+    for name, run in cases:
+        rollup_ms, rollup_rows = median_ms(lambda: run("rollup"), args.repeat)
+        live_ms, live_rows = median_ms(lambda: run("live"), args.repeat)
+        print(f"{name:<28} {len(rollup_rows):>7} {rollup_ms:>10.2f} {live_ms:>10.2f} "
+              f"{live_ms / rollup_ms:>8.0f}x  {rollup_rows == live_rows}")
+
+    print(f"\ninsert {args.writes} characters (one transaction, rolled back)")
+    with_triggers = insert_ms(engine, args.writes)
+    stats.uninstall()
+    try:
+        without = insert_ms(engine, args.writes)
+    finally:
+        stats.install()
+    print(f"with stats triggers    {with_triggers:>9.1f} ms  ({with_triggers * 1000 / args.writes:.1f} us/row)")
+    print(f"without stats triggers {without:>9.1f} ms  ({without * 1000 / args.writes:.1f} us/row)")
+
+
+if __name__ == "__main__":
+    main()
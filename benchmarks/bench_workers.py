@@ -0,0 +1,148 @@
+# Throughput / memory of `starwars.py serve` at 1, 2, 4, 8 workers, over real HTTP.
+#
+#   python benchmarks/bench_workers.py --database sqlite:////tmp/sw.sqlite
+#   python benchmarks/bench_workers.py --database sqlite:////tmp/sw.sqlite --workers 1 4 --seconds 20 --clients 8
+#
+# For each worker count: starts the server on a free port, waits for
+# /metrics/startup, then runs --clients load processes (one keep-alive
+# connection each) for --seconds over a mix of GET endpoints. Reports
+# requests/sec, p50 / p99 latency, and per-worker memory: RSS, and PSS from
+# /proc/<pid>/smaps_rollup (shared pages counted 1/N per process - the
+# number that shows what the pre-fork sharing saves). The load generators
+# share the machine with the server, so compare runs on the same host.
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = ["/species", "/species/1", "/affiliations", "/planets/1", "/franchise", "/people/1",
+         "/characters?limit=20", "/characters/1", "/films", "/films/1"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _client(base_url: str, seconds: float, queue):
+    import httpx
+
+    latencies, errors = [], 0
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        deadline = time.perf_counter() + seconds
+        i = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                errors += client.get(PATHS[i % len(PATHS)]).status_code >= 500
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+            i += 1
+    queue.put((latencies, errors))
+
+
+def _memory(pid: int) -> dict:
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in ("Rss", "Pss"):
+                    values[name.lower()] = int(rest.split()[0]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+def _children(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def run(workers: int, args) -> dict:
+    import httpx
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "DATABASE_URL": args.database, "DB_ECHO": "0"}
+    server = subprocess.Popen(
+        [sys.executable, "starwars.py", "serve", "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"{base_url}/metrics/startup", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise SystemExit(f"server with {workers} workers did not start")
+            time.sleep(0.2)
+        pids = _children(server.pid)
+        while len(pids) < workers and time.monotonic() < deadline:
+            time.sleep(0.2)
+            pids = _children(server.pid)
+        time.sleep(1)  # every worker through its startup
+
+        queue = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=_client, args=(base_url, args.seconds, queue)) for _ in range(args.clients)]
+        for c in clients:
+            c.start()
+        results = [queue.get() for _ in clients]
+        for c in clients:
+            c.join()
+        memory = [_memory(pid) for pid in pids]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    latencies = sorted(t for lat, _ in results for t in lat)
+    n = len(latencies)
+    return {
+        "workers": workers,
+        "requests": n,
+        "errors": sum(e for _, e in results),
+        "rps": n / args.seconds,
+        "p50_ms": latencies[n // 2] * 1000 if n else 0,
+        "p99_ms": latencies[min(n - 1, int(n * 0.99))] * 1000 if n else 0,
+        "rss_mb": sum(m.get("rss", 0) for m in memory) / max(len(memory), 1),
+        "pss_mb": sum(m.get("pss", 0) for m in memory) / max(len(memory), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", default=os.getenv("DATABASE_URL"), required=not os.getenv("DATABASE_URL"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=8, help="load generator processes")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} clients, {args.seconds:g}s per run")
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6} {'RSS/worker':>11} {'PSS/worker':>11}")
+    for workers in args.workers:
+        r = run(workers, args)
+        print(f"{r['workers']:>7} {r['rps']:>8.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['errors']:>6} "
+              f"{r['rss_mb']:>9.1f}MB {r['pss_mb']:>9.1f}MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from fastapi import Response
+
+from database import env_bool, env_int
+from serialization import fast_json
+
+# Pre-encoded JSON bodies for the get-by-id routes.
+#
+#   JSON_BLOBS=1                    keep encoded GET /<resource>/{id} bodies (default off)
+#   JSON_BLOBS_MAX_BYTES=33554432   memory budget; least recently used bodies go first
+#   JSON_BLOBS_TTL=300              seconds a body is served (0 = until invalidated)
+#
+# get_person, get_character, get_film and the other /{id} routes call
+# respond(): a hit returns the stored bytes as the response body - no
+# query, no row dict, no orjson call. A miss runs the route's usual load
+# (database, snapshot.py or the response cache), encodes once and keeps
+# the bytes. 404s and ?expand= are never stored. ETag / Last-Modified
+# still come from etag.conditional_get, which runs first.
+#
+# Invalidation, per (table, id):
+#   - the PUT / DELETE handlers discard their own id after commit; a
+#     DELETE also drops the tables whose foreign keys it set to NULL
+#     (films after a franchise, characters after a person / species /
+#     affiliation)
+#   - batch and /async writes (ids not at hand) drop the table
+#   - with change_log installed (changes.py), each worker follows the
+#     change feed and discards every changed (entity, pk): other workers'
+#     writes, loader.py and manual SQL included, within
+#     CHANGES_POLL_INTERVAL. That subscription counts as one open stream
+#     in /metrics/changes. Without change_log, a body written by another
+#     process can be served until JSON_BLOBS_TTL, like the in-process
+#     response cache.
+# A load that races a write to the same table is not stored.
+#
+# GET /metrics/blobs: hits, misses, entries, bytes, evictions.
+
+ENABLED = env_bool("JSON_BLOBS", False)
+MAX_BYTES = env_int("JSON_BLOBS_MAX_BYTES", 32 * 1024 * 1024)
+TTL = env_int("JSON_BLOBS_TTL", 300)
+
+ENTRY_OVERHEAD = 120  # key tuple, entry tuple and OrderedDict link, approximately
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class BlobStore:
+    """LRU of encoded bodies keyed by (table, id), bounded by total bytes"""
+
+    def __init__(self, max_bytes: int = MAX_BYTES, ttl: int = TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data = OrderedDict()  # (table, id) -> (body, expires)
+        self._epochs = {}           # table -> writes seen; a load spanning one is not stored
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(body: bytes) -> int:
+        return sys.getsizeof(body) + ENTRY_OVERHEAD
+
+    def get(self, table: str, pk_value: int) -> Optional[bytes]:
+        key = (table, pk_value)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                body, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return body
+                del self._data[key]
+                self.nbytes -= self._size(body)
+            self.misses += 1
+            return None
+
+    def epoch(self, table: str) -> int:
+        return self._epochs.get(table, 0)
+
+    def put(self, table: str, pk_value: int, body: bytes, epoch: int):
+        """Store body unless `table` was written since epoch() was read"""
+        size = self._size(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._epochs.get(table, 0) != epoch:
+                return
+            old = self._data.pop((table, pk_value), None)
+            if old is not None:
+                self.nbytes -= self._size(old[0])
+            self._data[(table, pk_value)] = (body, time.monotonic() + self.ttl if self.ttl else None)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self.nbytes -= self._size(evicted)
+                self.evictions += 1
+
+    def discard(self, table: str, pk_value: int):
+        """Forget one row's body (call after the commit that changed it)"""
+        with self._lock:
+            self._epochs[table] = self._epochs.get(table, 0) + 1
+            entry = self._data.pop((table, pk_value), None)
+            if entry is not None:
+                self.nbytes -= self._size(entry[0])
+                self.invalidations += 1
+
+    def drop(self, table: str):
+        """Forget every body of a table"""
+        with self._lock:
+            self._epochs[table] = self._epochs.get(table, 0) + 1
+            for key in [k for k in self._data if k[0] == table]:
+                self.nbytes -= self._size(self._data.pop(key)[0])
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_table = {}
+            for table, _ in self._data:
+                per_table[table] = per_table.get(table, 0) + 1
+        lookups = self.hits + self.misses
+        return {
+            "enabled": ENABLED,
+            "entries": len(self._data),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries_per_table": per_table,
+        }
+
+
+blob_store = BlobStore()
+
+
+def respond(table: str, pk_value: int, load: Callable[[], dict], response: Response) -> Response:
+    """Body of GET /<resource>/{id}: stored bytes, or load() encoded (and stored)"""
+    if not ENABLED:
+        return fast_json(load(), response)
+    body = blob_store.get(table, pk_value)
+    if body is not None:
+        out = Response(body, media_type="application/json")
+        out.headers.raw.extend(response.headers.raw)
+        return out
+    epoch = blob_store.epoch(table)
+    out = fast_json(load(), response)  # a 404 raises here: nothing stored
+    blob_store.put(table, pk_value, out.body, epoch)
+    return out
+
+
+async def follow_changes():
+    """Discard the body of every row in the change feed (lifespan task, JSON_BLOBS=1)"""
+    from changes import feed
+
+    try:
+        async for batch, _ in feed.follow(None):
+            for change in batch:
+                blob_store.discard(change["entity"], change["pk"])
+    except Exception as e:
+        logger.warning("JSON_BLOBS: not following change_log (%s); bodies written by other "
+                       "processes are served up to JSON_BLOBS_TTL", str(e).splitlines()[0])
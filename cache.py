@@ -0,0 +1,317 @@
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+# Read-through cache for rarely-changing reference tables (species,
+# affiliations, franchise, planets).
+#
+# Keys are namespaced per table and carry a generation number:
+#     species:<gen>:list:<after>:<limit>
+# Writes bump the generation, which orphans every older key for that table
+# at once (they age out via TTL / LRU). Deleting a parent row bumps the
+# tables whose foreign keys the delete set to NULL as well
+# (api.record_delete). This works the same for the
+# in-process backend and for Redis shared between workers.
+#
+#   CACHE_BACKEND=memory|redis|off   (default memory)
+#   CACHE_TTL=300                    seconds
+#   CACHE_MAX_ENTRIES=1024           in-process LRU bound
+#   REDIS_URL=redis://localhost:6379/0
+#
+# Under `python starwars.py serve` (prefork.py) the in-process backend is
+# shared between the forked workers in two ways: generation / version
+# counters live in SharedCounters, so a write in one worker invalidates
+# every worker's entries and ETags; and the reference entries warmed
+# before the fork are frozen into one FrozenEntries block that all
+# workers read, instead of each worker caching its own copy.
+#
+# Any other multi-worker server (uvicorn api:app --workers N, gunicorn)
+# needs CACHE_BACKEND=redis: each worker would keep its own counters, and a
+# write in one would leave the others serving the old body for CACHE_TTL.
+# A worker that finds itself in that setup logs a warning and runs with
+# the cache disabled (ResponseCache.refuse_unshared, at startup).
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def several_workers() -> bool:
+    """This process is one of several server workers (uvicorn --workers N
+    spawns them through multiprocessing; WEB_CONCURRENCY is the common
+    convention for the count)"""
+    return multiprocessing.parent_process() is not None or int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+
+
+def counters_shared(backend) -> bool:
+    """Whether a counter bumped in this process is seen by every worker"""
+    return backend.shared or not several_workers()
+
+
+class SharedCounters:
+    """Fixed set of int64 counters in anonymous shared memory (survives fork)"""
+
+    def __init__(self, keys: Iterable[str]):
+        self.slots = {key: i for i, key in enumerate(dict.fromkeys(keys))}
+        self._mem = mmap.mmap(-1, 8 * max(len(self.slots), 1))
+        self._lock = multiprocessing.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.slots
+
+    def get(self, key: str) -> int:
+        return struct.unpack_from("q", self._mem, 8 * self.slots[key])[0]
+
+    def set(self, key: str, value: int):
+        with self._lock:
+            struct.pack_into("q", self._mem, 8 * self.slots[key], value)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self.get(key) + 1
+            struct.pack_into("q", self._mem, 8 * self.slots[key], value)
+            return value
+
+
+class FrozenEntries:
+    """Read-only cache entries in one shared memory block.
+
+    Layout: entry count, then (key offset, key length, value offset, value
+    length) per entry sorted by key, then the keys and JSON values. get()
+    binary-searches the block itself, so nothing is copied per worker.
+    Entries never expire; a write bumps the namespace generation, which
+    changes the key and skips them.
+    """
+
+    ENTRY = struct.Struct("qqqq")
+
+    def __init__(self, items: dict, namespaces: Iterable[str]):
+        self.namespaces = frozenset(namespaces)
+        keys = sorted(items, key=str.encode)
+        values = [json.dumps(items[k], default=str).encode() for k in keys]
+        offset = 8 + self.ENTRY.size * len(keys)
+        table, data = [], []
+        for key, value in zip(keys, values):
+            key = key.encode()
+            table.append(self.ENTRY.pack(offset, len(key), offset + len(key), len(value)))
+            data += [key, value]
+            offset += len(key) + len(value)
+        blob = struct.pack("q", len(keys)) + b"".join(table) + b"".join(data)
+        self._mem = mmap.mmap(-1, max(len(blob), 1))
+        self._mem.write(blob)
+        self.count = len(keys)
+        self.nbytes = len(blob)
+        self.hits = 0
+
+    def _entry(self, i: int):
+        return self.ENTRY.unpack_from(self._mem, 8 + self.ENTRY.size * i)
+
+    def get(self, key: str):
+        wanted = key.encode()
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key_at, key_len, _, _ = self._entry(mid)
+            if self._mem[key_at:key_at + key_len] < wanted:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.count:
+            return None
+        key_at, key_len, value_at, value_len = self._entry(lo)
+        if self._mem[key_at:key_at + key_len] != wanted:
+            return None
+        self.hits += 1
+        return json.loads(self._mem[value_at:value_at + value_len])
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._counters = {}   # generation counters, never evicted
+        self._shared = None   # SharedCounters, see share_counters()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    @property
+    def shared(self) -> bool:
+        """Counters in SharedCounters (prefork.py), visible to every forked worker"""
+        return self._shared is not None
+
+    def counter(self, key: str) -> int:
+        if self._shared is not None and key in self._shared:
+            return self._shared.get(key)
+        return self._counters.get(key, 0)
+
+    def set_counter(self, key: str, value: int):
+        if self._shared is not None and key in self._shared:
+            return self._shared.set(key, value)
+        with self._lock:
+            self._counters[key] = value
+
+    def incr(self, key: str) -> int:
+        if self._shared is not None and key in self._shared:
+            return self._shared.incr(key)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def share_counters(self, shared: SharedCounters):
+        """Keep the counters named in `shared` there from now on (call before forking)"""
+        with self._lock:
+            for key in shared.slots:
+                shared.set(key, self._counters.pop(key, 0))
+            self._shared = shared
+
+    def pop_prefixed(self, prefixes) -> dict:
+        """Remove and return every live entry whose key starts with one of prefixes"""
+        with self._lock:
+            keys = [k for k in self._data if k.startswith(tuple(prefixes))]
+            return {k: self._data.pop(k)[0] for k in keys}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """Same interface on top of a redis-py (or fakeredis) client"""
+
+    shared = True
+
+    def __init__(self, client, prefix: str = "starwars:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        self.client.set(self.prefix + key, json.dumps(value, default=str), ex=ttl or None)
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def counter(self, key: str) -> int:
+        # Use a volatile-* maxmemory policy so Redis never evicts these
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def set_counter(self, key: str, value: int):
+        self.client.set(self.prefix + key, value)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: int = 300, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.frozen: Optional[FrozenEntries] = None
+
+    def _generation(self, namespace: str) -> int:
+        return self.backend.counter(f"{namespace}:gen")
+
+    def get_or_load(self, namespace: str, key: str, loader: Callable[[], Any]):
+        """Return the cached value or call loader() and cache its result.
+
+        loader must return something JSON-serialisable (not ORM objects) so
+        the value can live in Redis. Exceptions (e.g. 404) are not cached.
+        """
+        if not self.enabled:
+            return loader()
+        full_key = f"{namespace}:{self._generation(namespace)}:{key}"
+        if self.frozen is not None and namespace in self.frozen.namespaces:
+            value = self.frozen.get(full_key)
+            if value is not None:
+                self.hits += 1
+                return value
+        value = self.backend.get(full_key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader()
+        self.backend.set(full_key, value, self.ttl)
+        return value
+
+    def invalidate(self, namespace: str):
+        """Drop every cached entry for a table (call after commit)"""
+        if self.enabled:
+            self.backend.incr(f"{namespace}:gen")
+
+    def refuse_unshared(self) -> bool:
+        """Disable the cache if its counters are private to this worker; return enabled"""
+        if self.enabled and not counters_shared(self.backend):
+            logger.warning("response cache disabled: %s counters are per process and this is one of "
+                           "several workers; set CACHE_BACKEND=redis", type(self.backend).__name__)
+            self.enabled = False
+        return self.enabled
+
+    def freeze(self, namespaces: Iterable[str]) -> FrozenEntries:
+        """Move the current entries of `namespaces` into a FrozenEntries block
+        (in-process backend; prefork.py calls this after warm-up, before forking)"""
+        namespaces = tuple(namespaces)
+        prefixes = [f"{ns}:{self._generation(ns)}:" for ns in namespaces]
+        self.frozen = FrozenEntries(self.backend.pop_prefixed(prefixes), namespaces)
+        return self.frozen
+
+    def stats(self) -> dict:
+        stats = {"enabled": self.enabled, "backend": type(self.backend).__name__,
+                 "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+        if self.frozen is not None:
+            stats["frozen"] = {"entries": self.frozen.count, "bytes": self.frozen.nbytes, "hits": self.frozen.hits}
+        return stats
+
+
+def build_cache_from_env() -> ResponseCache:
+    kind = os.getenv("CACHE_BACKEND", "memory").lower()
+    ttl = int(os.getenv("CACHE_TTL", "300"))
+    if kind == "redis":
+        import redis  # optional dependency: pip install redis
+        client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+        return ResponseCache(RedisBackend(client), ttl=ttl)
+    backend = MemoryBackend(int(os.getenv("CACHE_MAX_ENTRIES", "1024")))
+    return ResponseCache(backend, ttl=ttl, enabled=kind != "off")
+
+
+response_cache = build_cache_from_env()
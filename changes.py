@@ -0,0 +1,336 @@
+import asyncio
+import logging
+from collections import deque
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, select
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketDisconnect
+
+import triggers
+from database import engine, env_int
+from serialization import dumps
+from orm_models import (
+    Affiliation, Book, ChangeLog, Character, Film, Franchise, Game, Person, Planet, Species, TVSeries,
+)
+
+# Change-data feed: what changed since version N.
+#
+#   python starwars.py changes install           # create change_log + triggers
+#   python starwars.py changes status
+#   python starwars.py changes prune --keep 100000
+#   CHANGES_REPLAY=1000          changes each worker keeps in memory for streams
+#   CHANGES_POLL_INTERVAL=1000   ms between change_log polls while a stream is open
+#   CHANGES_SETTLE_SECONDS=5     see "gaps" below
+#   CHANGES_MAX_STREAMS=500      open streams per worker (503 beyond)
+#
+# Triggers (triggers.py) on every API table append (entity, pk, op) to
+# change_log, so a change becomes visible exactly when the write does. The
+# autoincrement version is the cursor:
+#   GET /changes?since=<version>&entities=films,characters   one page + "next"
+#   GET /changes/stream?since=...     Server-Sent Events, id = version
+#                                     (Last-Event-ID resumes after a reconnect)
+#   WS  /changes/ws                   send {"since": .., "entities": [..]}, again
+#                                     at any time to change the subscription
+# entity is the table name (people, ..., tv_series, books, games).
+#
+# Streams share one ChangeFeed per worker. It polls change_log only while
+# a stream is open: right after a local write (record_write -> notify())
+# and every CHANGES_POLL_INTERVAL for writes made by other workers. The
+# last CHANGES_REPLAY changes sit in a ring buffer. A stream holds only a
+# cursor and pulls the next batch when the previous one has been sent, so
+# a slow client blocks nobody and costs no memory; one that falls behind
+# the buffer (or reconnects with an old Last-Event-ID) catches up from
+# change_log a page at a time.
+#
+# Gaps: a version is taken at INSERT but becomes visible at COMMIT, so with
+# concurrent writers (MySQL) version 11 can be visible before 10. A page
+# stops before a missing version younger than CHANGES_SETTLE_SECONDS;
+# older gaps are rolled-back writes and are skipped. A cursor older than
+# the pruned history raises CursorGone (HTTP 410): re-sync from the list
+# endpoints, then follow from "latest".
+
+REPLAY = env_int("CHANGES_REPLAY", 1000)
+POLL_INTERVAL = env_int("CHANGES_POLL_INTERVAL", 1000)
+SETTLE_SECONDS = env_int("CHANGES_SETTLE_SECONDS", 5)
+MAX_STREAMS = env_int("CHANGES_MAX_STREAMS", 500)
+PAGE_SIZE = 500
+
+TRACKED = (Person, Species, Affiliation, Character, Franchise, Film, Planet, TVSeries, Book, Game)
+ENTITIES = tuple(model.__tablename__ for model in TRACKED)
+TABLE = ChangeLog.__tablename__
+COLUMNS = (ChangeLog.version, ChangeLog.entity, ChangeLog.pk, ChangeLog.op, ChangeLog.changed_at)
+
+PAGE = select(*COLUMNS).where(ChangeLog.version > bindparam("since")) \
+    .order_by(ChangeLog.version).limit(bindparam("limit"))
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class CursorGone(LookupError):
+    pass
+
+
+def trigger_definitions():
+    """(name, CREATE TRIGGER sql) for the three triggers on every tracked table"""
+    definitions = []
+    for model in TRACKED:
+        table = model.__tablename__
+        pk = model.__table__.primary_key.columns[0].name
+        for suffix, event, op, row in (("ins", "INSERT", "insert", "NEW"),
+                                       ("upd", "UPDATE", "update", "NEW"),
+                                       ("del", "DELETE", "delete", "OLD")):
+            definitions.append(triggers.row_trigger(
+                f"trg_changes_{table}_{suffix}", f"AFTER {event}", table,
+                f"INSERT INTO {TABLE} (entity, pk, op, changed_at) "
+                f"VALUES ('{table}', {row}.{pk}, '{op}', CURRENT_TIMESTAMP);"
+            ))
+    return definitions
+
+
+def install(bind=engine):
+    """Create change_log (if missing) and (re)create its triggers"""
+    ChangeLog.__table__.create(bind, checkfirst=True)
+    with bind.begin() as conn:
+        triggers.replace(conn, trigger_definitions())
+
+
+def uninstall(bind=engine):
+    triggers.drop(bind, trigger_definitions())
+
+
+def prune(keep: int, bind=engine) -> int:
+    """Delete all but the newest `keep` changes; returns the rows deleted"""
+    with bind.begin() as conn:
+        latest = conn.execute(select(func.max(ChangeLog.version))).scalar() or 0
+        return conn.execute(delete(ChangeLog).where(ChangeLog.version <= latest - keep)).rowcount
+
+
+def parse_entities(values: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+    """Validated entity filter (None = everything); ValueError names the unknown ones"""
+    entities = frozenset(v.strip() for v in values or () if v and v.strip())
+    unknown = sorted(entities.difference(ENTITIES))
+    if unknown:
+        raise ValueError(f"Unknown entities {', '.join(unknown)}; tracked: {', '.join(ENTITIES)}")
+    return entities or None
+
+
+def _settled(rows, since: int, now) -> Tuple[list, bool]:
+    """rows up to the first missing version that may still commit; (rows, stopped early)"""
+    expected = since + 1 if since else None  # since=0: from the oldest kept
+    for i, row in enumerate(rows):
+        young = (now - row.changed_at).total_seconds() < SETTLE_SECONDS
+        if expected is not None and row.version != expected and young:
+            return rows[:i], True
+        expected = row.version + 1
+    return rows, False
+
+
+def read(since: int, limit: int = PAGE_SIZE, entities: Optional[FrozenSet[str]] = None, bind=engine) -> dict:
+    """One page of changes after version `since`.
+
+    Scans up to `limit` versions; with an entity filter the page holds only
+    the matching ones, and "next" still moves past the rest.
+    """
+    with bind.connect() as conn:
+        rows = conn.execute(PAGE, {"since": since, "limit": limit + 1}).all()
+        oldest, latest, now = conn.execute(
+            select(func.min(ChangeLog.version), func.max(ChangeLog.version), func.current_timestamp())
+        ).one()
+    if since and oldest is not None and oldest > since + 1:
+        raise CursorGone(f"changes after {since} were pruned (oldest kept: {oldest}); "
+                         f"re-sync and follow from {latest}")
+    settled, stopped = _settled(rows[:limit], since, now)
+    return {
+        "changes": [row._asdict() for row in settled if entities is None or row.entity in entities],
+        "next": settled[-1].version if settled else since,
+        "has_more": stopped or len(rows) > limit,
+        "latest": latest or 0,
+    }
+
+
+def latest_version(bind=engine) -> int:
+    with bind.connect() as conn:
+        return conn.execute(select(func.max(ChangeLog.version))).scalar() or 0
+
+
+def status(bind=engine) -> dict:
+    with bind.connect() as conn:
+        rows, oldest, latest, newest_at = conn.execute(select(
+            func.count(), func.min(ChangeLog.version), func.max(ChangeLog.version), func.max(ChangeLog.changed_at)
+        )).one()
+        installed = triggers.installed(conn, "trg_changes_")
+    return {
+        "rows": rows,
+        "oldest_version": oldest,
+        "latest_version": latest,
+        "last_change_at": newest_at,
+        "triggers": f"{installed}/{len(trigger_definitions())}",
+        **feed.status(),
+    }
+
+
+# ------------ live streams ------------
+class ChangeFeed:
+    """Per-worker poller + replay buffer behind /changes/stream and /changes/ws"""
+
+    def __init__(self, replay: int = REPLAY):
+        self.buffer = deque(maxlen=replay)
+        self.floor = None       # every change in (floor, latest] is in buffer; None = not primed
+        self.latest = 0
+        self.streams = 0
+        self.polls = 0
+        self.catch_up_reads = 0
+        self._loop = None
+        self._wake = None
+        self._changed = None
+        self._task = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._changed = asyncio.Condition()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """A write was committed in this worker: poll now (callable from any thread)"""
+        if self.streams and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), POLL_INTERVAL / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self.streams:
+                self.floor = None  # nobody listening: the buffer would go stale
+                continue
+            try:
+                await self._poll()
+            except Exception as e:
+                self.floor = None
+                logger.warning("change feed poll failed: %s", str(e).splitlines()[0])
+
+    async def _poll(self):
+        self.polls += 1
+        if self.floor is None:
+            self.buffer.clear()
+            self.floor = self.latest = await run_in_threadpool(latest_version)
+        else:
+            while True:
+                page = await run_in_threadpool(read, self.latest)
+                for change in page["changes"]:
+                    if len(self.buffer) == self.buffer.maxlen:
+                        self.floor = self.buffer[0]["version"]
+                    self.buffer.append(change)
+                self.latest = page["next"]
+                if not page["changes"] or not page["has_more"]:
+                    break
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _after(self, cursor: int, entities) -> Tuple[List[dict], int]:
+        if self.floor is not None and cursor >= self.floor:
+            picked = []
+            for change in reversed(self.buffer):
+                if change["version"] <= cursor:
+                    break
+                if entities is None or change["entity"] in entities:
+                    picked.append(change)
+            picked.reverse()
+            return picked, max(cursor, self.latest)
+        self.catch_up_reads += 1
+        page = await run_in_threadpool(read, cursor, PAGE_SIZE, entities)
+        return page["changes"], page["next"]
+
+    async def follow(self, since: Optional[int], entities: Optional[FrozenSet[str]] = None):
+        """Async generator of (changes, cursor) batches after version `since` (None = from now).
+
+        Raises CursorGone if `since` was pruned. The caller sends each batch
+        before asking for the next, which is the backpressure.
+        """
+        self.streams += 1
+        self._wake.set()
+        try:
+            cursor = since if since is not None else await run_in_threadpool(latest_version)
+            while True:
+                changes, after = await self._after(cursor, entities)
+                progressed, cursor = after > cursor, after
+                if changes:
+                    yield changes, cursor
+                elif not progressed or cursor >= self.latest:
+                    async with self._changed:
+                        await self._changed.wait()
+        finally:
+            self.streams -= 1
+
+    def status(self) -> dict:
+        return {
+            "streams": self.streams,
+            "buffered": len(self.buffer),
+            "buffer_floor": self.floor,
+            "buffer_latest": self.latest,
+            "polls": self.polls,
+            "catch_up_reads": self.catch_up_reads,
+        }
+
+
+feed = ChangeFeed()
+
+
+async def serve_websocket(websocket):
+    """/changes/ws session: each client message replaces the subscription,
+    resuming from the last version sent; batches go out as
+    {"changes": [...], "next": version}."""
+    await websocket.accept()
+    if feed.streams >= MAX_STREAMS:
+        await websocket.close(code=1013, reason="too many change streams")
+        return
+    cursor = None
+    try:
+        message = await websocket.receive_json()
+        while True:
+            try:
+                entities = parse_entities(message.get("entities"))
+                if message.get("since") is not None:
+                    cursor = int(message["since"])
+            except (AttributeError, TypeError, ValueError) as e:
+                await websocket.send_text(dumps({"error": "bad_request", "detail": str(e)}))
+                message = await websocket.receive_json()
+                continue
+
+            sent = {"cursor": cursor}
+
+            async def pump():
+                async for changes, after in feed.follow(sent["cursor"], entities):
+                    await websocket.send_text(dumps({"changes": changes, "next": after}))
+                    sent["cursor"] = after
+
+            pumping = asyncio.create_task(pump())
+            receiving = asyncio.create_task(websocket.receive_json())
+            done, _ = await asyncio.wait({pumping, receiving}, return_when=asyncio.FIRST_COMPLETED)
+            pumping.cancel()
+            await asyncio.gather(pumping, return_exceptions=True)
+            if receiving in done:
+                message = receiving.result()
+                cursor = sent["cursor"]
+                continue
+            receiving.cancel()
+            await asyncio.gather(receiving, return_exceptions=True)
+            pumping.result()  # CursorGone, or the error that ended the stream
+    except CursorGone as e:
+        await websocket.send_text(dumps({"error": "gone", "detail": str(e)}))
+        await websocket.close(code=4410)
+    except WebSocketDisconnect:
+        pass
@@ -1,9 +1,8 @@
-from database import engine, Base
-import orm_models  # ensure models are imported so metadata is populated
+from startup import create_schema
 
 def main():
-    Base.metadata.create_all(bind=engine)
-    print("DB tables created.")
+    version = create_schema()
+    print(f"DB tables created (schema version {version}).")
 
 if __name__ == "__main__":
     main()
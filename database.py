@@ -1,28 +1,110 @@
-from sqlalchemy import create_engine
+import datetime
+import os
+
+from sqlalchemy import create_engine, func, select
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from pool_metrics import InstrumentedQueuePool
+import profiling
 
-# SQLite (local file)  # (commented out now)
-# DATABASE_URL = "sqlite:///./starwars.sqlite"
+# SQLite (local file):
+#   DATABASE_URL=sqlite:///./starwars.sqlite
 
 # Use MySQL (ensure schema 'starwarsDB' exists): CREATE DATABASE starwarsDB;
 # Activate venv before using: .\.venv\Scripts\Activate.ps1
-DATABASE_URL = "mysql+pymysql://root:@localhost:3306/starwarsDB"
-
-engine = create_engine(
-    DATABASE_URL,
-    echo=True,
-    future=True,
-    pool_pre_ping=True
-)
+DATABASE_URL = os.getenv("DATABASE_URL", "mysql+pymysql://root:@localhost:3306/starwarsDB")
+
+def env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+# ------------ pool settings (env overridable) ------------
+# Size these per uvicorn worker: total connections = workers * (size + overflow).
+DB_ECHO = env_bool("DB_ECHO", False)     # log every statement (noisy, slow)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)   # extra round-trip per checkout
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", -1)        # seconds, -1 = never
+DB_POOL_TIMEOUT = env_int("DB_POOL_TIMEOUT", 30)        # seconds to wait for a free connection
+
+def make_engine(url):
+    """Engine with the pool settings above (the primary, and each read replica in replicas.py)"""
+    new_engine = create_engine(
+        url,
+        echo=DB_ECHO,
+        future=True,
+        poolclass=InstrumentedQueuePool,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    profiling.instrument(new_engine)  # statement timings when REQUEST_PROFILING=1
+    return new_engine
+
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
+# ------------ async engine (optional) ------------
+# Same database through an asyncio driver: aiomysql for MySQL, aiosqlite for
+# the bundled starwars.sqlite. Built lazily so the sync app keeps working
+# when the async drivers are not installed (pip install aiomysql aiosqlite).
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url):
+    """mysql+pymysql://... -> mysql+aiomysql://..., sqlite://... -> sqlite+aiosqlite://..."""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+_async_engine = None
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            to_async_url(engine.url),
+            echo=DB_ECHO,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+        profiling.instrument(_async_engine.sync_engine)
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
 def test_connection():
     with engine.connect() as conn:
         conn.execute(text("SELECT 1"))
     print("Connection successful!")
 
+def age_seconds(conn, ts):
+    """Seconds since ts, a CURRENT_TIMESTAMP written by a trigger, on the
+    database's own clock (CURRENT_TIMESTAMP is UTC on SQLite, server-local
+    time on MySQL)"""
+    if ts is None:
+        return None
+    now = conn.execute(select(func.current_timestamp())).scalar()
+    now, ts = (datetime.datetime.fromisoformat(v) if isinstance(v, str) else v for v in (now, ts))
+    return round((now - ts).total_seconds(), 1)
+
 def load_models():
     # Import to register tables with Base.metadata
     import orm_models  # noqa: F401
@@ -0,0 +1,128 @@
+import json
+import os
+import random
+from typing import Dict
+
+# Synthetic, referentially valid datasets for load testing.
+#
+#   python starwars.py generate out/ --characters 1000000 --people 200000
+#   python starwars.py load out/
+#
+# Writes one <table>.jsonl per table in loader.py's format: foreign keys
+# are written by name (franchise / species / affiliation / person), so the
+# output loads into an empty or an already-seeded database alike.
+# Affiliations and species are drawn from a Zipf-like distribution (a few
+# very popular, a long tail of rare ones), which is what the real data
+# looks like and what makes index selectivity interesting.
+
+DEFAULT_SIZES = {
+    "franchise": 10,
+    "species": 200,
+    "affiliations": 100,
+    "people": 20000,
+    "planets": 2000,
+    "films": 500,
+    "tv_series": 300,
+    "books": 5000,
+    "games": 1000,
+    "characters": 100000,
+}
+
+RATINGS = ["G", "PG", "PG-13", "R"]
+REGIONS = ["Core Worlds", "Colonies", "Inner Rim", "Mid Rim", "Outer Rim", "Wild Space", "Unknown Regions"]
+CLIMATES = ["Arid", "Temperate", "Frozen", "Tropical", "Urban", "Swamp", "Volcanic", "Ocean"]
+CLASSIFICATIONS = ["Mammal", "Humanoid", "Reptile", "Amphibian", "Insectoid", "Artificial", "Unknown"]
+ROLES = ["Jedi", "Sith", "Smuggler", "Pilot", "Senator", "Bounty Hunter", "Droid", "Soldier"]
+
+
+def zipf_weights(n: int, s: float = 1.1):
+    return [1.0 / (k ** s) for k in range(1, n + 1)]
+
+
+def _write(path: str, rows):
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+            count += 1
+    return count
+
+
+def generate(out_dir: str, sizes: Dict[str, int] = None, seed: int = 42, skew: float = 1.1) -> Dict[str, int]:
+    """Write <table>.jsonl files to out_dir; returns rows written per table"""
+    sizes = {**DEFAULT_SIZES, **(sizes or {})}
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+
+    def path(table):
+        return os.path.join(out_dir, table + ".jsonl")
+
+    franchises = [f"Franchise {i:04d}" for i in range(1, sizes["franchise"] + 1)]
+    species = [f"Species {i:05d}" for i in range(1, sizes["species"] + 1)]
+    affiliations = [f"Affiliation {i:05d}" for i in range(1, sizes["affiliations"] + 1)]
+    n_people = sizes["people"]
+
+    written["franchise"] = _write(path("franchise"), (
+        {"name": name, "description": f"Synthetic franchise {i}", "start_year": rng.randint(1977, 2024)}
+        for i, name in enumerate(franchises, 1)
+    ))
+    written["species"] = _write(path("species"), (
+        {"name": name, "classification": rng.choice(CLASSIFICATIONS)} for name in species
+    ))
+    written["affiliations"] = _write(path("affiliations"), (
+        {"name": name, "description": f"Synthetic affiliation {i}"} for i, name in enumerate(affiliations, 1)
+    ))
+    written["people"] = _write(path("people"), (
+        {"name": f"Person {i:08d}", "birth_year": f"{rng.randint(0, 900)}BBY", "role_type": rng.choice(ROLES)}
+        for i in range(1, n_people + 1)
+    ))
+    written["planets"] = _write(path("planets"), (
+        {"name": f"Planet {i:07d}", "region": rng.choice(REGIONS), "climate": rng.choice(CLIMATES)}
+        for i in range(1, sizes["planets"] + 1)
+    ))
+
+    franchise_w = zipf_weights(len(franchises), skew)
+
+    def pick_franchise():
+        return rng.choices(franchises, franchise_w)[0]
+
+    # films have no title column; box_office keeps the natural key unique
+    written["films"] = _write(path("films"), (
+        {"franchise": pick_franchise(), "rating": rng.choice(RATINGS), "box_office": 1_000_000 + i * 7919}
+        for i in range(1, sizes["films"] + 1)
+    ))
+
+    def tv(i):
+        start = rng.randint(1980, 2024)
+        return {"franchise": pick_franchise(), "title": f"Series {i:06d}", "start_year": start,
+                "end_year": start + rng.randint(0, 8), "num_seasons": rng.randint(1, 9)}
+    written["tv_series"] = _write(path("tv_series"), (tv(i) for i in range(1, sizes["tv_series"] + 1)))
+
+    written["books"] = _write(path("books"), (
+        {"franchise": pick_franchise(), "title": f"Book {i:07d}", "publication_year": rng.randint(1976, 2025),
+         "author": f"Author {rng.randint(1, max(1, sizes['books'] // 5)):05d}"}
+        for i in range(1, sizes["books"] + 1)
+    ))
+    written["games"] = _write(path("games"), (
+        {"franchise": pick_franchise(), "title": f"Game {i:06d}", "release_year": rng.randint(1982, 2025),
+         "developer": f"Studio {rng.randint(1, 200):03d}"}
+        for i in range(1, sizes["games"] + 1)
+    ))
+
+    species_w = zipf_weights(len(species), skew)
+    affiliation_w = zipf_weights(len(affiliations), skew)
+
+    def characters():
+        # draw in chunks: rng.choices with weights is O(n) setup per call
+        chunk = 10000
+        for base in range(0, sizes["characters"], chunk):
+            n = min(chunk, sizes["characters"] - base)
+            sp = rng.choices(species, species_w, k=n)
+            af = rng.choices(affiliations, affiliation_w, k=n)
+            for j in range(n):
+                i = base + j + 1
+                yield {"name": f"Character {i:08d}", "person": f"Person {rng.randint(1, n_people):08d}",
+                       "species": sp[j], "affiliation": af[j]}
+    written["characters"] = _write(path("characters"), characters())
+    return written
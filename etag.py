@@ -0,0 +1,118 @@
+import hashlib
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import HTTPException, Request, Response
+
+from cache import MemoryBackend, counters_shared, response_cache
+from expand import related_tables
+from replicas import read_primary_if_modified
+
+# Conditional GET (ETag / If-None-Match, Last-Modified / If-Modified-Since).
+#
+# Every table has a version counter that the POST/PUT/DELETE handlers bump
+# after commit; a DELETE also bumps the tables whose foreign keys it set to
+# NULL (api.record_delete). A route's ETag is a hash of the versions of the tables it
+# reads plus its path and query string, so a matching If-None-Match is
+# answered with 304 before any session touches the database.
+#
+# Counters live in the cache backend: with CACHE_BACKEND=redis they are
+# shared by all workers. With the in-process backend each worker has its
+# own counters, so the ETag also carries a per-process boot id - a client
+# bouncing between workers gets a 200 rather than a wrong 304. A
+# Last-Modified date cannot carry that id, and a worker that missed
+# another's write would also match an ETag it issued itself, so when the
+# counters are per process and there are several workers (cache.py,
+# counters_shared) neither If-None-Match nor If-Modified-Since is honoured.
+# prefork.py shares the counters, so 304s work there.
+#
+# Writes made outside the API (populate.py, manual SQL) do not bump the
+# counters; restart the workers (or bump via Redis) after those.
+
+BOOT_TIME = int(time.time())
+BOOT_ID = os.urandom(4).hex()
+
+
+class TableVersions:
+    def __init__(self, cache):
+        self.cache = cache
+
+    @property
+    def backend(self):
+        return self.cache.backend
+
+    def bump(self, table: str):
+        self.backend.incr(f"version:{table}")
+        # Rounded up so a write in the same second as an earlier response
+        # still moves Last-Modified past that response's value
+        self.backend.set_counter(f"modified:{table}", int(time.time()) + 1)
+
+    def version(self, table: str) -> int:
+        return self.backend.counter(f"version:{table}")
+
+    def last_write(self, tables) -> int:
+        """Time of the newest API write to `tables` (0: none since the counters started)"""
+        return max(self.backend.counter(f"modified:{t}") for t in tables)
+
+    def last_modified(self, tables) -> int:
+        return max(self.last_write(tables), BOOT_TIME)
+
+    def etag(self, tables, scope: str) -> str:
+        state = ",".join(f"{t}:{self.version(t)}" for t in tables)
+        if isinstance(self.backend, MemoryBackend):
+            state = BOOT_ID + "|" + state
+        digest = hashlib.sha1(f"{state}|{scope}".encode()).hexdigest()[:20]
+        return f'"{digest}"'
+
+
+table_versions = TableVersions(response_cache)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def conditional_get(*tables, expandable=None):
+    """Route dependency: 304 when the client's copy is current, else set validators.
+
+    expandable: model whose ?expand= relationships (expand.py) add their
+    tables to the validators.
+    """
+
+    def dependency(request: Request, response: Response):
+        read = tables
+        expand = request.query_params.get("expand")
+        if expandable is not None and expand:
+            allowed = getattr(expandable, "__expandable__", ())
+            names = [n.strip() for n in expand.split(",") if n.strip() in allowed]
+            read = tables + tuple(related_tables(expandable, names))
+        scope = request.url.path + "?" + request.url.query
+        etag = table_versions.etag(read, scope)
+        modified = table_versions.last_modified(read)
+        read_primary_if_modified(table_versions.last_write(read))
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+
+        # per-process counters in one of several workers may lack another worker's write
+        if counters_shared(table_versions.backend):
+            if_none_match = request.headers.get("if-none-match")
+            if_modified_since = request.headers.get("if-modified-since")
+            if if_none_match is not None:
+                if _etag_matches(if_none_match, etag):
+                    raise HTTPException(status_code=304, headers=headers)
+            elif if_modified_since:
+                try:
+                    since = parsedate_to_datetime(if_modified_since).timestamp()
+                except (TypeError, ValueError):
+                    since = None
+                if since is not None and modified <= since:
+                    raise HTTPException(status_code=304, headers=headers)
+
+        response.headers.update(headers)
+
+    return dependency
@@ -0,0 +1,77 @@
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException, Query
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+
+# ?expand=person,species,affiliation   (characters)
+# ?expand=films,tv_series,books,games  (franchise)
+#
+# Inlines related rows using the relationships in orm_models.py. The models
+# list the allowed names in __expandable__. Each expansion costs a fixed
+# number of statements whatever the page size:
+#   - many-to-one (character -> person): joinedload, i.e. a LEFT OUTER JOIN
+#     in the same SELECT, so no extra statement at all
+#   - one-to-many (franchise -> films): selectinload, one
+#     SELECT ... WHERE franchise_id IN (<page ids>) per collection
+# tests/test_expand.py asserts these counts; benchmarks/bench_expand.py
+# prints them at several page sizes.
+
+
+def expand_param(model):
+    """Route dependency factory: validated list of relationship names"""
+    allowed = getattr(model, "__expandable__", ())
+
+    def dependency(
+        expand: Optional[str] = Query(None, description=f"comma-separated: {', '.join(allowed)}"),
+    ) -> List[str]:
+        if not expand:
+            return []
+        names = list(dict.fromkeys(n.strip() for n in expand.split(",") if n.strip()))
+        unknown = [n for n in names if n not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400,
+                                detail=f"Cannot expand {', '.join(unknown)}; expandable: {', '.join(allowed)}")
+        return names
+
+    return dependency
+
+
+def related_tables(model, names: Sequence[str]) -> List[str]:
+    """Tables read by the given expansions (for ETag validators)"""
+    relationships = inspect(model).relationships
+    return [relationships[n].mapper.local_table.name for n in names]
+
+
+def loader_options(model, names: Sequence[str]):
+    relationships = inspect(model).relationships
+    options = []
+    for name in names:
+        attribute = getattr(model, name)
+        options.append(selectinload(attribute) if relationships[name].uselist else joinedload(attribute))
+    return options
+
+
+def _columns(obj, fields: Optional[Sequence[str]] = None) -> dict:
+    table = obj.__table__
+    keys = fields if fields else [c.key for c in table.columns]
+    return {key: getattr(obj, key) for key in keys}
+
+
+def to_dict(obj, names: Sequence[str], fields: Optional[Sequence[str]] = None) -> dict:
+    """Column values of obj (optionally only `fields`) plus each expansion"""
+    row = _columns(obj, fields)
+    for name in names:
+        value = getattr(obj, name)
+        if isinstance(value, list):
+            row[name] = [_columns(item) for item in value]
+        else:
+            row[name] = _columns(value) if value is not None else None
+    return row
+
+
+def fetch_expanded(db, model, pk_value, names: Sequence[str]) -> Optional[dict]:
+    """get-by-id with expansions; None if the row does not exist"""
+    pk = model.__table__.primary_key.columns[0]
+    obj = db.query(model).options(*loader_options(model, names)).filter(pk == pk_value).first()
+    return to_dict(obj, names) if obj is not None else None
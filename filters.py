@@ -0,0 +1,170 @@
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional
+
+from fastapi import HTTPException, Query, Request
+
+from expand import loader_options, to_dict
+from pagination import paginate
+
+# Filter / sort / sparse-fieldset grammar for the list routes, compiled to
+# SQL so only matching rows and requested columns leave the database.
+#
+#   ?affiliation_id=3                 equality
+#   ?box_office__gte=1e9              __eq __ne __lt __lte __gt __gte
+#   ?release_year__between=2000,2010  inclusive range
+#   ?rating__in=PG,PG-13              membership
+#   ?title__startswith=Star           prefix (LIKE 'Star%', index friendly)
+#   ?end_year__isnull=true
+#   ?sort=-box_office                 one column, '-' for descending
+#   ?fields=name,rating               primary key (and sort column) always included
+#
+# Only columns listed in the model's __filterable__ (orm_models.py) can be
+# filtered or sorted on; each of those is backed by an index.
+
+# Query parameters that belong to other features, never filters
+RESERVED_PARAMS = {"limit", "after", "format", "sort", "fields", "expand"}
+
+OPERATORS = {
+    "eq": lambda col, v: col == v,
+    "ne": lambda col, v: col != v,
+    "lt": lambda col, v: col < v,
+    "lte": lambda col, v: col <= v,
+    "gt": lambda col, v: col > v,
+    "gte": lambda col, v: col >= v,
+    "in": lambda col, v: col.in_(v),
+    "between": lambda col, v: col.between(v[0], v[1]),
+    "startswith": lambda col, v: col.like(v.replace("%", r"\%").replace("_", r"\_") + "%", escape="\\"),
+    "isnull": lambda col, v: col.is_(None) if v else col.is_not(None),
+}
+
+INT_MAX = 2 ** 63 - 1  # integer values must fit a signed 64-bit column
+
+
+def _bad(detail: str):
+    raise HTTPException(status_code=400, detail=detail)
+
+
+def _coerce(column, raw: str):
+    if column.type.python_type is int:
+        try:
+            number = int(raw)
+        except ValueError:
+            try:
+                number = Decimal(raw)  # 1e9, 2.0: exact, unlike float
+            except InvalidOperation:
+                _bad(f"{column.key}: expected a number, got {raw!r}")
+            if not number.is_finite() or number.adjusted() > 18:  # |number| >= 1e19
+                _bad(f"{column.key}: {raw!r} is out of range")
+            if number != number.to_integral_value():
+                _bad(f"{column.key}: expected a whole number, got {raw!r}")
+            number = int(number)
+        if not -INT_MAX - 1 <= number <= INT_MAX:
+            _bad(f"{column.key}: {raw!r} is out of range")
+        return number
+    return raw
+
+
+class ListQuery:
+    """Parsed filters / sort / fields for one model"""
+
+    def __init__(self, model, params, sort: Optional[str], fields: Optional[str]):
+        self.model = model
+        self.table = model.__table__
+        self.pk_column = self.table.primary_key.columns[0]
+        self.params = params
+        self.filterable = getattr(model, "__filterable__", ())
+        # (column name, operator, coerced value); snapshot.py evaluates these in memory
+        self.conditions = [self._condition(key, value) for key, value in params.multi_items()
+                           if key not in RESERVED_PARAMS]
+        self.criteria = [OPERATORS[op](getattr(model, name), value) for name, op, value in self.conditions]
+
+        self.sort_column = None
+        self.descending = False
+        if sort:
+            name = sort.lstrip("-")
+            self.descending = sort.startswith("-")
+            if name == self.pk_column.key:
+                if self.descending:
+                    _bad("Descending primary-key sort is not supported")
+            elif name in self.filterable:
+                self.sort_column = getattr(model, name)
+            else:
+                _bad(f"Cannot sort on {name!r}; sortable: {', '.join(self.filterable)}")
+
+        self.fields: Optional[List[str]] = None
+        if fields:
+            requested = [f.strip() for f in fields.split(",") if f.strip()]
+            unknown = [f for f in requested if f not in self.table.c]
+            if unknown:
+                _bad(f"Unknown fields: {', '.join(unknown)}")
+            keep = [self.pk_column.key] + ([self.sort_column.key] if self.sort_column is not None else [])
+            self.fields = keep + [f for f in requested if f not in keep]
+
+    def _condition(self, key: str, raw: str):
+        name, _, op = key.partition("__")
+        op = op or "eq"
+        if name not in self.filterable:
+            _bad(f"Cannot filter on {name!r}; filterable: {', '.join(self.filterable)}")
+        if op not in OPERATORS:
+            _bad(f"Unknown operator {op!r}; use one of {', '.join(OPERATORS)}")
+        column = getattr(self.model, name)
+
+        if op == "in":
+            value = [_coerce(column, v) for v in raw.split(",")]
+        elif op == "between":
+            parts = raw.split(",")
+            if len(parts) != 2:
+                _bad(f"{key}: expected two comma-separated values")
+            value = [_coerce(column, v) for v in parts]
+        elif op == "isnull":
+            value = raw.lower() in ("1", "true", "yes")
+        elif op == "startswith":
+            value = raw
+        else:
+            value = _coerce(column, raw)
+        return name, op, value
+
+    @property
+    def cache_key(self) -> str:
+        """Stable key for the whole query string (filters, sort, fields, page)"""
+        return "&".join(f"{k}={v}" for k, v in sorted(self.params.multi_items()))
+
+    def query(self, db):
+        """Query of plain column rows (all columns, or ?fields) with WHERE applied.
+
+        Column tuples, not entities: no identity map / instance state to
+        build, which dominates the cost of large pages.
+        """
+        if self.fields:
+            columns = [self.table.c[f] for f in self.fields]
+        else:
+            columns = list(self.table.columns)
+        return db.query(*columns).filter(*self.criteria)
+
+    def paginate(self, db, page, expand=()):
+        """Page envelope with items as plain dicts.
+
+        With expand (relationship names, see expand.py) entities are loaded
+        instead of column tuples so the related rows can be batch-loaded.
+        """
+        if expand:
+            query = db.query(self.model).options(*loader_options(self.model, expand)).filter(*self.criteria)
+            result = paginate(query, self.pk_column, page, self.sort_column, self.descending)
+            result["items"] = [to_dict(obj, expand, self.fields) for obj in result["items"]]
+            return result
+        result = paginate(self.query(db), self.pk_column, page, self.sort_column, self.descending)
+        result["items"] = [row._asdict() for row in result["items"]]
+        return result
+
+
+def list_query(model):
+    """Route dependency factory: ListQuery for `model` built from the request"""
+
+    def dependency(
+        request: Request,
+        sort: Optional[str] = Query(None, description="column to sort by, '-' prefix for descending"),
+        fields: Optional[str] = Query(None, description="comma-separated columns to return"),
+    ) -> ListQuery:
+        return ListQuery(model, request.query_params, sort, fields)
+
+    return dependency
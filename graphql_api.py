@@ -0,0 +1,340 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Body, Query
+from sqlalchemy import Float, Integer, func, inspect, select
+from sqlalchemy.orm import RelationshipDirection
+
+from database import Base, env_int, get_async_engine
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from serialization import fast_json
+
+try:
+    import graphql
+    from graphql import (
+        GraphQLArgument, GraphQLField, GraphQLFloat, GraphQLInt, GraphQLList,
+        GraphQLNonNull, GraphQLObjectType, GraphQLScalarType, GraphQLSchema, GraphQLString,
+    )
+except ImportError:  # pip install graphql-core
+    graphql = None
+
+# GraphQL endpoint (POST /graphql, GET /graphql?query=...).
+#
+# The schema is generated from the mappers in orm_models.py: one object type
+# per resource model (the ones with __filterable__), a field per column and
+# per relationship, and a root list field per table:
+#
+#   { characters(limit: 20) { name species { name } affiliation { name } } }
+#   { franchise(ids: [1]) { name films(limit: 5) { rating box_office } games { title } } }
+#
+# Relationships resolve through per-request DataLoaders: every species
+# needed by a level of the result is fetched with one
+# SELECT ... WHERE species_id IN (...), collections with one windowed
+# SELECT per level (ROW_NUMBER() per parent for the per-parent limit).
+# Statements per request therefore depend on the shape of the query, not
+# the number of rows.
+#
+# Before execution each operation is checked against
+#   GRAPHQL_MAX_DEPTH       (default 6)     nesting of selections
+#   GRAPHQL_MAX_COMPLEXITY  (default 20000) estimated result nodes: each
+#                                           list field multiplies its
+#                                           children by its limit
+# and rejected with 400 if over. Optional dependency: the route is only
+# mounted when graphql-core is installed.
+
+GRAPHQL_MAX_DEPTH = env_int("GRAPHQL_MAX_DEPTH", 6)
+GRAPHQL_MAX_COMPLEXITY = env_int("GRAPHQL_MAX_COMPLEXITY", 20000)
+
+graphql_available = graphql is not None
+
+# Integer columns whose values can pass 2^31 (GraphQL Int is 32-bit)
+BIG_INTEGER_COLUMNS = {("films", "box_office")}
+
+
+# ------------ DataLoader ------------
+class DataLoader:
+    """Collects load(key) calls made in the same event-loop tick and
+    resolves them with one batch_fn(keys) call."""
+
+    def __init__(self, batch_fn):
+        self.batch_fn = batch_fn
+        self.cache: Dict[Any, asyncio.Future] = {}
+        self.queue: List[Any] = []
+
+    def load(self, key):
+        if key in self.cache:
+            return self.cache[key]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.cache[key] = future
+        self.queue.append(key)
+        if len(self.queue) == 1:
+            loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self):
+        keys, self.queue = self.queue, []
+        asyncio.ensure_future(self._resolve(keys))
+
+    async def _resolve(self, keys):
+        try:
+            values = await self.batch_fn(keys)
+        except Exception as e:
+            for key in keys:
+                self.cache[key].set_exception(e)
+            return
+        for key in keys:
+            self.cache[key].set_result(values.get(key))
+
+
+class RequestContext:
+    """Per-request loaders and statement counter"""
+
+    def __init__(self):
+        self.engine = get_async_engine()
+        self.loaders: Dict[tuple, DataLoader] = {}
+        self.queries = 0
+
+    async def fetch(self, statement) -> List[dict]:
+        self.queries += 1
+        async with self.engine.connect() as conn:
+            result = await conn.execute(statement)
+            return [dict(row) for row in result.mappings()]
+
+    def loader(self, model, column, many: bool, limit: int) -> DataLoader:
+        """Loader for rows of model keyed by column (one row, or up to limit rows, per key)"""
+        spec = (model, column.key, many, limit)
+        if spec not in self.loaders:
+            self.loaders[spec] = DataLoader(lambda keys: self._batch(model, column, many, limit, keys))
+        return self.loaders[spec]
+
+    async def _batch(self, model, column, many, limit, keys):
+        table = model.__table__
+        pk = table.primary_key.columns[0]
+        if not many:
+            rows = await self.fetch(select(*table.columns).where(column.in_(keys)))
+            return {row[column.key]: row for row in rows}
+        rank = func.row_number().over(partition_by=column, order_by=pk).label("_rank")
+        ranked = select(*table.columns, rank).where(column.in_(keys)).subquery()
+        rows = await self.fetch(
+            select(*[ranked.c[c.key] for c in table.columns]).where(ranked.c._rank <= limit).order_by(ranked.c[pk.key])
+        )
+        grouped = {key: [] for key in keys}
+        for row in rows:
+            grouped[row[column.key]].append(row)
+        return grouped
+
+
+# ------------ schema generation ------------
+def graphql_models():
+    """Resource models exposed over GraphQL (those with list filters)"""
+    return sorted((m.class_ for m in Base.registry.mappers if hasattr(m.class_, "__filterable__")),
+                  key=lambda model: model.__tablename__)
+
+
+def _scalar(column, big_int):
+    if isinstance(column.type, Float):
+        return GraphQLFloat
+    if isinstance(column.type, Integer):
+        return big_int if (column.table.name, column.key) in BIG_INTEGER_COLUMNS else GraphQLInt
+    return GraphQLString
+
+
+def _limit(args) -> int:
+    return max(1, min(args.get("limit") or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+
+def _relationship_field(rel, types):
+    (local, remote), = rel.local_remote_pairs
+    target = rel.mapper.class_
+    many = rel.direction is RelationshipDirection.ONETOMANY
+
+    def resolve(source, info, **args):
+        key = source.get(local.key)
+        if key is None:
+            return [] if many else None
+        return info.context.loader(target, remote, many, _limit(args) if many else 1).load(key)
+
+    if many:
+        return GraphQLField(GraphQLList(types[target]), args={"limit": GraphQLArgument(GraphQLInt)}, resolve=resolve)
+    return GraphQLField(types[target], resolve=resolve)
+
+
+def _root_field(model, object_type):
+    table = model.__table__
+    pk = table.primary_key.columns[0]
+
+    async def resolve(root, info, limit=None, after=None, ids=None):
+        statement = select(*table.columns)
+        if ids is not None:
+            statement = statement.where(pk.in_(ids))
+        if after is not None:
+            statement = statement.where(pk > after)
+        statement = statement.order_by(pk).limit(_limit({"limit": limit}))
+        return await info.context.fetch(statement)
+
+    return GraphQLField(
+        GraphQLList(object_type),
+        args={
+            "limit": GraphQLArgument(GraphQLInt, description=f"default {DEFAULT_PAGE_SIZE}, max {MAX_PAGE_SIZE}"),
+            "after": GraphQLArgument(GraphQLInt, description=f"{pk.key} to start after"),
+            "ids": GraphQLArgument(GraphQLList(GraphQLNonNull(GraphQLInt))),
+        },
+        resolve=resolve,
+    )
+
+
+def build_schema():
+    big_int = GraphQLScalarType("BigInt", description="64-bit integer", serialize=int, parse_value=int)
+    types = {}
+    for model in graphql_models():
+        mapper = inspect(model)
+
+        def fields(model=model, mapper=mapper):
+            out = {c.key: GraphQLField(_scalar(c, big_int)) for c in model.__table__.columns}
+            for rel in mapper.relationships:
+                if rel.mapper.class_ in types:
+                    out[rel.key] = _relationship_field(rel, types)
+            return out
+
+        types[model] = GraphQLObjectType(model.__name__, fields)
+    query = GraphQLObjectType("Query", {
+        model.__tablename__: _root_field(model, object_type) for model, object_type in types.items()
+    })
+    return GraphQLSchema(query)
+
+
+# ------------ depth / complexity limits ------------
+def _argument(node, name, variables):
+    for argument in node.arguments or ():
+        if argument.name.value == name:
+            if isinstance(argument.value, graphql.VariableNode):
+                return variables.get(argument.value.name.value)
+            return graphql.value_from_ast_untyped(argument.value)
+    return None
+
+
+def measure(schema, document, operation_name: Optional[str], variables: dict):
+    """(depth, complexity) of the operation that will run.
+
+    Complexity estimates result nodes: a list field (root tables, one-to-many
+    relationships) multiplies the cost of its selection by its limit
+    (or the number of ids).
+    """
+    fragments = {d.name.value: d for d in document.definitions if isinstance(d, graphql.FragmentDefinitionNode)}
+    operations = [d for d in document.definitions if isinstance(d, graphql.OperationDefinitionNode)]
+    operation = next((o for o in operations if operation_name is None or (o.name and o.name.value == operation_name)),
+                     None)
+    if operation is None:
+        return 0, 0
+
+    def walk(selection_set, parent_type, depth, visited):
+        """(max depth, estimated nodes) below selection_set"""
+        deepest, nodes = depth, 0
+        for selection in selection_set.selections:
+            if isinstance(selection, graphql.FragmentSpreadNode):
+                name = selection.name.value
+                if name in visited or name not in fragments:
+                    continue
+                fragment = fragments[name]
+                d, n = walk(fragment.selection_set, schema.get_type(fragment.type_condition.name.value),
+                            depth, visited | {name})
+            elif isinstance(selection, graphql.InlineFragmentNode):
+                condition = selection.type_condition
+                d, n = walk(selection.selection_set,
+                            schema.get_type(condition.name.value) if condition else parent_type, depth, visited)
+            elif selection.selection_set is None:
+                d, n = depth, 1
+            elif selection.name.value.startswith("__"):
+                continue  # __schema / __type introspection: bounded by the schema, not by data
+            else:
+                field_type = parent_type.fields[selection.name.value].type
+                if isinstance(field_type, GraphQLNonNull):
+                    field_type = field_type.of_type
+                fan_out = 1
+                if isinstance(field_type, GraphQLList):
+                    # variables are not coerced yet: a wrong type is reported by execute()
+                    ids = _argument(selection, "ids", variables)
+                    limit = _argument(selection, "limit", variables)
+                    fan_out = len(ids) if isinstance(ids, list) and ids else \
+                        _limit({"limit": limit if isinstance(limit, int) else None})
+                child_depth, children = walk(selection.selection_set, graphql.get_named_type(field_type),
+                                             depth + 1, visited)
+                d, n = child_depth, 1 + fan_out * children
+            deepest, nodes = max(deepest, d), nodes + n
+        return deepest, nodes
+
+    return walk(operation.selection_set, schema.query_type, 1, frozenset())
+
+
+# ------------ route ------------
+_schema = None
+
+
+def get_schema():
+    global _schema
+    if _schema is None:
+        _schema = build_schema()
+    return _schema
+
+
+def _error(message: str, status_code: int = 400):
+    return fast_json({"data": None, "errors": [{"message": message}]}, status_code=status_code)
+
+
+async def run_query(query: str, variables: Optional[dict] = None, operation_name: Optional[str] = None):
+    schema = get_schema()
+    variables = variables or {}
+    try:
+        document = graphql.parse(query)
+    except graphql.GraphQLError as e:
+        return _error(e.message)
+    errors = graphql.validate(schema, document)
+    if errors:
+        return fast_json({"data": None, "errors": [e.formatted for e in errors]}, status_code=400)
+
+    depth, complexity = measure(schema, document, operation_name, variables)
+    if depth > GRAPHQL_MAX_DEPTH:
+        return _error(f"Query depth {depth} exceeds the limit of {GRAPHQL_MAX_DEPTH}")
+    if complexity > GRAPHQL_MAX_COMPLEXITY:
+        return _error(f"Query complexity {complexity} exceeds the limit of {GRAPHQL_MAX_COMPLEXITY}; "
+                      f"lower the limit arguments or select fewer nested lists")
+
+    context = RequestContext()
+    result = graphql.execute(schema, document, context_value=context,
+                             variable_values=variables, operation_name=operation_name)
+    if graphql.pyutils.is_awaitable(result):
+        result = await result
+    body = {"data": result.data}
+    if result.errors:
+        body["errors"] = [e.formatted for e in result.errors]
+    body["extensions"] = {"cost": {"depth": depth, "complexity": complexity, "queries": context.queries}}
+    return fast_json(body)
+
+
+def build_graphql_router() -> APIRouter:
+    router = APIRouter(tags=["GraphQL"])
+
+    @router.post("/graphql", summary="GraphQL query")
+    async def graphql_post(payload: Dict[str, Any] = Body(..., examples=[{"query": "{ characters(limit: 5) { name species { name } } }"}])):
+        """Body: {"query": ..., "variables": {...}, "operationName": ...}"""
+        query = payload.get("query")
+        if not isinstance(query, str):
+            return _error("Missing 'query'")
+        variables, operation_name = payload.get("variables"), payload.get("operationName")
+        if variables is not None and not isinstance(variables, dict):
+            return _error("'variables' must be an object")
+        if operation_name is not None and not isinstance(operation_name, str):
+            return _error("'operationName' must be a string")
+        return await run_query(query, variables, operation_name)
+
+    @router.get("/graphql", summary="GraphQL query (GET)")
+    async def graphql_get(query: str = Query(...), operationName: Optional[str] = None):
+        return await run_query(query, None, operationName)
+
+    @router.get("/graphql/schema", summary="GraphQL schema (SDL)")
+    async def graphql_schema():
+        from fastapi.responses import PlainTextResponse
+        return PlainTextResponse(graphql.print_schema(get_schema()))
+
+    return router
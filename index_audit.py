@@ -0,0 +1,154 @@
+import re
+from typing import List, Tuple
+
+from sqlalchemy import Index, func, inspect, select, text
+
+from affiliation_lookup import AFFILIATION_BY_NAME, BY_AFFILIATION
+from database import Base, engine
+from orm_models import Affiliation, Character, Person, Species
+
+# EXPLAIN every query the API issues and flag full table scans.
+#
+#   python starwars.py explain                 # fail on full scans of tables > 1000 rows
+#   python starwars.py explain --threshold 0   # fail on any full scan
+#
+# Supports SQLite (EXPLAIN QUERY PLAN: SCAN) and MySQL/MariaDB (EXPLAIN:
+# type=ALL). Exit status is 1 when a query scans a table whose
+# row count is above the threshold.
+#
+# The indexes themselves are the Index() entries in orm_models.py.
+# create_all() only creates them together with a new table;
+# create_indexes() adds the missing ones to existing tables, on any
+# backend:
+#
+#   python starwars.py explain --create-indexes
+#   python starwars.py init-db                 # create_all, then the missing indexes
+
+# Aliases used in setup_view.sql / setup_procedure.sql
+SQL_ALIASES = {"c": "characters", "p": "people", "s": "species", "a": "affiliations"}
+
+SAMPLE_VALUES = {int: 1, str: "x"}
+
+
+def missing_indexes(bind=engine) -> List[Index]:
+    """Indexes declared in orm_models.py that an existing table lacks"""
+    missing = []
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        present = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        missing += sorted((ix for ix in table.indexes if ix.name not in present), key=lambda ix: ix.name)
+    return missing
+
+
+def create_indexes(bind=engine) -> List[str]:
+    """Create the missing_indexes(); return their names"""
+    created = []
+    for index in missing_indexes(bind):
+        index.create(bind, checkfirst=True)
+        created.append(index.name)
+    return created
+
+
+def _page(statement, pk_column, limit: int = 51):
+    """Same shape as pagination.paginate(): WHERE pk > :after ORDER BY pk LIMIT n+1"""
+    return statement.where(pk_column > 0).order_by(pk_column).limit(limit)
+
+
+def builtin_queries() -> List[Tuple[str, object]]:
+    """(name, statement) for each query api.py builds"""
+    queries = []
+    for table in Base.metadata.sorted_tables:
+        pk = table.primary_key.columns[0]
+        queries.append((f"list {table.name}", _page(select(table), pk)))
+        queries.append((f"get {table.name}", select(table).where(pk == 1)))
+
+    for mapper in Base.registry.mappers:
+        model = mapper.class_
+        table = model.__table__
+        for name in getattr(model, "__filterable__", ()):
+            column = table.c[name]
+            sample = SAMPLE_VALUES.get(column.type.python_type, "x")
+            # Audited without the pk paging wrapper: with it SQLite can walk
+            # the rowid range instead and hide a missing index
+            queries.append((f"filter {table.name}.{name}", select(table).where(column == sample)))
+
+    detailed = select(
+        Character.character_id, Character.name, Person.name, Person.birth_year, Person.role_type,
+        Species.name, Species.classification, Affiliation.name, Affiliation.description,
+    ).join(Person, Character.person_id == Person.person_id) \
+     .join(Species, Character.species_id == Species.species_id) \
+     .join(Affiliation, Character.affiliation_id == Affiliation.affiliation_id)
+    queries.append(("characters detailed", _page(detailed, Character.character_id)))
+    queries.append(("affiliation by name", AFFILIATION_BY_NAME.params(name="Rebel Alliance")))
+    queries.append(("characters by affiliation",
+                    BY_AFFILIATION.params(affiliation_id=1, after=0, limit=51)))
+
+    if "character_overview" in inspect(engine).get_view_names():
+        queries.append(("view character_overview",
+                        text("SELECT * FROM character_overview WHERE character_id > 0 ORDER BY character_id LIMIT 51")))
+    return queries
+
+
+def _compile(statement, dialect):
+    """SQL string + driver-level parameters (positional or named, per dialect)"""
+    compiled = statement.compile(dialect=dialect)
+    if compiled.positional:
+        return str(compiled), tuple(compiled.params[k] for k in compiled.positiontup)
+    return str(compiled), compiled.params
+
+
+def _table_for(alias: str, tables) -> str:
+    alias = alias.strip("`")
+    if alias in tables:
+        return alias
+    return SQL_ALIASES.get(alias, alias)
+
+
+def explain(conn, statement) -> Tuple[List[str], List[str]]:
+    """Return (plan lines, tables scanned in full)"""
+    sql, params = _compile(statement, conn.dialect)
+    tables = set(Base.metadata.tables)
+    plan, scanned = [], []
+
+    if conn.dialect.name == "sqlite":
+        for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params):
+            detail = row[-1]
+            plan.append(detail)
+            match = re.match(r"SCAN (\S+)", detail)
+            # "SCAN t" = full table scan, "SCAN t USING [COVERING] INDEX" = full index scan
+            if match:
+                scanned.append(_table_for(match.group(1), tables))
+    elif conn.dialect.name in ("mysql", "mariadb"):
+        for row in conn.exec_driver_sql("EXPLAIN " + sql, params).mappings():
+            plan.append(f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row.get('Extra') or ''}")
+            # type=index with a LIMIT is an ordered index walk, not a scan
+            if row["type"] == "ALL":
+                scanned.append(_table_for(row["table"] or "", tables))
+    else:
+        raise RuntimeError(f"EXPLAIN parsing not implemented for {conn.dialect.name}")
+    return plan, scanned
+
+
+def audit(threshold: int = 1000, verbose: bool = False) -> int:
+    """Print a report; return the number of offending queries"""
+    failures = 0
+    with engine.connect() as conn:
+        counts = {t.name: conn.execute(select(func.count()).select_from(t)).scalar()
+                  for t in Base.metadata.sorted_tables}
+        for name, statement in builtin_queries():
+            plan, scanned = explain(conn, statement)
+            offending = sorted({t for t in scanned if counts.get(t, 0) > threshold})
+            if offending:
+                failures += 1
+                print(f"FAIL  {name:<40} full scan: " + ", ".join(f"{t} ({counts[t]} rows)" for t in offending))
+            elif scanned:
+                print(f"ok    {name:<40} small-table scan: {', '.join(sorted(set(scanned)))}")
+            else:
+                print(f"ok    {name}")
+            if verbose or offending:
+                for line in plan:
+                    print(f"        {line}")
+    print(f"\n{failures} queries with full scans on tables above {threshold} rows")
+    return failures
@@ -0,0 +1,234 @@
+import csv
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import insert, select
+
+from database import Base, engine
+import orm_models  # noqa: F401  (registers tables on Base.metadata)
+
+# Bulk loader used by `python starwars.py load` and populate.py.
+#
+# - Core INSERTs in batches (executemany), no ORM objects.
+# - Foreign keys can be given by name (franchise="Star Wars",
+#   species="Human", affiliation="Jedi Order", person="Yoda"); names are
+#   resolved through in-memory lookup dicts built once per parent table.
+#   people.name is not unique: a name shared by several people is rejected
+#   as ambiguous (give person_id instead).
+# - Idempotent: rows whose natural key already exists are skipped, so a
+#   re-run (or a resumed run) inserts only what is missing.
+# - Optionally drops the secondary indexes before loading a table and
+#   rebuilds them afterwards. Indexes that lead with a foreign key column
+#   stay: MySQL will not drop the index backing a foreign key.
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Parents before children
+LOAD_ORDER = [
+    "franchise", "species", "affiliations", "people", "planets",
+    "films", "tv_series", "books", "games", "characters",
+]
+
+# Columns that identify an existing row when re-loading
+NATURAL_KEYS = {
+    "franchise": ("name",),
+    "species": ("name",),
+    "affiliations": ("name",),
+    "people": ("name", "birth_year", "role_type"),  # no unique column: the whole row
+    "planets": ("name",),
+    "films": ("franchise_id", "rating", "box_office"),
+    "tv_series": ("franchise_id", "title"),
+    "books": ("franchise_id", "title"),
+    "games": ("franchise_id", "title"),
+    "characters": ("name", "species_id"),
+}
+
+# input column -> (FK column, parent table, parent lookup column)
+FK_BY_NAME = {
+    "franchise": ("franchise_id", "franchise", "name"),
+    "species": ("species_id", "species", "name"),
+    "affiliation": ("affiliation_id", "affiliations", "name"),
+    "person": ("person_id", "people", "name"),
+}
+
+
+class LoadError(ValueError):
+    pass
+
+
+AMBIGUOUS = object()  # lookup value of a name shared by several parent rows
+
+
+class TableReport:
+    def __init__(self, table: str):
+        self.table = table
+        self.read = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.errors: List[str] = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"{self.table:<13} {self.read:>9} read {self.inserted:>9} inserted "
+                f"{self.skipped:>9} skipped {self.rejected:>6} rejected "
+                f"{self.seconds:8.2f}s {self.rows_per_sec:>11,.0f} rows/s")
+
+
+def read_rows(path: str) -> Iterable[Dict]:
+    """Stream dict rows from a .csv or .jsonl file"""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield {k: (v if v != "" else None) for k, v in row.items()}
+    elif path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        raise LoadError(f"Unsupported file type: {path}")
+
+
+def find_table_files(directory: str) -> Dict[str, str]:
+    """Map table name -> <directory>/<table>.csv|.jsonl|.ndjson"""
+    found = {}
+    for table in LOAD_ORDER:
+        for ext in (".csv", ".jsonl", ".ndjson"):
+            path = os.path.join(directory, table + ext)
+            if os.path.exists(path):
+                found[table] = path
+                break
+    return found
+
+
+class Loader:
+    def __init__(self, bind=engine, batch_size: int = DEFAULT_BATCH_SIZE, rebuild_indexes: bool = False):
+        self.bind = bind
+        self.batch_size = batch_size
+        self.rebuild_indexes = rebuild_indexes
+        self._lookups: Dict[str, Dict] = {}
+
+    # ------------ lookups ------------
+    def lookup(self, parent: str, column: str) -> Dict:
+        key = f"{parent}.{column}"
+        if key not in self._lookups:
+            table = Base.metadata.tables[parent]
+            pk = table.primary_key.columns[0]
+            found = {}
+            with self.bind.connect() as conn:
+                for value, pk_value in conn.execute(select(table.c[column], pk)):
+                    found[value] = AMBIGUOUS if value in found else pk_value
+            self._lookups[key] = found
+        return self._lookups[key]
+
+    def _existing_keys(self, table, key_cols):
+        with self.bind.connect() as conn:
+            return set(conn.execute(select(*[table.c[c] for c in key_cols])).all())
+
+    # ------------ row preparation ------------
+    def _prepare(self, table, row: Dict) -> Dict:
+        out = {}
+        for name, value in row.items():
+            if name in FK_BY_NAME and name not in table.c:
+                fk_col, parent, column = FK_BY_NAME[name]
+                if value is None:
+                    continue
+                try:
+                    pk_value = self.lookup(parent, column)[value]
+                except KeyError:
+                    raise LoadError(f"unknown {name} {value!r}")
+                if pk_value is AMBIGUOUS:
+                    raise LoadError(f"ambiguous {name} {value!r}: several {parent} rows; give {fk_col}")
+                out[fk_col] = pk_value
+            elif name in table.c:
+                col = table.c[name]
+                if value is not None and col.type.python_type is int and not isinstance(value, int):
+                    # JSONL numbers arrive as floats; int() would truncate 3.7 to 3
+                    if isinstance(value, float) and not value.is_integer():
+                        raise LoadError(f"{name}: expected a whole number, got {value!r}")
+                    value = int(value)
+                out[name] = value
+            else:
+                raise LoadError(f"unknown column {name!r}")
+        return out
+
+    # ------------ indexes ------------
+    def _secondary_indexes(self, table):
+        """Non-unique indexes that can be dropped for the load (not FK-backing ones)"""
+        return [ix for ix in table.indexes
+                if not ix.unique and not list(ix.columns)[0].foreign_keys]
+
+    # ------------ load ------------
+    def load_table(self, table_name: str, rows: Iterable[Dict]) -> TableReport:
+        table = Base.metadata.tables[table_name]
+        key_cols = NATURAL_KEYS[table_name]
+        report = TableReport(table_name)
+        start = time.perf_counter()
+
+        seen = self._existing_keys(table, key_cols)
+        indexes = self._secondary_indexes(table) if self.rebuild_indexes else []
+        for ix in indexes:
+            ix.drop(self.bind, checkfirst=True)
+
+        try:
+            batch = []
+            for row in rows:
+                report.read += 1
+                try:
+                    prepared = self._prepare(table, row)
+                except (LoadError, ValueError) as e:
+                    report.rejected += 1
+                    if len(report.errors) < 20:
+                        report.errors.append(f"row {report.read}: {e}")
+                    continue
+                key = tuple(prepared.get(c) for c in key_cols)
+                if key in seen:
+                    report.skipped += 1
+                    continue
+                seen.add(key)
+                batch.append(prepared)
+                if len(batch) >= self.batch_size:
+                    report.inserted += self._flush(table, batch)
+                    batch = []
+            if batch:
+                report.inserted += self._flush(table, batch)
+        finally:
+            for ix in indexes:
+                ix.create(self.bind, checkfirst=True)
+
+        # Children resolve names against this table next
+        for key in [k for k in self._lookups if k.startswith(table_name + ".")]:
+            del self._lookups[key]
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def _flush(self, table, batch: List[Dict]) -> int:
+        # executemany groups by key set; rows missing optional columns get NULL
+        columns = set().union(*batch)
+        rows = [{c: r.get(c) for c in columns} for r in batch]
+        with self.bind.begin() as conn:
+            conn.execute(insert(table), rows)
+        return len(rows)
+
+    def load_tables(self, sources: Dict[str, Iterable[Dict]]) -> List[TableReport]:
+        """Load {table: rows} in dependency order"""
+        unknown = set(sources) - set(LOAD_ORDER)
+        if unknown:
+            raise LoadError(f"Unknown tables: {', '.join(sorted(unknown))}")
+        return [self.load_table(t, sources[t]) for t in LOAD_ORDER if t in sources]
+
+
+def load_directory(directory: str, tables: Optional[List[str]] = None, **options) -> List[TableReport]:
+    files = find_table_files(directory)
+    if tables:
+        files = {t: p for t, p in files.items() if t in tables}
+    if not files:
+        raise LoadError(f"No <table>.csv / <table>.jsonl files found in {directory}")
+    return Loader(**options).load_tables({t: read_rows(p) for t, p in files.items()})
@@ -0,0 +1,124 @@
+from sqlalchemy import func, select, text
+
+import triggers
+from database import age_seconds, engine, env_bool
+from orm_models import Character, CharacterOverview
+
+# Materialized character_overview.
+#
+#   python starwars.py overview rebuild    # create table + triggers, full refresh
+#   python starwars.py overview status     # staleness / drift report
+#   CHARACTER_OVERVIEW_MATERIALIZED=1      # serve the view endpoints from it
+#
+# character_overview_mat holds one row per character with the four-table
+# join already done. Triggers (triggers.py) on characters, people, species
+# and affiliations recompute only the characters a write touches.
+
+ENABLED = env_bool("CHARACTER_OVERVIEW_MATERIALIZED", False)
+
+TABLE = CharacterOverview.__tablename__
+
+# Columns of the character_overview view, in view order
+VIEW_COLUMNS = ("character_id, character_name, person_name, birth_year, role_type, "
+                "species_name, classification, affiliation_name, description")
+
+COLUMNS = VIEW_COLUMNS + ", refreshed_at"
+
+JOINS = """
+    FROM characters c
+        INNER JOIN people p ON c.person_id = p.person_id
+        INNER JOIN species s ON c.species_id = s.species_id
+        INNER JOIN affiliations a ON c.affiliation_id = a.affiliation_id
+"""
+
+JOINED_COLUMNS = ("c.character_id, c.name, p.name, p.birth_year, p.role_type, "
+                  "s.name, s.classification, a.name, a.description")
+
+# Same SELECT as setup_view.sql; plus the refresh time
+SELECT_LIVE = f"SELECT {JOINED_COLUMNS} {JOINS}"
+SELECT_JOINED = f"SELECT {JOINED_COLUMNS}, CURRENT_TIMESTAMP {JOINS}"
+
+
+def _refresh_where(condition: str) -> str:
+    """Trigger body statements: re-derive the rows of characters matching condition"""
+    return (f"DELETE FROM {TABLE} WHERE character_id IN "
+            f"(SELECT character_id FROM characters c WHERE {condition}); "
+            f"INSERT INTO {TABLE} ({COLUMNS}) {SELECT_JOINED} WHERE {condition};")
+
+
+def trigger_definitions():
+    """(name, CREATE TRIGGER sql) for every trigger keeping the table current"""
+    definitions = {
+        "trg_cov_characters_ins": ("AFTER INSERT", "characters",
+                                   _refresh_where("c.character_id = NEW.character_id")),
+        "trg_cov_characters_upd": ("AFTER UPDATE", "characters",
+                                   f"DELETE FROM {TABLE} WHERE character_id = OLD.character_id; "
+                                   + _refresh_where("c.character_id = NEW.character_id")),
+        "trg_cov_characters_del": ("AFTER DELETE", "characters",
+                                   f"DELETE FROM {TABLE} WHERE character_id = OLD.character_id;"),
+    }
+    for parent, fk in (("people", "person_id"), ("species", "species_id"), ("affiliations", "affiliation_id")):
+        definitions[f"trg_cov_{parent}_upd"] = ("AFTER UPDATE", parent, _refresh_where(f"c.{fk} = NEW.{fk}"))
+        # characters left pointing at a deleted parent drop out of the inner join
+        definitions[f"trg_cov_{parent}_del"] = ("AFTER DELETE", parent,
+                                                f"DELETE FROM {TABLE} WHERE character_id IN "
+                                                f"(SELECT character_id FROM characters WHERE {fk} = OLD.{fk});")
+    return [triggers.row_trigger(name, event, table, body) for name, (event, table, body) in definitions.items()]
+
+
+def install(bind=engine):
+    """Create the table (if missing) and (re)create its triggers"""
+    CharacterOverview.__table__.create(bind, checkfirst=True)
+    with bind.begin() as conn:
+        triggers.replace(conn, trigger_definitions())
+
+
+def uninstall(bind=engine):
+    triggers.drop(bind, trigger_definitions())
+
+
+def rebuild(bind=engine) -> int:
+    """Full refresh in one transaction; returns the row count"""
+    with bind.begin() as conn:
+        conn.execute(text(f"DELETE FROM {TABLE}"))
+        conn.execute(text(f"INSERT INTO {TABLE} ({COLUMNS}) {SELECT_JOINED}"))
+        return conn.execute(select(func.count()).select_from(CharacterOverview)).scalar()
+
+
+# character_ids whose materialized row differs from the live join, either way
+# (EXCEPT: SQLite, MySQL 8.0.31+, MariaDB 10.3+)
+DRIFT = f"""
+    SELECT COUNT(DISTINCT character_id) FROM (
+        SELECT character_id FROM ({SELECT_LIVE} EXCEPT SELECT {VIEW_COLUMNS} FROM {TABLE}) missing
+        UNION ALL
+        SELECT character_id FROM (SELECT {VIEW_COLUMNS} FROM {TABLE} EXCEPT {SELECT_LIVE}) extra
+    ) d
+"""
+
+
+def status(bind=engine) -> dict:
+    """Staleness report.
+
+    drift_rows counts characters whose materialized row is missing, extra
+    or has different values than the live join (a full comparison of both);
+    it is non-zero only if writes bypassed the triggers (e.g. triggers were
+    dropped, or rows were changed before `overview rebuild` installed them).
+    """
+    with bind.connect() as conn:
+        live = conn.execute(text(f"SELECT COUNT(*) FROM ({SELECT_LIVE}) j")).scalar()
+        drift = conn.execute(text(DRIFT)).scalar()
+        mat_rows, newest, oldest = conn.execute(select(
+            func.count(), func.max(CharacterOverview.refreshed_at), func.min(CharacterOverview.refreshed_at)
+        )).one()
+        characters = conn.execute(select(func.count()).select_from(Character)).scalar()
+        ages = [age_seconds(conn, newest), age_seconds(conn, oldest)]
+
+    return {
+        "enabled": ENABLED,
+        "rows": mat_rows,
+        "live_rows": live,
+        "characters": characters,
+        "drift_rows": drift,
+        "last_refresh_age_seconds": ages[0],
+        "oldest_row_age_seconds": ages[1],
+    }
@@ -11,8 +11,8 @@
 # 9. If you see Already populated; abort, drop tables or delete rows before rerun.
 
 from sqlalchemy import (
-    Column, Integer, String, ForeignKey, CheckConstraint,
-    UniqueConstraint, Index
+    Column, Integer, BigInteger, String, ForeignKey, CheckConstraint,
+    UniqueConstraint, Index, DateTime
 )
 from sqlalchemy.orm import relationship
 from database import Base
@@ -33,6 +33,13 @@ class Franchise(Base):
     books = relationship("Book", back_populates="franchise")
     games = relationship("Game", back_populates="franchise")
 
+    # ?field= filters / ?sort= allowed on the list route (see filters.py);
+    # every column here is covered by an index
+    __filterable__ = ("name", "start_year")
+    # ?expand= on the franchise routes (see expand.py)
+    __expandable__ = ("films", "tv_series", "books", "games")
+    __table_args__ = (Index("idx_franchise_start_year", "start_year"),)
+
 # ----------------------------------------------------------
 # FILMS
 # ----------------------------------------------------------
@@ -46,8 +53,11 @@ class Film(Base):
 
     franchise = relationship("Franchise", back_populates="films")
 
+    __filterable__ = ("franchise_id", "rating", "box_office")
     __table_args__ = (
         Index("idx_films_franchise", "franchise_id"),
+        Index("idx_films_rating", "rating"),
+        Index("idx_films_box_office", "box_office"),
         CheckConstraint('box_office >= 0', name='check_box_office_positive')
     )
 
@@ -66,6 +76,14 @@ class TVSeries(Base):
 
     franchise = relationship("Franchise", back_populates="tv_series")
 
+    __filterable__ = ("franchise_id", "title", "start_year", "end_year")
+    __table_args__ = (
+        Index("idx_tv_series_franchise", "franchise_id"),
+        Index("idx_tv_series_title", "title"),
+        Index("idx_tv_series_start_year", "start_year"),
+        Index("idx_tv_series_end_year", "end_year"),
+    )
+
 # ----------------------------------------------------------
 # BOOKS
 # ----------------------------------------------------------
@@ -80,6 +98,14 @@ class Book(Base):
 
     franchise = relationship("Franchise", back_populates="books")
 
+    __filterable__ = ("franchise_id", "title", "publication_year", "author")
+    __table_args__ = (
+        Index("idx_books_franchise", "franchise_id"),
+        Index("idx_books_title", "title"),
+        Index("idx_books_publication_year", "publication_year"),
+        Index("idx_books_author", "author"),
+    )
+
 # ----------------------------------------------------------
 # SPECIES
 # ----------------------------------------------------------
@@ -92,6 +118,9 @@ class Species(Base):
 
     characters = relationship("Character", back_populates="species")
 
+    __filterable__ = ("name", "classification")
+    __table_args__ = (Index("idx_species_classification", "classification"),)
+
 # ----------------------------------------------------------
 # AFFILIATIONS
 # ----------------------------------------------------------
@@ -104,6 +133,10 @@ class Affiliation(Base):
 
     characters = relationship("Character", back_populates="affiliation")
 
+    __filterable__ = ("name",)
+    # name -> id (+ description) lookup answered from the index alone
+    __table_args__ = (Index("idx_affiliations_name_cover", "name", "affiliation_id", "description"),)
+
 # ----------------------------------------------------------
 # PEOPLE
 # ----------------------------------------------------------
@@ -117,6 +150,13 @@ class Person(Base):
 
     characters = relationship("Character", back_populates="person")
 
+    __filterable__ = ("name", "birth_year", "role_type")
+    __table_args__ = (
+        Index("idx_people_name", "name"),
+        Index("idx_people_birth_year", "birth_year"),
+        Index("idx_people_role_type", "role_type"),
+    )
+
 # ----------------------------------------------------------
 # CHARACTERS
 # ----------------------------------------------------------
@@ -133,7 +173,19 @@ class Character(Base):
     species = relationship("Species", back_populates="characters")
     affiliation = relationship("Affiliation", back_populates="characters")
 
-    __table_args__ = (UniqueConstraint("name", "species_id", name="uix_character_species"),)
+    # name is the leading column of uix_character_species
+    __filterable__ = ("name", "person_id", "species_id", "affiliation_id")
+    __expandable__ = ("person", "species", "affiliation")
+    __table_args__ = (
+        UniqueConstraint("name", "species_id", name="uix_character_species"),
+        Index("idx_characters_person", "person_id"),
+        # species FK + "characters per species/affiliation" filters
+        Index("idx_characters_species_affiliation", "species_id", "affiliation_id"),
+        # affiliation FK; covers the by-affiliation lookup (filter, order by
+        # character_id, join keys) without touching the table rows
+        Index("idx_characters_affiliation_cover", "affiliation_id", "character_id",
+              "person_id", "species_id", "name"),
+    )
 
 # ----------------------------------------------------------
 # PLANETS
@@ -146,6 +198,12 @@ class Planet(Base):
     region = Column(String(100))
     climate = Column(String(100))
 
+    __filterable__ = ("name", "region", "climate")
+    __table_args__ = (
+        Index("idx_planets_region", "region"),
+        Index("idx_planets_climate", "climate"),
+    )
+
 # ----------------------------------------------------------
 # GAMES
 # ----------------------------------------------------------
@@ -159,3 +217,85 @@ class Game(Base):
     developer = Column(String(100))
 
     franchise = relationship("Franchise", back_populates="games")
+
+    __filterable__ = ("franchise_id", "title", "release_year", "developer")
+    __table_args__ = (
+        Index("idx_games_franchise", "franchise_id"),
+        Index("idx_games_title", "title"),
+        Index("idx_games_release_year", "release_year"),
+        Index("idx_games_developer", "developer"),
+    )
+
+# ----------------------------------------------------------
+# CHARACTER OVERVIEW (materialized)
+# ----------------------------------------------------------
+# Denormalised copy of the character_overview view (setup_view.sql), kept
+# current row by row by triggers - see materialized.py. No FKs: every row
+# is derived from characters/people/species/affiliations.
+class CharacterOverview(Base):
+    __tablename__ = "character_overview_mat"
+
+    character_id = Column(Integer, primary_key=True, autoincrement=False)
+    character_name = Column(String(100))
+    person_name = Column(String(100))
+    birth_year = Column(String(20))
+    role_type = Column(String(50))
+    species_name = Column(String(100))
+    classification = Column(String(100))
+    affiliation_name = Column(String(100))
+    description = Column(String(255))
+    refreshed_at = Column(DateTime)
+
+    __table_args__ = (Index("idx_character_overview_mat_refreshed", "refreshed_at"),)
+
+# ----------------------------------------------------------
+# STATS ROLLUP
+# ----------------------------------------------------------
+# Pre-aggregated counts/sums behind /stats/*, one row per (metric, group),
+# kept current by triggers on the source tables - see stats.py. NULL group
+# keys are stored as -1 / '' (primary key columns cannot be NULL).
+class StatsRollup(Base):
+    __tablename__ = "stats_rollup"
+
+    metric = Column(String(32), primary_key=True)
+    group_id = Column(Integer, primary_key=True, autoincrement=False)
+    group_label = Column(String(20), primary_key=True)
+    item_count = Column(BigInteger, nullable=False, default=0)
+    total = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime)
+
+# ----------------------------------------------------------
+# CHANGE LOG
+# ----------------------------------------------------------
+# One row per insert / update / delete on the API tables, appended by
+# triggers in the writing transaction - see changes.py. version is the
+# cursor of GET /changes?since=<version>; sqlite_autoincrement keeps
+# versions from being reused after a prune.
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(32), nullable=False)
+    pk = Column(Integer, nullable=False)
+    op = Column(String(6), nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("idx_change_log_changed_at", "changed_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+# ----------------------------------------------------------
+# SCHEMA VERSION
+# ----------------------------------------------------------
+# Bump SCHEMA_VERSION whenever a model above changes shape (columns, indexes,
+# constraints). The API compares it with the stamped row at startup instead
+# of running create_all - see startup.py.
+SCHEMA_VERSION = 3
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime)
@@ -0,0 +1,146 @@
+import base64
+import json
+from typing import Generic, List, Optional, TypeVar
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import and_, or_, select
+
+# Keyset (cursor) pagination shared by every list endpoint.
+# Pages are read with WHERE pk > :cursor ORDER BY pk LIMIT n, never OFFSET,
+# so page 1000 costs the same as page 1.
+#
+# With ?sort=<col> the cursor carries (sort value, pk) and the page is read
+# with WHERE (col, pk) > (:value, :pk) in sort order. NULL sort values are
+# placed after all non-NULL ones in either direction.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# JSON types a sorted cursor may carry per column python_type; other types
+# (dates, decimals) are written with str() by encode_cursor
+CURSOR_VALUE_TYPES = {int: (int,), float: (int, float), str: (str,)}
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def encode_cursor(position) -> str:
+    """Turn the last key of a page (pk, or [sort value, pk]) into an opaque cursor"""
+    raw = str(position) if isinstance(position, int) else json.dumps(position, default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; 400 on anything we did not hand out"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        if raw.startswith("["):
+            value = json.loads(raw)
+            if isinstance(value, list) and len(value) == 2 and _is_int(value[1]):
+                return value
+            raise ValueError(raw)
+        return int(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class PageParams:
+    """Query-string dependency: ?limit=50&after=<cursor>"""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+        after: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    ):
+        self.limit = limit
+        self.after = decode_cursor(after) if after else None
+
+    @property
+    def after_pk(self) -> Optional[int]:
+        """Cursor of a primary-key ordered listing"""
+        if isinstance(self.after, list):
+            raise HTTPException(status_code=400, detail="Cursor belongs to a sorted listing; pass the same ?sort")
+        return self.after
+
+    def after_sorted(self, sort_column) -> Optional[list]:
+        """Cursor [sort value, pk] of a listing sorted on sort_column; 400 if the
+        value is not of the column's type (it would reach the WHERE clause)"""
+        if self.after is None:
+            return None
+        if not isinstance(self.after, list):
+            raise HTTPException(status_code=400, detail="Cursor belongs to an unsorted listing; drop ?sort or restart")
+        value = self.after[0]
+        allowed = CURSOR_VALUE_TYPES.get(sort_column.type.python_type, (str,))
+        if value is not None and (isinstance(value, bool) or not isinstance(value, allowed)):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return self.after
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """response_model of page_envelope(): Page[PersonOut], ..."""
+    items: List[T]
+    next_cursor: Optional[str] = None
+    limit: int
+
+
+def page_envelope(items, next_position, limit: int):
+    """Standard response shape for every paginated route"""
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(next_position) if next_position is not None else None,
+        "limit": limit,
+    }
+
+
+def _split_page(rows, position, limit: int):
+    next_position = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_position = position(rows[-1])
+    return page_envelope(rows, next_position, limit)
+
+
+def _after_sorted(sort_column, descending: bool, value, last_pk: int, pk_column):
+    """WHERE clause for rows after (value, last_pk) in (col [DESC] NULLS LAST, pk) order"""
+    if value is None:
+        return and_(sort_column.is_(None), pk_column > last_pk)
+    beyond = sort_column < value if descending else sort_column > value
+    return or_(beyond, and_(sort_column == value, pk_column > last_pk), sort_column.is_(None))
+
+
+def paginate(query, pk_column, page: PageParams, sort_column=None, descending: bool = False):
+    """Apply keyset pagination to an ORM query.
+
+    Fetches limit + 1 rows so we know whether another page exists without a
+    COUNT(*). Without sort_column the query is ordered by its primary key.
+    """
+    if sort_column is None:
+        if page.after_pk is not None:
+            query = query.filter(pk_column > page.after_pk)
+        rows = query.order_by(pk_column).limit(page.limit + 1).all()
+        return _split_page(rows, lambda r: getattr(r, pk_column.key), page.limit)
+
+    after = page.after_sorted(sort_column)
+    if after is not None:
+        value, last_pk = after
+        query = query.filter(_after_sorted(sort_column, descending, value, last_pk, pk_column))
+    ordered = sort_column.desc() if descending else sort_column.asc()
+    rows = query.order_by(sort_column.is_(None), ordered, pk_column).limit(page.limit + 1).all()
+    return _split_page(
+        rows, lambda r: [getattr(r, sort_column.key), getattr(r, pk_column.key)], page.limit
+    )
+
+
+async def paginate_async(db, model, pk_column, page: PageParams):
+    """paginate() for an AsyncSession"""
+    statement = select(model)
+    if page.after_pk is not None:
+        statement = statement.where(pk_column > page.after_pk)
+    rows = (await db.scalars(statement.order_by(pk_column).limit(page.limit + 1))).all()
+    return _split_page(rows, lambda r: getattr(r, pk_column.key), page.limit)
@@ -0,0 +1,95 @@
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from profiling import record_checkout
+
+# QueuePool that records how long callers wait for a connection.
+# Served by /metrics/db-pool so pool_size / max_overflow per uvicorn worker
+# can be sized from data.
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = self.timeouts = 0
+            self.wait_total = self.wait_max = 0.0
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool with checkout wait-time and timeout counters"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        waited = time.perf_counter() - start
+        self.stats.record(waited, timed_out=False)
+        record_checkout(waited)  # Server-Timing "pool" (profiling.py)
+        return conn
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+def pool_snapshot(pool) -> dict:
+    """Current gauges + cumulative counters for a pool"""
+    snapshot = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        snapshot.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        snapshot.update({
+            "checkouts_total": stats.checkouts,
+            "timeouts_total": stats.timeouts,
+            "checkout_wait_seconds_total": round(stats.wait_total, 6),
+            "checkout_wait_seconds_max": round(stats.wait_max, 6),
+            "checkout_wait_seconds_avg": round(stats.wait_total / stats.checkouts, 6) if stats.checkouts else 0.0,
+        })
+    return snapshot
+
+
+def prometheus_text(snapshot: dict, prefix: str = "starwars_db_pool") -> str:
+    """Render a pool snapshot in Prometheus text exposition format"""
+    lines = []
+    for key, value in snapshot.items():
+        if isinstance(value, (int, float)):
+            kind = "counter" if key.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {prefix}_{key} {kind}")
+            lines.append(f"{prefix}_{key} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,223 @@
+import asyncio
+import os
+import signal
+import socket
+import time
+import traceback
+
+from sqlalchemy import select
+
+from database import DB_POOL_SIZE, engine, env_int
+
+# Pre-fork production launcher (instead of `uvicorn api:app --reload`).
+#
+#   python starwars.py serve                          # one worker per core on :8000
+#   python starwars.py serve --workers 4 --port 8080
+#   SERVE_WORKERS=4                                   # default for --workers (0 = cores)
+#   SERVE_WARM_MAX_IDS=5000                           # rows per reference table warmed by id
+#
+# The parent imports api.py once and warms up before any worker exists:
+#   - it GETs the reference routes (species, affiliations, franchise,
+#     planets: first list page and every row by id, plus affiliation names)
+#     and one page / one row of every other resource through the ASGI app,
+#     in-process. That compiles the hot statements into the engine's
+#     compiled cache and fills the response cache.
+#   - the cached reference entries move into one read-only shared memory
+#     block (cache.FrozenEntries), and the cache generation / ETag
+#     counters into shared memory (cache.SharedCounters).
+#   - with SNAPSHOT_MODE=1 the catalogue snapshot (snapshot.py) is loaded.
+# It then binds the socket, closes its connections and forks the workers.
+# A worker inherits the imported app, the compiled statements and the
+# frozen entries - one copy in RAM for all workers - opens its
+# DB_POOL_SIZE pooled connections, and only then accepts on the shared
+# socket (uvicorn.Server). A write in any worker bumps the shared
+# counters, so no worker serves a stale reference entry or ETag. The
+# parent restarts workers that die and passes SIGINT / SIGTERM on.
+#
+# Database connections = workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+# POSIX only (fork); CACHE_BACKEND=redis is already shared and is left
+# as-is. benchmarks/bench_workers.py measures 1/2/4/8 workers.
+
+WORKERS = env_int("SERVE_WORKERS", 0)
+WARM_MAX_IDS = env_int("SERVE_WARM_MAX_IDS", 5000)
+
+REFERENCE_ROUTES = {
+    # cache namespace: list / by-id route
+    "species": "/species",
+    "affiliations": "/affiliations",
+    "franchise": "/franchise",
+    "planets": "/planets",
+}
+# compiled once in the parent, cached per request in the workers as usual
+HOT_PATHS = ("/people", "/people/1", "/characters", "/characters/1", "/characters/detailed/all",
+             "/films", "/films/1", "/tvseries", "/books", "/games", "/search?q=sky")
+
+
+async def _get(app, path: str) -> int:
+    """One in-process GET through the ASGI app; returns the status"""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"warmup")], "client": ("127.0.0.1", 0),
+        "server": ("warmup", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def warm_up(app) -> dict:
+    """Run the warm-up GETs, freeze the reference entries, share the counters"""
+    import affiliation_lookup
+    import snapshot
+    from cache import MemoryBackend, SharedCounters, response_cache
+    from database import Base, SessionLocal
+    from orm_models import Affiliation
+
+    start = time.perf_counter()
+    backend = response_cache.backend
+    # versions / Last-Modified live in these counters even with the cache off
+    shared = isinstance(backend, MemoryBackend)
+    if shared:
+        tables = list(Base.metadata.tables)
+        backend.share_counters(SharedCounters(
+            [f"{t}:gen" for t in tables] + [f"version:{t}" for t in tables] + [f"modified:{t}" for t in tables]
+        ))
+
+    paths = list(HOT_PATHS)
+    with engine.connect() as conn:
+        for namespace, route in REFERENCE_ROUTES.items():
+            table = Base.metadata.tables[namespace]
+            pk = table.primary_key.columns[0]
+            ids = conn.execute(select(pk).order_by(pk).limit(WARM_MAX_IDS)).scalars().all()
+            paths += [route] + [f"{route}/{i}" for i in ids]
+
+    async def run():
+        return [await _get(app, path) for path in paths]
+
+    statuses = asyncio.run(run())
+    db = SessionLocal()
+    try:
+        for name in db.execute(select(Affiliation.name)).scalars():
+            affiliation_lookup.resolve(db, name)
+    finally:
+        db.close()
+
+    report = {
+        "requests": len(paths),
+        "errors": sum(s >= 500 for s in statuses),
+        "compiled_statements": len(engine._compiled_cache or ()),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    if snapshot.ENABLED:
+        report["snapshot_rows"] = sum(snapshot.store.load_all().values())
+    if shared and response_cache.enabled:
+        frozen = response_cache.freeze(REFERENCE_ROUTES)
+        report.update(frozen_entries=frozen.count, frozen_bytes=frozen.nbytes)
+    return report
+
+
+def _open_pools():
+    """Check out DB_POOL_SIZE connections per engine at once, then return them to the pool"""
+    from replicas import replica_set
+
+    for bind in [engine] + [r.engine for r in replica_set.replicas]:
+        connections = []
+        try:
+            for _ in range(DB_POOL_SIZE):
+                connections.append(bind.connect())
+        except Exception as e:
+            print(f"worker {os.getpid()}: pool warm-up on {bind.url.render_as_string(hide_password=True)} "
+                  f"failed: {str(e).splitlines()[0]}", flush=True)
+        for conn in connections:
+            conn.close()
+
+
+def _spawn(app, sock, config: dict) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    status = 1
+    try:
+        import uvicorn
+
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        _open_pools()
+        uvicorn.Server(uvicorn.Config(app, **config)).run(sockets=[sock])
+        status = 0
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        os._exit(status)
+
+
+def _dispose_all():
+    from replicas import replica_set
+
+    engine.dispose()
+    for replica in replica_set.replicas:
+        replica.engine.dispose()
+
+
+def serve(workers: int = WORKERS, host: str = "127.0.0.1", port: int = 8000,
+          log_level: str = "info", access_log: bool = False) -> int:
+    if not hasattr(os, "fork"):
+        raise SystemExit("serve needs os.fork (POSIX); on Windows run uvicorn api:app --workers N")
+    import uvicorn  # noqa: F401  fail before warming up if it is missing
+    from api import app
+
+    workers = workers or os.cpu_count() or 1
+    report = warm_up(app)
+    print(f"warm-up: {report}", flush=True)
+    _dispose_all()  # no connection may be shared across fork
+
+    # proto must be IPPROTO_TCP: asyncio only sets TCP_NODELAY on accepted
+    # sockets whose proto says so, and Nagle adds ~40 ms per keep-alive response
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    config = {"lifespan": "on", "log_level": log_level, "access_log": access_log}
+
+    started = {}
+    for _ in range(workers):
+        started[_spawn(app, sock, config)] = time.monotonic()
+    print(f"serving on http://{host}:{port} with {workers} workers (pids {', '.join(map(str, started))})",
+          flush=True)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in started:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    while started:
+        pid, status = os.wait()
+        born = started.pop(pid, None)
+        if born is None or stopping:
+            continue
+        print(f"worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting", flush=True)
+        if time.monotonic() - born < 1:
+            time.sleep(1)  # crashing at startup: do not spin
+        started[_spawn(app, sock, config)] = time.monotonic()
+    sock.close()
+    return 0
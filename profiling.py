@@ -0,0 +1,382 @@
+import bisect
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# Per-request timing breakdown and SQL instrumentation (opt-in).
+#
+#   REQUEST_PROFILING=1              install everything below (default off)
+#   REQUEST_PROFILE_SLOW_MS=500      log requests slower than this with their
+#                                    breakdown (0 = never)
+#   REQUEST_PROFILE_SAMPLE=0.0       fraction of requests whose handler runs
+#                                    under cProfile; a sampled request over the
+#                                    slow threshold is dumped as a .prof file
+#   REQUEST_PROFILE_DIR=./profiles   open dumps with `python -m pstats` / snakeviz
+#
+# Every response gets a Server-Timing header (shown by browser dev tools):
+#   pool        waiting for a pooled connection (pool_metrics.InstrumentedQueuePool)
+#   db          cursor execute time (before_cursor_execute -> after_cursor_execute),
+#               desc = number of statements
+#   db-slowest  the slowest statement, desc = its first 80 characters
+#   serialize   FastJSONResponse.render inside the handler, plus response_model
+#               validation / encoding after the handler returns
+#   app         the rest: routing, dependencies, handler code, ORM hydration
+#   total       up to the first response byte
+# /metrics/requests serves per-route histograms of the same numbers (JSON or
+# Prometheus text). Work done after the first byte (export streams) is
+# counted in the histograms but cannot be in the header.
+#
+# "db" is statement execution only; fetching rows and building ORM objects
+# are part of "app". Endpoints are wrapped by TimedRoute to know when the
+# handler returned; routes from the batch / async / GraphQL routers are not,
+# so their post-handler serialization counts as "app".
+#
+# Overhead: compare benchmarks/bench_endpoints.py runs with and without
+# REQUEST_PROFILING=1 (--out / --compare).
+
+ENABLED = os.getenv("REQUEST_PROFILING", "").strip().lower() in ("1", "true", "yes", "on")
+SLOW_MS = int(os.getenv("REQUEST_PROFILE_SLOW_MS", "500"))
+SAMPLE = float(os.getenv("REQUEST_PROFILE_SAMPLE", "0"))
+PROFILE_DIR = os.getenv("REQUEST_PROFILE_DIR", "./profiles")
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger("uvicorn.error")
+
+_current: ContextVar = ContextVar("request_timings", default=None)
+_profile_lock = threading.Lock()  # one cProfile at a time
+
+
+class RequestTimings:
+    """Counters for one request, shared by every thread that works on it"""
+
+    __slots__ = ("start", "queries", "db", "pool", "serialize", "slowest", "slowest_statement",
+                 "sample", "handler_end", "first_byte", "end", "profiler")
+
+    def __init__(self, sample: bool = False):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db = self.pool = self.serialize = self.slowest = 0.0
+        self.slowest_statement = None
+        self.sample = sample
+        self.handler_end = self.first_byte = self.end = None
+        self.profiler = None
+
+    def record_query(self, statement: str, seconds: float):
+        self.queries += 1
+        self.db += seconds
+        if seconds > self.slowest:
+            self.slowest = seconds
+            self.slowest_statement = statement
+
+    def response_started(self):
+        self.first_byte = time.perf_counter()
+        if self.handler_end is not None:
+            self.serialize += self.first_byte - self.handler_end
+
+    @property
+    def total(self) -> float:
+        return (self.end or self.first_byte or time.perf_counter()) - self.start
+
+    def phases(self) -> dict:
+        """Milliseconds per Server-Timing metric, up to the first byte"""
+        total = (self.first_byte or time.perf_counter()) - self.start
+        return {
+            "pool": self.pool * 1000,
+            "db": self.db * 1000,
+            "db-slowest": self.slowest * 1000,
+            "serialize": self.serialize * 1000,
+            "app": max(total - self.pool - self.db - self.serialize, 0.0) * 1000,
+            "total": total * 1000,
+        }
+
+    def server_timing(self) -> str:
+        descs = {
+            "db": f"{self.queries} statement{'' if self.queries == 1 else 's'}",
+            "db-slowest": _short(self.slowest_statement),
+            "app": "handler, ORM hydration",
+        }
+        parts = []
+        for name, ms in self.phases().items():
+            if name == "db-slowest" and not self.queries:
+                continue
+            part = f"{name};dur={ms:.2f}"
+            if descs.get(name):
+                part += f';desc="{descs[name]}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+def _short(statement: Optional[str], width: int = 80) -> str:
+    if not statement:
+        return ""
+    text = re.sub(r"\s+", " ", statement).strip().replace('"', "'").replace("\\", "/")
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def record_checkout(seconds: float):
+    """Called by InstrumentedQueuePool after each checkout"""
+    timings = _current.get()
+    if timings is not None:
+        timings.pool += seconds
+
+
+def record_serialize(seconds: float):
+    """Called by FastJSONResponse.render"""
+    timings = _current.get()
+    if timings is not None:
+        timings.serialize += seconds
+
+
+# ------------ SQL hooks ------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("profiling_started")
+    timings = _current.get()
+    if started and timings is not None:
+        timings.record_query(statement, time.perf_counter() - started.pop())
+
+
+def _handle_error(context):
+    started = context.connection.info.get("profiling_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def instrument(engine):
+    """Time every statement run on a (sync) engine; no-op unless REQUEST_PROFILING"""
+    if not ENABLED or event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# ------------ per-route histograms ------------
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last = above every bucket
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            yield bound, total
+
+
+class RouteStats:
+    HISTOGRAMS = {
+        "seconds": SECONDS_BUCKETS,
+        "db_seconds": SECONDS_BUCKETS,
+        "serialize_seconds": SECONDS_BUCKETS,
+        "queries": QUERY_BUCKETS,
+    }
+
+    def __init__(self):
+        self.histograms = {name: Histogram(buckets) for name, buckets in self.HISTOGRAMS.items()}
+        self.errors = 0
+        self.slowest_statement = None
+        self.slowest_statement_seconds = 0.0
+
+    def observe(self, timings: RequestTimings, status: int):
+        self.histograms["seconds"].observe(timings.total)
+        self.histograms["db_seconds"].observe(timings.db)
+        self.histograms["serialize_seconds"].observe(timings.serialize)
+        self.histograms["queries"].observe(timings.queries)
+        self.errors += status >= 500
+        if timings.slowest > self.slowest_statement_seconds:
+            self.slowest_statement_seconds = timings.slowest
+            self.slowest_statement = timings.slowest_statement
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, method: str, route: str, timings: RequestTimings, status: int):
+        with self._lock:
+            stats = self.routes.get((method, route))
+            if stats is None:
+                stats = self.routes[(method, route)] = RouteStats()
+            stats.observe(timings, status)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = []
+            for (method, route), stats in sorted(self.routes.items(), key=lambda kv: kv[0][::-1]):
+                h = stats.histograms
+                count = h["seconds"].count
+                routes.append({
+                    "method": method,
+                    "route": route,
+                    "requests": count,
+                    "errors": stats.errors,
+                    "avg_ms": round(h["seconds"].sum / count * 1000, 3),
+                    "max_ms": round(h["seconds"].max * 1000, 3),
+                    "avg_db_ms": round(h["db_seconds"].sum / count * 1000, 3),
+                    "avg_serialize_ms": round(h["serialize_seconds"].sum / count * 1000, 3),
+                    "avg_queries": round(h["queries"].sum / count, 2),
+                    "max_queries": int(h["queries"].max),
+                    "slowest_statement_ms": round(stats.slowest_statement_seconds * 1000, 3),
+                    "slowest_statement": _short(stats.slowest_statement, 200) or None,
+                })
+        return {"enabled": ENABLED, "slow_ms": SLOW_MS, "sample": SAMPLE, "routes": routes}
+
+    def prometheus_text(self, prefix: str = "starwars_request") -> str:
+        """Histograms in Prometheus text exposition format, labelled by method and route"""
+        lines = []
+        with self._lock:
+            for name in RouteStats.HISTOGRAMS:
+                metric = f"{prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for (method, route), stats in sorted(self.routes.items()):
+                    labels = f'method="{method}",route="{route}"'
+                    histogram = stats.histograms[name]
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f"{metric}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# ------------ cProfile sampling ------------
+def _start_profile(timings: Optional[RequestTimings]):
+    if timings is None or not timings.sample or not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _finish_handler(timings: Optional[RequestTimings], profiler):
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+        timings.profiler = profiler
+    if timings is not None:
+        timings.handler_end = time.perf_counter()
+
+
+def _timed(endpoint):
+    """Wrap an endpoint to mark when it returned (and run it under cProfile if sampled).
+
+    cProfile only sees the thread it is enabled on, so it covers the handler
+    itself - the threadpool thread of a sync route - not dependencies or
+    serialization.
+    """
+    if inspect.isgeneratorfunction(endpoint) or inspect.isasyncgenfunction(endpoint):
+        return endpoint
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            timings = _current.get()
+            profiler = _start_profile(timings)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _finish_handler(timings, profiler)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            profiler = _start_profile(timings)
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _finish_handler(timings, profiler)
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """APIRoute whose endpoint records when it returned (app.router.route_class)"""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed(endpoint), **kwargs)
+
+
+def _dump_profile(method: str, route: str, timings: RequestTimings) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    path = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}-{method}-{slug}-{timings.total * 1000:.0f}ms.prof")
+    timings.profiler.dump_stats(path)
+    return path
+
+
+# ------------ middleware ------------
+class ProfilingMiddleware:
+    """ASGI middleware: times each request, adds Server-Timing, feeds the histograms.
+
+    Outermost middleware, so "total" includes the other middlewares.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = RequestTimings(sample=SAMPLE > 0 and random.random() < SAMPLE)
+        token = _current.set(timings)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings.response_started()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            timings.end = time.perf_counter()
+            method = scope["method"]
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            registry.observe(method, route, timings, status)
+            if SLOW_MS and timings.total * 1000 >= SLOW_MS:
+                phases = ", ".join(f"{name} {ms:.1f}ms" for name, ms in timings.phases().items())
+                dumped = f", profile {_dump_profile(method, route, timings)}" if timings.profiler else ""
+                logger.warning("slow request %s %s (%s): %s, %d statements%s",
+                               method, scope["path"], route, phases, timings.queries, dumped)
@@ -0,0 +1,247 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import List, Optional
+
+from sqlalchemy import event, text
+
+from database import engine, env_int, make_engine
+
+# Read-replica routing.
+#
+#   DATABASE_REPLICA_URLS=mysql+pymysql://ro@replica1/starwarsDB,mysql+pymysql://ro@replica2/starwarsDB
+#   DB_REPLICA_STRATEGY=round_robin|least_connections   (default round_robin)
+#   DB_REPLICA_HEALTH_INTERVAL=5     seconds between SELECT 1 checks of each replica
+#   DB_READ_YOUR_WRITES=5            seconds a client reads from the primary after a write
+#
+# DATABASE_URL stays the primary. ReplicaRoutingMiddleware picks the engine
+# for each request: GET / HEAD go to a healthy replica, everything else to
+# the primary. get_db(), the search / stats routes and the export streams
+# read current_bind(). After a successful write the response sets a
+# short-lived cookie (READ_YOUR_WRITES_COOKIE); while a client sends it, its
+# GETs also go to the primary, so it sees its own write despite replica
+# lag. The cookie is stateless, so this works across workers.
+#
+# Writes by other clients are covered per table: conditional_get() (etag.py)
+# passes the time of the newest write to the tables a route reads to
+# read_primary_if_modified(), which moves the request to the primary while
+# that is within READ_YOUR_WRITES seconds. A lagging replica would otherwise
+# put the old rows into the response cache / blob store under the new ETag.
+# Those write times live in the cache backend's counters, so with several
+# workers this needs them shared: CACHE_BACKEND=redis, or starwars.py serve
+# (see cache.py). With per-process counters a worker only knows its own
+# writes.
+#
+# A replica is marked down when its health check fails, or when a
+# statement on it hits a disconnect. It comes back at the next passing
+# check. With no healthy replica, reads fall back to the primary. The
+# asyncio engine (/async, /graphql) always uses the primary.
+#
+# Without DATABASE_REPLICA_URLS every request uses the primary, as before.
+# Locally, replicas can be copies of a SQLite file (see
+# benchmarks/bench_replicas.py).
+
+REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+STRATEGY = os.getenv("DB_REPLICA_STRATEGY", "round_robin").strip().lower()
+HEALTH_INTERVAL = env_int("DB_REPLICA_HEALTH_INTERVAL", 5)
+READ_YOUR_WRITES = env_int("DB_READ_YOUR_WRITES", 5)
+
+READ_YOUR_WRITES_COOKIE = "sw_primary"
+READ_METHODS = ("GET", "HEAD")
+
+logger = logging.getLogger("uvicorn.error")
+
+_current_route: ContextVar = ContextVar("db_route", default=None)
+
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = make_engine(url)
+        self.healthy = True
+        self.failures = 0
+        self.picks = 0
+        self.last_check = None
+        self.last_error = None
+        event.listen(self.engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect:
+            self.mark_down(str(context.original_exception))
+
+    def mark_down(self, error: str):
+        if self.healthy:
+            logger.warning("replica %s marked down: %s", self.name, error.splitlines()[0] if error else "")
+        self.healthy = False
+        self.failures += 1
+        self.last_error = error
+
+    def check(self) -> bool:
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception as e:
+            self.mark_down(str(e))
+        else:
+            if not self.healthy:
+                logger.info("replica %s healthy again", self.name)
+            self.healthy = True
+        self.last_check = time.monotonic()
+        return self.healthy
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "url": self.engine.url.render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "checked_out": self.engine.pool.checkedout(),
+            "picks": self.picks,
+            "failures": self.failures,
+            "last_check_age_seconds": None if self.last_check is None else round(time.monotonic() - self.last_check, 1),
+            "last_error": self.last_error.splitlines()[0] if self.last_error else None,
+        }
+
+
+class ReplicaSet:
+    """Primary engine plus N replicas; pick() chooses the engine for a read"""
+
+    def __init__(self, primary, urls: List[str], strategy: str = "round_robin"):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"DB_REPLICA_STRATEGY must be round_robin or least_connections, not {strategy!r}")
+        self.primary = primary
+        self.replicas = [Replica(f"replica-{i + 1}", url) for i, url in enumerate(urls)]
+        self.strategy = strategy
+        self.primary_reads = 0
+        self.recent_write_reads = 0
+        self._turn = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def pick(self) -> Optional[Replica]:
+        """A healthy replica, or None (read from the primary)"""
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            self.primary_reads += 1
+            return None
+        if self.strategy == "least_connections":
+            fewest = min(r.engine.pool.checkedout() for r in healthy)
+            healthy = [r for r in healthy if r.engine.pool.checkedout() == fewest]
+        replica = healthy[next(self._turn) % len(healthy)]
+        replica.picks += 1
+        return replica
+
+    def check(self):
+        for replica in self.replicas:
+            replica.check()
+
+    def _run(self):
+        while not self._stop.wait(HEALTH_INTERVAL):
+            self.check()
+
+    def start(self):
+        """Check every replica now, then every HEALTH_INTERVAL seconds in a daemon thread"""
+        if not self.replicas or self._thread:
+            return
+        self.check()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=HEALTH_INTERVAL + 1)
+            self._thread = None
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+    def status(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "read_your_writes_seconds": READ_YOUR_WRITES,
+            "health_interval_seconds": HEALTH_INTERVAL,
+            "primary_reads": self.primary_reads,
+            "recent_write_reads": self.recent_write_reads,
+            "replicas": [r.status() for r in self.replicas],
+        }
+
+
+replica_set = ReplicaSet(engine, REPLICA_URLS, STRATEGY)
+
+
+class _Route:
+    """Engine chosen for one request. Mutable: sync dependencies run in a
+    copied context, so re-routing has to change the object, not the ContextVar."""
+
+    __slots__ = ("engine", "node")
+
+    def __init__(self, replica: Optional[Replica]):
+        self.engine = replica.engine if replica else engine
+        self.node = replica.name if replica else "primary"
+
+
+def current_bind():
+    """Engine for the current request's database work (primary outside requests)"""
+    route = _current_route.get()
+    return route.engine if route else engine
+
+
+def read_primary_if_modified(modified: float):
+    """Read from the primary if the request's tables changed within READ_YOUR_WRITES seconds.
+
+    modified: TableVersions.last_write() of the tables the route reads.
+    """
+    route = _current_route.get()
+    if route is None or route.engine is engine or READ_YOUR_WRITES <= 0:
+        return
+    if time.time() < modified + READ_YOUR_WRITES:
+        route.engine, route.node = engine, "primary"
+        replica_set.recent_write_reads += 1
+
+
+def _sticky(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"cookie" and READ_YOUR_WRITES_COOKIE in SimpleCookie(value.decode("latin-1")):
+            return True
+    return False
+
+
+class ReplicaRoutingMiddleware:
+    """ASGI middleware: binds each request to a replica or the primary.
+
+    Sets the X-DB-Node response header (primary / replica-N) and, after a
+    successful write, the read-your-writes cookie.
+    """
+
+    def __init__(self, app, replicas: ReplicaSet = replica_set):
+        self.app = app
+        self.replicas = replicas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.replicas.replicas:
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        replica = None
+        if method in READ_METHODS and not _sticky(scope):
+            replica = self.replicas.pick()
+        route = _Route(replica)
+        token = _current_route.set(route)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-node", route.node.encode()))
+                if method not in READ_METHODS and message["status"] < 400 and READ_YOUR_WRITES > 0:
+                    cookie = f"{READ_YOUR_WRITES_COOKIE}=1; Max-Age={READ_YOUR_WRITES}; Path=/; HttpOnly; SameSite=Lax"
+                    headers.append((b"set-cookie", cookie.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_route.reset(token)
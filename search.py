@@ -0,0 +1,487 @@
+import bisect
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query
+from sqlalchemy import func, inspect, select, text
+
+import triggers
+from database import engine, env_int
+from orm_models import Book, ChangeLog, Character, Game, Person, Planet, TVSeries
+
+# Name / title search (GET /search?q=).
+#
+#   python starwars.py search rebuild   # (re)create the index + sync triggers, fill it
+#   python starwars.py search status
+#
+# SQLite: one FTS5 table, search_fts, with a prefix index for 1-8 character
+# prefixes. Triggers (triggers.py) on the source tables mirror each written
+# row into it; the rowid is pk * 8 + source code, so a trigger touches only
+# its own row.
+#
+# MySQL/MariaDB: a FULLTEXT index (ngram parser) on each source table,
+# maintained by InnoDB. Each tier runs one MATCH ... AGAINST (... IN
+# BOOLEAN MODE) per table (+term, +term*, +(term* correction ...)) and
+# merges the results. NATURAL LANGUAGE MODE is not used: it has neither
+# prefix matching nor typo tolerance.
+#
+# Matching runs in tiers, each one only if the previous tiers found fewer
+# than `limit` rows:
+#   exact   every term is a whole word               ("luke")
+#   prefix  every term starts a word                 ("sky" -> Skywalker)
+#   fuzzy   words within edit distance 1-2 of a term ("skywalkr")
+# Within a tier, rows whose title starts with the query come first, then
+# rows matching in the title rather than the extra column, then shorter
+# titles; the ranking runs in SQL, so only `limit` rows per tier reach
+# Python. Each tier reads at most SCAN_LIMIT matches, so a query matching
+# millions of rows ("character") costs about the same as a rare one. bm25
+# is not used: it needs the document count of every term, i.e. a walk of
+# the whole posting list of a common word.
+#
+# Prefixes of 1-8 characters come straight from the prefix index. A single
+# character is a prefix only as the last term, the word being typed
+# ("timothy z"); elsewhere it matches a whole word. Longer prefixes, and
+# fuzzy candidates, come from a per-process copy of the index vocabulary
+# (words containing a letter), refreshed in the background every
+# SEARCH_VOCAB_TTL seconds. A word first indexed since the last refresh is
+# found as an exact word straight away, and by long prefix / typo once the
+# vocabulary catches up. On MySQL there is no fts5vocab table: the
+# vocabulary is read from the title / extra columns of the source tables
+# once, then only the rows change_log (changes.py) lists as written since
+# are read again; without change_log every refresh rereads the tables.
+# benchmarks/bench_search.py measures the latency.
+
+SCAN_LIMIT = 1000
+MAX_RESULTS = 50
+PREFIX_INDEX = (1, 2, 3, 4, 5, 6, 7, 8)
+VOCAB_TTL = env_int("SEARCH_VOCAB_TTL", 300)  # seconds
+VOCAB_CANDIDATES = 2000   # vocabulary words examined per fuzzy term
+EXPANSIONS_PER_TERM = 50  # most frequent words kept per long prefix
+FUZZY_PER_TERM = 8        # closest words kept per fuzzy term
+MIN_FUZZY_LENGTH = 4      # shorter terms are never corrected
+
+TIERS = (("exact", 3.0), ("prefix", 2.0), ("fuzzy", 1.0))
+
+
+@dataclass
+class SearchSource:
+    kind: str
+    path: str
+    model: type
+    title: str
+    extra: Optional[str] = None
+
+    @property
+    def table(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def pk(self) -> str:
+        return self.model.__table__.primary_key.columns[0].key
+
+
+SOURCES = [
+    SearchSource("characters", "/characters", Character, "name"),
+    SearchSource("people", "/people", Person, "name"),
+    SearchSource("planets", "/planets", Planet, "name"),
+    SearchSource("books", "/books", Book, "title", "author"),
+    SearchSource("games", "/games", Game, "title", "developer"),
+    SearchSource("tv_series", "/tvseries", TVSeries, "title"),
+]
+SOURCE_BY_KIND = {s.kind: s for s in SOURCES}
+CODES = {s.kind: i + 1 for i, s in enumerate(SOURCES)}  # rowid = pk * 8 + code
+
+SEARCH_TABLES = tuple(s.table for s in SOURCES)
+
+
+class SearchUnavailable(RuntimeError):
+    pass
+
+
+def tokenize(q: str) -> List[str]:
+    return re.findall(r"\w+", q.lower())
+
+
+def edit_distance(a: str, b: str, cutoff: int) -> int:
+    """Levenshtein distance, giving up (cutoff + 1) once it exceeds cutoff"""
+    if abs(len(a) - len(b)) > cutoff:
+        return cutoff + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > cutoff:
+            return cutoff + 1
+        previous = current
+    return previous[-1]
+
+
+def types_param(
+    types: Optional[str] = Query(None, description=f"comma-separated: {', '.join(SOURCE_BY_KIND)}"),
+) -> List[str]:
+    """Route dependency: validated ?types= list (empty = everything)"""
+    if not types:
+        return []
+    kinds = list(dict.fromkeys(t.strip() for t in types.split(",") if t.strip()))
+    unknown = [k for k in kinds if k not in SOURCE_BY_KIND]
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Cannot search {', '.join(unknown)}; searchable: {', '.join(SOURCE_BY_KIND)}")
+    return kinds
+
+
+def _is_mysql(bind) -> bool:
+    return bind.dialect.name in ("mysql", "mariadb")
+
+
+# ------------ SQLite (FTS5) ------------
+def _sqlite_triggers():
+    for source in SOURCES:
+        code, pk = CODES[source.kind], source.pk
+        extra = f"NEW.{source.extra}" if source.extra else "NULL"
+        insert = (f"INSERT INTO search_fts (rowid, title, extra, kind, ref_id) "
+                  f"VALUES (NEW.{pk} * 8 + {code}, NEW.{source.title}, {extra}, '{source.kind}', NEW.{pk});")
+        delete = f"DELETE FROM search_fts WHERE rowid = OLD.{pk} * 8 + {code};"
+        for suffix, event, body in (("ins", "AFTER INSERT", insert),
+                                    ("upd", "AFTER UPDATE", delete + " " + insert),
+                                    ("del", "AFTER DELETE", delete)):
+            yield triggers.row_trigger(f"trg_search_{source.table}_{suffix}", event, source.table, body)
+
+
+def _mysql_index(source: SearchSource) -> Tuple[str, str]:
+    columns = source.title + (f", {source.extra}" if source.extra else "")
+    return f"ftx_{source.table}_search", columns
+
+
+def install(bind=engine):
+    """Create the index structures (idempotent)"""
+    with bind.begin() as conn:
+        if _is_mysql(bind):
+            existing = {t: {i["name"] for i in inspect(conn).get_indexes(t)} for t in SEARCH_TABLES}
+            for source in SOURCES:
+                name, columns = _mysql_index(source)
+                if name not in existing[source.table]:
+                    conn.exec_driver_sql(f"ALTER TABLE {source.table} ADD FULLTEXT INDEX {name} ({columns}) WITH PARSER ngram")
+            return
+        prefix = " ".join(str(n) for n in PREFIX_INDEX)
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+            "title, extra, kind UNINDEXED, ref_id UNINDEXED, "
+            f"tokenize = 'unicode61 remove_diacritics 2', prefix = '{prefix}')"
+        )
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE IF NOT EXISTS search_vocab USING fts5vocab(search_fts, 'row')")
+        triggers.replace(conn, _sqlite_triggers())
+
+
+def rebuild(bind=engine) -> int:
+    """Recreate and refill the SQLite index; returns documents indexed"""
+    if _is_mysql(bind):
+        # InnoDB maintains FULLTEXT indexes itself
+        install(bind)
+        return status(bind)["documents"]
+    with bind.begin() as conn:
+        # dropped rather than emptied so a changed table definition applies
+        conn.exec_driver_sql("DROP TABLE IF EXISTS search_vocab")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS search_fts")
+    install(bind)
+    with bind.begin() as conn:
+        for source in SOURCES:
+            extra = source.extra or "NULL"
+            conn.exec_driver_sql(
+                f"INSERT INTO search_fts (rowid, title, extra, kind, ref_id) "
+                f"SELECT {source.pk} * 8 + {CODES[source.kind]}, {source.title}, {extra}, '{source.kind}', {source.pk} "
+                f"FROM {source.table}"
+            )
+        conn.exec_driver_sql("INSERT INTO search_fts (search_fts) VALUES ('optimize')")
+        documents = conn.exec_driver_sql("SELECT COUNT(*) FROM search_fts").scalar()
+    _vocabularies.pop(str(bind.url), None)
+    return documents
+
+
+def status(bind=engine) -> dict:
+    with bind.connect() as conn:
+        if _is_mysql(bind):
+            indexed = [s.table for s in SOURCES
+                       if _mysql_index(s)[0] in {i["name"] for i in inspect(conn).get_indexes(s.table)}]
+            documents = sum(conn.exec_driver_sql(f"SELECT COUNT(*) FROM {t}").scalar() for t in indexed)
+            return {"backend": "mysql-fulltext", "installed": len(indexed) == len(SOURCES),
+                    "tables": indexed, "documents": documents}
+        installed = "search_fts" in inspect(conn).get_table_names()
+        documents = conn.exec_driver_sql("SELECT COUNT(*) FROM search_fts").scalar() if installed else 0
+        sources = sum(conn.exec_driver_sql(f"SELECT COUNT(*) FROM {t}").scalar() for t in SEARCH_TABLES)
+    vocabulary = _vocabularies.get(str(bind.url))
+    return {"backend": "sqlite-fts5", "installed": installed, "documents": documents,
+            "source_rows": sources, "drift_rows": abs(sources - documents),
+            "vocabulary_words": vocabulary.size if vocabulary else None,
+            "vocabulary_age_seconds": vocabulary.age() if vocabulary else None}
+
+
+class Vocabulary:
+    """Indexed words containing a letter, with document counts, bucketed by first two letters"""
+
+    def __init__(self, bind):
+        self.bind = bind
+        self.buckets: Dict[str, List[Tuple[str, int]]] = {}
+        self.size = 0
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def age(self) -> Optional[float]:
+        return None if self.loaded_at is None else round(time.monotonic() - self.loaded_at, 1)
+
+    def _words(self) -> List[Tuple[str, int]]:
+        """(word, documents) sorted by word"""
+        with self.bind.connect() as conn:
+            return conn.exec_driver_sql(
+                "SELECT term, doc FROM search_vocab WHERE term GLOB '*[a-z]*' ORDER BY term"
+            ).all()
+
+    def load(self):
+        rows = self._words()
+        buckets = {}
+        for term, docs in rows:
+            buckets.setdefault(term[:2], []).append((term, docs))
+        self.buckets, self.size, self.loaded_at = buckets, len(rows), time.monotonic()
+
+    def _refresh(self):
+        try:
+            self.load()
+        finally:
+            self._refreshing = False
+
+    def current(self) -> "Vocabulary":
+        """Load on first use; afterwards refresh in the background once older than VOCAB_TTL"""
+        if self.loaded_at is None:
+            with self._lock:
+                if self.loaded_at is None:
+                    self.load()
+        elif time.monotonic() - self.loaded_at > VOCAB_TTL and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._refresh, name="search-vocab", daemon=True).start()
+        return self
+
+    def starting_with(self, prefix: str) -> List[Tuple[str, int]]:
+        bucket = self.buckets.get(prefix[:2], [])
+        i = bisect.bisect_left(bucket, (prefix,))
+        words = []
+        while i < len(bucket) and bucket[i][0].startswith(prefix):
+            words.append(bucket[i])
+            i += 1
+        return words
+
+    def similar(self, term: str) -> List[str]:
+        """Words within edit distance of term (same first two letters), closest and most frequent first"""
+        if len(term) < MIN_FUZZY_LENGTH:
+            return []
+        cutoff = 1 if len(term) <= 5 else 2
+        scored = []
+        for word, docs in self.buckets.get(term[:2], [])[:VOCAB_CANDIDATES]:
+            if word != term and not word.startswith(term):
+                distance = edit_distance(term, word, cutoff)
+                if distance <= cutoff:
+                    scored.append((distance, -docs, word))
+        return [word for _, _, word in sorted(scored)[:FUZZY_PER_TERM]]
+
+
+class SourceVocabulary(Vocabulary):
+    """Vocabulary read from the source columns (MySQL: no fts5vocab).
+
+    After the first full read only the rows written since (per change_log)
+    are read; their words are added. Words of deleted or renamed rows stay
+    until the next full read: they only cost a fuzzy candidate that
+    matches nothing.
+    """
+
+    FULL_READ_CHANGES = 100000  # more changes than this: reread the tables
+
+    def __init__(self, bind):
+        super().__init__(bind)
+        self.docs: Dict[str, int] = {}
+        self.version: Optional[int] = None  # change_log version self.docs covers
+
+    def _add(self, conn, source: SearchSource, pks: Optional[List[int]] = None):
+        """Count the words of source's rows (all, or those with primary key in pks)"""
+        table = source.model.__table__
+        statement = select(*[table.c[c] for c in (source.title, source.extra) if c])
+        if pks is not None:
+            statement = statement.where(table.c[source.pk].in_(pks))
+        for row in conn.execution_options(stream_results=True).execute(statement):
+            for word in set(tokenize(" ".join(v for v in row if v))):
+                if re.search(r"[a-z]", word):
+                    self.docs[word] = self.docs.get(word, 0) + 1
+
+    def _words(self) -> List[Tuple[str, int]]:
+        with self.bind.connect() as conn:
+            oldest = latest = None
+            if inspect(conn).has_table(ChangeLog.__tablename__):
+                oldest, latest = conn.execute(select(func.min(ChangeLog.version), func.max(ChangeLog.version))).one()
+                latest = latest or 0
+            # pruned past self.version, or too many changes: a full read is cheaper / the only option
+            incremental = (latest is not None and self.version is not None
+                           and (oldest is None or oldest <= self.version + 1)
+                           and 0 <= latest - self.version <= self.FULL_READ_CHANGES)
+            if incremental:
+                written = conn.execute(select(ChangeLog.entity, ChangeLog.pk).where(
+                    ChangeLog.version > self.version, ChangeLog.version <= latest,
+                    ChangeLog.entity.in_(SEARCH_TABLES), ChangeLog.op != "delete")).all()
+                for source in SOURCES:
+                    pks = sorted({pk for entity, pk in written if entity == source.table})
+                    for i in range(0, len(pks), 1000):
+                        self._add(conn, source, pks[i:i + 1000])
+            else:
+                self.docs = {}
+                for source in SOURCES:
+                    self._add(conn, source)
+            self.version = latest
+        return sorted(self.docs.items())
+
+
+_vocabularies: Dict[str, Vocabulary] = {}
+
+
+def vocabulary(bind=engine) -> Vocabulary:
+    key = str(bind.url)
+    if key not in _vocabularies:
+        _vocabularies[key] = (SourceVocabulary if _is_mysql(bind) else Vocabulary)(bind)
+    return _vocabularies[key].current()
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _prefix_alternatives(term: str, bind, last: bool) -> List[str]:
+    if len(term) == 1 and not last:
+        return [_quote(term)]  # a lone letter mid-query ("episode i ...") is a word
+    if len(term) <= PREFIX_INDEX[-1] or not re.search(r"[a-z]", term):
+        return [_quote(term) + "*"]
+    # longer prefixes are not in the prefix index; FTS5 would merge the
+    # posting lists of every matching word before returning a row
+    words = sorted(vocabulary(bind).starting_with(term), key=lambda w: -w[1])[:EXPANSIONS_PER_TERM]
+    return [_quote(term)] + [_quote(w) for w, _ in words if w != term]
+
+
+def _match_expressions(terms, bind, fuzzy, corrections):
+    """Yield (tier, FTS5 MATCH expression) in tier order"""
+    yield "exact", " AND ".join(_quote(t) for t in terms)
+    last = len(terms) - 1
+    yield "prefix", " AND ".join("(" + " OR ".join(_prefix_alternatives(t, bind, i == last)) + ")"
+                                 for i, t in enumerate(terms))
+    if not fuzzy:
+        return
+    groups = []
+    for i, term in enumerate(terms):
+        similar = vocabulary(bind).similar(term) if re.search(r"[a-z]", term) else []
+        if similar:
+            corrections[term] = similar
+        alternatives = _prefix_alternatives(term, bind, i == last) + [_quote(w) for w in similar]
+        groups.append("(" + " OR ".join(alternatives) + ")")
+    if corrections:
+        yield "fuzzy", " AND ".join(groups)
+
+
+def _search_sqlite(conn, terms, kinds, limit, fuzzy, bind):
+    kind_filter = ""
+    if set(kinds) != set(SOURCE_BY_KIND):
+        kind_filter = f" AND rowid % 8 IN ({', '.join(str(CODES[k]) for k in kinds)})"
+    # within a tier: title starts with the query (0.5), share of terms found in the title (0.25)
+    phrase = " ".join(terms)
+    in_title = " + ".join("(instr(lower(title), ?) > 0)" for _ in terms)
+    bonus = f"(substr(lower(title), 1, {len(phrase)}) = ?) * 0.5 + ({in_title}) * {0.25 / len(terms)}"
+    weights = dict(TIERS)
+    found, corrections = {}, {}
+    for tier, expression in _match_expressions(terms, bind, fuzzy, corrections):
+        if len(found) >= limit:
+            break
+        rows = conn.exec_driver_sql(
+            f"SELECT rowid, kind, ref_id, title, extra, {bonus} AS bonus FROM ("
+            f"  SELECT rowid, kind, ref_id, title, extra FROM search_fts"
+            f"  WHERE search_fts MATCH ?{kind_filter} LIMIT ?"
+            f") ORDER BY bonus DESC, length(title), rowid LIMIT ?",
+            (phrase, *terms, expression, SCAN_LIMIT, limit + len(found)),
+        ).all()
+        for rowid, kind, ref_id, title, extra, score in rows:
+            if rowid not in found and len(found) < limit:
+                found[rowid] = {"kind": kind, "ref_id": ref_id, "title": title, "extra": extra,
+                                "score": weights[tier] + score}
+    return list(found.values()), corrections
+
+
+def _boolean_expressions(terms, bind, fuzzy, corrections):
+    """Yield (tier, BOOLEAN MODE AGAINST string) in tier order (terms are word characters only)"""
+    yield "exact", " ".join(f"+{t}" for t in terms)
+    yield "prefix", " ".join(f"+{t}*" for t in terms)
+    if not fuzzy:
+        return
+    groups = []
+    for term in terms:
+        similar = vocabulary(bind).similar(term) if re.search(r"[a-z]", term) else []
+        if similar:
+            corrections[term] = similar
+        groups.append(f"+({term}* {' '.join(similar)})" if similar else f"+{term}*")
+    if corrections:
+        yield "fuzzy", " ".join(groups)
+
+
+def _search_mysql(conn, terms, kinds, limit, fuzzy, bind):
+    phrase = " ".join(terms)
+    weights = dict(TIERS)
+    found, corrections = {}, {}
+    for tier, against in _boolean_expressions(terms, bind, fuzzy, corrections):
+        if len(found) >= limit:
+            break
+        rows = []
+        for kind in kinds:
+            source = SOURCE_BY_KIND[kind]
+            _, columns = _mysql_index(source)
+            extra = source.extra or "NULL"
+            rows += conn.execute(text(
+                f"SELECT '{kind}' AS kind, {source.pk} AS ref_id, {source.title} AS title, {extra} AS extra, "
+                f"MATCH({columns}) AGAINST (:q IN BOOLEAN MODE) AS relevance FROM {source.table} "
+                f"WHERE MATCH({columns}) AGAINST (:q IN BOOLEAN MODE) LIMIT :n"
+            ), {"q": against, "n": SCAN_LIMIT}).mappings().all()
+        scored = []
+        for row in rows:
+            title = (row["title"] or "").lower()
+            # same bonus as the SQLite ranking: starts with the query, share of terms in the title
+            bonus = title.startswith(phrase) * 0.5 + sum(t in title for t in terms) * 0.25 / len(terms)
+            scored.append((-bonus, len(title), -float(row["relevance"] or 0), row))
+        scored.sort(key=lambda r: r[:3])
+        for negative_bonus, _, _, row in scored:
+            key = (row["kind"], row["ref_id"])
+            if key not in found and len(found) < limit:
+                found[key] = {"kind": row["kind"], "ref_id": row["ref_id"], "title": row["title"],
+                              "extra": row["extra"], "score": weights[tier] - negative_bonus}
+    return list(found.values()), corrections
+
+
+def search(q: str, kinds: Optional[Sequence[str]] = None, limit: int = 20, fuzzy: bool = True, bind=engine) -> dict:
+    """Ranked matches for q across SOURCES (or only `kinds`)"""
+    terms = tokenize(q)
+    kinds = list(kinds) if kinds else list(SOURCE_BY_KIND)
+    if not terms:
+        return {"query": q, "items": [], "corrections": {}}
+    with bind.connect() as conn:
+        try:
+            if _is_mysql(bind):
+                rows, corrections = _search_mysql(conn, terms, kinds, limit, fuzzy, bind)
+            else:
+                rows, corrections = _search_sqlite(conn, terms, kinds, limit, fuzzy, bind)
+        except Exception as e:
+            if "search_fts" in str(e) or "FULLTEXT" in str(e):
+                raise SearchUnavailable("Search index missing. Run `python starwars.py search rebuild` first.")
+            raise
+    items = [{
+        "type": row["kind"],
+        "id": row["ref_id"],
+        "title": row["title"],
+        "extra": row["extra"],
+        "score": round(float(row["score"] or 0), 4),
+        "path": f"{SOURCE_BY_KIND[row['kind']].path}/{row['ref_id']}",
+    } for row in rows]
+    return {"query": q, "items": items, "corrections": corrections}
@@ -0,0 +1,71 @@
+import time
+from typing import Optional
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+from profiling import record_serialize
+
+try:
+    import orjson
+except ImportError:  # pip install orjson
+    orjson = None
+
+# Fast read path for GET handlers.
+#
+# Rows are selected as plain column tuples (no ORM identity map, no
+# instance state), turned into dicts and rendered straight to bytes with
+# orjson. Returning the Response ourselves also skips FastAPI's
+# jsonable_encoder pass and response_model validation; the response_model
+# on each route still documents the shape in OpenAPI.
+#
+# Walking 100k characters this is ~3.5x less CPU per request than ORM
+# instances + jsonable_encoder (benchmarks/bench_serialization.py).
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson (stdlib json when orjson is missing).
+
+    Same as fastapi.responses.ORJSONResponse, which recent FastAPI releases
+    deprecate in favour of response_model serialization - that path
+    validates every row, which is the cost we are avoiding here.
+    """
+
+    def render(self, content) -> bytes:
+        start = time.perf_counter()
+        if orjson is None:
+            body = super().render(content)
+        else:
+            body = orjson.dumps(content, default=str)
+        record_serialize(time.perf_counter() - start)
+        return body
+
+
+def fast_json(content, response: Optional[Response] = None, status_code: int = 200):
+    """Render content with orjson.
+
+    Pass the route's injected `response`: headers set on it by
+    dependencies (ETag / Last-Modified from etag.conditional_get) are not
+    merged by FastAPI when a handler returns its own Response.
+    """
+    out = FastJSONResponse(content, status_code=status_code)
+    if response is not None:
+        out.headers.raw.extend(response.headers.raw)
+    return out
+
+
+def dumps(value) -> str:
+    """One JSON document as text (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str).decode()
+    import json
+    return json.dumps(value, default=str)
+
+
+def fetch_row(db, model, pk_value) -> Optional[dict]:
+    """One row by primary key as a plain dict, or None"""
+    table = model.__table__
+    pk = table.primary_key.columns[0]
+    row = db.execute(select(*table.columns).where(pk == pk_value)).first()
+    return row._asdict() if row is not None else None
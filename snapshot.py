@@ -0,0 +1,446 @@
+import bisect
+import operator
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import inspect, select
+
+from database import engine, env_bool, env_int
+from etag import table_versions
+from orm_models import Affiliation, Book, Film, Franchise, Game, Planet, Species, TVSeries
+from pagination import page_envelope
+
+# Columnar in-memory snapshot of the catalogue tables (franchise, films,
+# tv_series, books, games, planets, species, affiliations).
+#
+#   SNAPSHOT_MODE=1        serve their GET routes from memory (default off)
+#   SNAPSHOT_MAX_AGE=300   seconds before a table is reloaded without any API write (0 = never)
+#   /stats/box-office|releases|seasons?source=snapshot   aggregates from memory
+#
+# Each table is stored column by column, rows in primary-key order:
+#   - integer columns: array('q'), 8 bytes a row, NULL as a sentinel
+#   - other columns: dictionary-encoded, array('I') of codes into the list
+#     of distinct values (ratings, regions, developers repeat a lot); a
+#     filter tests each distinct value once, then compares codes
+#   - pk -> row offset (dict); per FK column, value -> row offsets
+#     (array('I')), used for ?franchise_id= and for ?expand= on /franchise
+# ListQuery filters / sort / fields, keyset cursors, expansions and
+# get-by-id give the same JSON as the database path, with no session, no
+# round-trip and no ORM hydration.
+#
+# Reloads are copy-on-write: a TableSnapshot is never modified after it
+# is built. It records the table's version counter (etag.table_versions,
+# bumped by record_write) at load; the first read that sees a newer
+# version builds a new TableSnapshot from the primary and swaps it in with
+# one reference assignment, while requests holding the old one finish on
+# it. A franchise DELETE sets films / tv_series / books / games
+# .franchise_id to NULL, and api.record_delete bumps those tables' versions
+# too, so their snapshots reload on the next read as well. Under
+# `starwars.py serve` the counters are shared between workers and
+# prefork.py loads the snapshot before forking; array buffers are not
+# touched by reference counting, so those pages stay shared. Writes that
+# bypass the API are picked up after SNAPSHOT_MAX_AGE.
+#
+# Text compares by code point (SQLite's BINARY collation) and
+# ?x__startswith= ignores case like LIKE. On MySQL with a case-insensitive
+# collation ?name=luke matches "Luke" in SQL but not here.
+#
+# GET /metrics/snapshot: rows, bytes per row and get-by-id latency per
+# table. benchmarks/bench_snapshot.py compares with the database path.
+
+ENABLED = env_bool("SNAPSHOT_MODE", False)
+MAX_AGE = env_int("SNAPSHOT_MAX_AGE", 300)
+
+MODELS = (Franchise, Film, TVSeries, Book, Game, Planet, Species, Affiliation)
+
+NULL = -(2 ** 63)  # NULL in an integer column
+
+TESTS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "in": lambda value, wanted: value in wanted,
+    "between": lambda value, bounds: bounds[0] <= value <= bounds[1],
+    "startswith": lambda value, prefix: str(value).lower().startswith(prefix.lower()),
+}
+
+
+class IntColumn:
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = array("q", [NULL if v is None else v for v in values])
+
+    def get(self, i: int):
+        value = self.values[i]
+        return None if value == NULL else value
+
+    def matcher(self, op: str, wanted):
+        """offset -> bool for one ListQuery condition (NULL matches only isnull)"""
+        values = self.values
+        if op == "isnull":
+            return (lambda i: values[i] == NULL) if wanted else (lambda i: values[i] != NULL)
+        test = TESTS[op]
+        if op == "in":
+            wanted = set(wanted)
+        return lambda i: values[i] != NULL and test(values[i], wanted)
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.values)
+
+
+class CodedColumn:
+    """Dictionary-encoded values: codes[i] indexes words, code 0 is NULL"""
+
+    __slots__ = ("codes", "words")
+
+    def __init__(self, values):
+        index = {None: 0}
+        self.words = [None]
+        self.codes = array("I")
+        for value in values:
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(self.words)
+                self.words.append(value)
+            self.codes.append(code)
+
+    def get(self, i: int):
+        return self.words[self.codes[i]]
+
+    def matcher(self, op: str, wanted):
+        codes = self.codes
+        if op == "isnull":
+            return (lambda i: codes[i] == 0) if wanted else (lambda i: codes[i] != 0)
+        test = TESTS[op]
+        matching = {code for code, word in enumerate(self.words) if code and test(word, wanted)}
+        return lambda i: codes[i] in matching
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.codes) + sys.getsizeof(self.words) + sum(map(sys.getsizeof, self.words[1:]))
+
+
+class TableSnapshot:
+    """One table, immutable once built (the sort-order cache aside)"""
+
+    __slots__ = ("name", "pk", "columns", "data", "offsets", "fk", "rows", "version",
+                 "loaded_at", "load_seconds", "lookup_seconds", "_orders")
+
+    def __init__(self, table, rows: Sequence[tuple], version: int):
+        self.name = table.name
+        self.pk = table.primary_key.columns[0].key
+        self.columns = tuple(c.key for c in table.columns)
+        self.rows = len(rows)
+        self.version = version
+        self.data = {}
+        for n, column in enumerate(table.columns):
+            values = [row[n] for row in rows]
+            self.data[column.key] = IntColumn(values) if column.type.python_type is int else CodedColumn(values)
+        self.offsets = {pk: i for i, pk in enumerate(self.data[self.pk].values)}
+        self.fk = {}
+        for column in table.columns:
+            if column.foreign_keys:
+                index = {}
+                for i, value in enumerate(self.data[column.key].values):
+                    if value != NULL:
+                        index.setdefault(value, array("I")).append(i)
+                self.fk[column.key] = index
+        self._orders = {}
+
+    def row(self, i: int, fields: Optional[Sequence[str]] = None) -> dict:
+        data = self.data
+        return {name: data[name].get(i) for name in (fields or self.columns)}
+
+    def get(self, pk_value: int) -> Optional[dict]:
+        i = self.offsets.get(pk_value)
+        return self.row(i) if i is not None else None
+
+    def referencing(self, column: str, value) -> Sequence[int]:
+        """Offsets of the rows whose `column` equals value, in pk order"""
+        index = self.fk.get(column)
+        if index is not None:
+            return index.get(value, ())
+        match = self.data[column].matcher("eq", value)
+        return [i for i in range(self.rows) if match(i)]
+
+    def _order(self, name: str, descending: bool):
+        """(offsets in ?sort order, rank of each offset): value, NULLs last, ties by pk"""
+        order = self._orders.get((name, descending))
+        if order is None:
+            column = self.data[name]
+            present = [i for i in range(self.rows) if column.get(i) is not None]
+            present.sort(key=column.get, reverse=descending)  # stable: ties stay in pk order
+            offsets = array("I", present + [i for i in range(self.rows) if column.get(i) is None])
+            rank = array("I", bytes(4 * self.rows))
+            for position, i in enumerate(offsets):
+                rank[i] = position
+            order = self._orders[(name, descending)] = (offsets, rank)
+        return order
+
+    def _sorted_start(self, name: str, descending: bool, after) -> int:
+        """Position in the sort order of the first row after the cursor [value, pk]"""
+        offsets, rank = self._order(name, descending)
+        value, last_pk = after
+        column, pks = self.data[name], self.data[self.pk].values
+        i = self.offsets.get(last_pk)
+        if i is not None and column.get(i) == value:
+            return rank[i] + 1
+
+        def beyond(i):  # pagination._after_sorted, in memory
+            current = column.get(i)
+            if value is None:
+                return current is None and pks[i] > last_pk
+            if current is None:
+                return True
+            ahead = current < value if descending else current > value
+            return ahead or (current == value and pks[i] > last_pk)
+
+        low, high = 0, len(offsets)
+        while low < high:
+            middle = (low + high) // 2
+            if beyond(offsets[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def page(self, listing, page) -> tuple:
+        """(offsets of the page, next cursor position or None) for a ListQuery"""
+        matchers = [self.data[name].matcher(op, value) for name, op, value in listing.conditions]
+        sort = listing.sort_column.key if listing.sort_column is not None else None
+        if sort is None:
+            candidates = range(self.rows)
+            for name, op, value in listing.conditions:
+                if op == "eq" and name in self.fk:
+                    candidates = self.fk[name].get(value, ())
+                    break
+            start = 0
+            if page.after_pk is not None:
+                first = bisect.bisect_right(self.data[self.pk].values, page.after_pk)
+                start = bisect.bisect_left(candidates, first)
+        else:
+            after = page.after_sorted(listing.sort_column)
+            candidates = self._order(sort, listing.descending)[0]
+            start = self._sorted_start(sort, listing.descending, after) if after is not None else 0
+
+        found = []
+        for position in range(start, len(candidates)):
+            i = candidates[position]
+            if all(match(i) for match in matchers):
+                found.append(i)
+                if len(found) > page.limit:
+                    break
+        if len(found) <= page.limit:
+            return found, None
+        last = found[page.limit - 1]
+        pk = self.data[self.pk].values[last]
+        return found[:page.limit], ([self.data[sort].get(last), pk] if sort else pk)
+
+    @property
+    def nbytes(self) -> int:
+        """Columns plus pk and FK indexes (bytes, as sys.getsizeof counts them)"""
+        size = sum(column.nbytes for column in self.data.values())
+        size += sys.getsizeof(self.offsets) + sum(map(sys.getsizeof, self.offsets))
+        for index in self.fk.values():
+            size += sys.getsizeof(index) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in index.items())
+        return size
+
+    def status(self) -> dict:
+        nbytes = self.nbytes
+        return {
+            "rows": self.rows,
+            "bytes": nbytes,
+            "bytes_per_row": round(nbytes / self.rows, 1) if self.rows else None,
+            "version": self.version,
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1),
+            "load_ms": round(self.load_seconds * 1000, 2),
+            "get_by_id_us": round(self.lookup_seconds * 1e6, 2) if self.lookup_seconds is not None else None,
+        }
+
+
+class Snapshot:
+    """The current TableSnapshot of every catalogue table, reloaded on version change"""
+
+    def __init__(self, models=MODELS, bind=engine):
+        self.models = {model.__tablename__: model for model in models}
+        self.bind = bind
+        self.tables: Dict[str, TableSnapshot] = {}
+        self.reloads = 0
+        self.lookups = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.models
+
+    def _fresh(self, current: Optional[TableSnapshot], version: int) -> bool:
+        return (current is not None and current.version == version
+                and not (MAX_AGE and time.monotonic() - current.loaded_at > MAX_AGE))
+
+    def table(self, name: str) -> TableSnapshot:
+        version = table_versions.version(name)
+        current = self.tables.get(name)
+        if self._fresh(current, version):
+            return current
+        with self._lock:
+            current = self.tables.get(name)
+            if not self._fresh(current, version):
+                current = self._load(name, version)
+                self.tables = {**self.tables, name: current}  # copy-on-write swap
+                self.reloads += 1
+        return current
+
+    def _load(self, name: str, version: int) -> TableSnapshot:
+        table = self.models[name].__table__
+        start = time.perf_counter()
+        with self.bind.connect() as conn:  # the primary: sees the write that bumped the version
+            rows = conn.execute(select(*table.columns).order_by(table.primary_key.columns[0])).all()
+        snapshot = TableSnapshot(table, rows, version)
+        snapshot.load_seconds = time.perf_counter() - start
+        snapshot.loaded_at = time.monotonic()
+
+        sample = list(snapshot.offsets)[:: max(1, snapshot.rows // 1000)]
+        start = time.perf_counter()
+        for pk_value in sample:
+            snapshot.get(pk_value)
+        snapshot.lookup_seconds = (time.perf_counter() - start) / len(sample) if sample else None
+        return snapshot
+
+    def load_all(self) -> dict:
+        """Load every table now (prefork.py, before forking)"""
+        return {name: self.table(name).rows for name in self.models}
+
+    # ------------ routes ------------
+    def _expand(self, snapshot: TableSnapshot, i: int, row: dict, names: Sequence[str]) -> dict:
+        """expand.to_dict, in memory"""
+        relationships = inspect(self.models[snapshot.name]).relationships
+        for name in names:
+            relationship = relationships[name]
+            (local, remote), = relationship.local_remote_pairs
+            target = self.table(relationship.mapper.local_table.name)
+            value = snapshot.data[local.key].get(i)
+            if relationship.uselist:
+                row[name] = [target.row(j) for j in target.referencing(remote.key, value)] if value is not None else []
+            else:
+                row[name] = target.get(value) if value is not None else None
+        return row
+
+    def get(self, name: str, pk_value: int, expand: Sequence[str] = ()) -> Optional[dict]:
+        """get-by-id (plus expansions), or None"""
+        snapshot = self.table(name)
+        self.lookups += 1
+        i = snapshot.offsets.get(pk_value)
+        if i is None:
+            return None
+        row = snapshot.row(i)
+        return self._expand(snapshot, i, row, expand) if expand else row
+
+    def page(self, name: str, listing, page, expand: Sequence[str] = ()) -> dict:
+        """ListQuery.paginate, in memory"""
+        snapshot = self.table(name)
+        self.lookups += 1
+        offsets, next_position = snapshot.page(listing, page)
+        items = [snapshot.row(i, listing.fields) for i in offsets]
+        if expand:
+            items = [self._expand(snapshot, i, row, expand) for i, row in zip(offsets, items)]
+        return page_envelope(items, next_position, page.limit)
+
+    # ------------ aggregates (stats.py shapes) ------------
+    def _grouped(self, name: str, key, total: Optional[str] = None) -> dict:
+        """{group key: [rows, sum of total]} over one table"""
+        snapshot = self.table(name)
+        amounts = snapshot.data[total] if total else None
+        groups = {}
+        for i in range(snapshot.rows):
+            group = groups.setdefault(key(snapshot.data, i), [0, 0])
+            group[0] += 1
+            if amounts is not None:
+                group[1] += amounts.get(i) or 0
+        return groups
+
+    def _franchise_name(self, franchise_id: int) -> Optional[str]:
+        row = self.table("franchise").get(franchise_id)
+        return row["name"] if row else None
+
+    @staticmethod
+    def _share(total: int, grand: int) -> Optional[float]:
+        return round(total / grand, 4) if grand else None
+
+    @staticmethod
+    def _null_id(value: Optional[int]) -> int:
+        return -1 if value is None else value  # stats.py's NULL-group sentinel, sorts first
+
+    def box_office(self, by: str = "franchise") -> List[dict]:
+        """stats.box_office"""
+        def key(data, i):
+            franchise = self._null_id(data["franchise_id"].get(i)) if by != "rating" else None
+            rating = (data["rating"].get(i) or "") if by != "franchise" else None
+            return franchise, rating
+
+        groups = self._grouped("films", key, total="box_office")
+        grand = sum(total for _, total in groups.values())
+        ordered = sorted(groups.items(), key=lambda g: (-g[1][1], g[0][0] or 0, g[0][1] or ""))
+        items = []
+        for (franchise_id, rating), (films, total) in ordered:
+            item = {}
+            if by != "rating":
+                item["franchise_id"] = None if franchise_id == -1 else franchise_id
+                item["franchise"] = self._franchise_name(franchise_id)
+            if by != "franchise":
+                item["rating"] = rating or None
+            item.update(films=films, box_office=total, share=self._share(total, grand),
+                        rank=1 + sum(other > total for _, other in groups.values()))
+            items.append(item)
+        return items
+
+    RELEASE_YEARS = {"books": "publication_year", "games": "release_year", "tv_series": "start_year"}
+
+    def releases(self, kinds: Optional[List[str]] = None) -> List[dict]:
+        """stats.releases"""
+        items = []
+        for kind in sorted(set(kinds or self.RELEASE_YEARS)):
+            column = self.RELEASE_YEARS[kind]
+            groups = self._grouped(kind, lambda data, i: self._null_id(data[column].get(i)))
+            cumulative = 0
+            for year, (count, _) in sorted(groups.items()):
+                cumulative += count
+                items.append({"kind": kind, "year": None if year == -1 else year,
+                              "releases": count, "cumulative": cumulative})
+        return items
+
+    def seasons(self) -> List[dict]:
+        """stats.seasons"""
+        groups = self._grouped("tv_series", lambda data, i: self._null_id(data["franchise_id"].get(i)),
+                               total="num_seasons")
+        grand = sum(total for _, total in groups.values())
+        return [
+            {"franchise_id": None if franchise_id == -1 else franchise_id,
+             "franchise": self._franchise_name(franchise_id),
+             "series": series, "seasons": total, "share": self._share(total, grand)}
+            for franchise_id, (series, total) in sorted(groups.items(), key=lambda g: (-g[1][1], g[0]))
+        ]
+
+    def status(self) -> dict:
+        tables = self.tables
+        total_bytes = sum(t.nbytes for t in tables.values())
+        total_rows = sum(t.rows for t in tables.values())
+        return {
+            "enabled": ENABLED,
+            "max_age_seconds": MAX_AGE,
+            "reloads": self.reloads,
+            "lookups": self.lookups,
+            "rows": total_rows,
+            "bytes": total_bytes,
+            "bytes_per_row": round(total_bytes / total_rows, 1) if total_rows else None,
+            "tables": {name: tables[name].status() for name in sorted(tables)},
+        }
+
+
+store = Snapshot()
@@ -0,0 +1,141 @@
+import asyncio
+import datetime
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import Base, engine, env_bool
+
+# Application startup (FastAPI lifespan).
+#
+# Importing api.py does no database work. At startup the API runs one
+# SELECT against schema_version instead of create_all (which reflects
+# every table, one round-trip each). Schema changes are applied explicitly:
+#
+#   python starwars.py init-db        # create_all + missing indexes + stamp SCHEMA_VERSION
+#   DB_CREATE_ALL=1                   # same, at API startup (dev only)
+#   DB_SCHEMA_CHECK=warn|strict|off   # mismatch: log (default) / refuse to start / skip the query
+#
+# Route families that cost import time and are not needed everywhere can
+# be left out (the bulk of api.py's import is FastAPI building routes):
+#
+#   API_ASYNC_ROUTES=0                # no /async/* routes
+#   API_BATCH_ROUTES=0                # no /<resource>/batch routes
+#
+# A one-line startup report (import time, startup time, schema state) is
+# logged and kept for GET /metrics/startup.
+
+DB_CREATE_ALL = env_bool("DB_CREATE_ALL", False)
+DB_SCHEMA_CHECK = os.getenv("DB_SCHEMA_CHECK", "warn").strip().lower()
+API_ASYNC_ROUTES = env_bool("API_ASYNC_ROUTES", True)
+API_BATCH_ROUTES = env_bool("API_BATCH_ROUTES", True)
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class SchemaMismatch(RuntimeError):
+    pass
+
+
+def create_schema(bind=engine) -> int:
+    """create_all for every model, then stamp the current SCHEMA_VERSION.
+
+    create_all skips the indexes of tables that already exist, so those
+    are created one by one (index_audit.create_indexes) before stamping.
+    """
+    from index_audit import create_indexes
+    from orm_models import SCHEMA_VERSION, SchemaVersion  # registers all models
+
+    Base.metadata.create_all(bind=bind)
+    create_indexes(bind)
+    with bind.begin() as conn:
+        values = {"version": SCHEMA_VERSION, "applied_at": datetime.datetime.utcnow()}
+        if conn.execute(select(SchemaVersion.id).where(SchemaVersion.id == 1)).first():
+            conn.execute(SchemaVersion.__table__.update().where(SchemaVersion.id == 1).values(**values))
+        else:
+            conn.execute(SchemaVersion.__table__.insert().values(id=1, **values))
+    return SCHEMA_VERSION
+
+
+def check_schema(bind=engine, indexes: bool = False) -> dict:
+    """Compare the stamped schema version with the models' SCHEMA_VERSION.
+
+    indexes=True also lists declared indexes missing from the database
+    (one query per table, so not done at API startup).
+    """
+    from orm_models import SCHEMA_VERSION, SchemaVersion
+
+    try:
+        with bind.connect() as conn:
+            stamped = conn.execute(select(SchemaVersion.version).where(SchemaVersion.id == 1)).scalar()
+    except SQLAlchemyError as e:
+        # most likely no schema_version table yet (database predates it)
+        stamped, error = None, str(e).splitlines()[0]
+    else:
+        error = None
+    state = {"expected": SCHEMA_VERSION, "found": stamped, "ok": stamped == SCHEMA_VERSION}
+    if error:
+        state["error"] = error
+    if indexes:
+        from index_audit import missing_indexes
+
+        state["missing_indexes"] = [ix.name for ix in missing_indexes(bind)]
+        state["ok"] = state["ok"] and not state["missing_indexes"]
+    return state
+
+
+def startup(import_seconds: float) -> dict:
+    """Run the startup steps; return the report"""
+    start = time.perf_counter()
+    report = {
+        "import_seconds": round(import_seconds, 4),
+        "database": engine.url.get_backend_name(),
+        "create_all": DB_CREATE_ALL,
+        "schema_check": DB_SCHEMA_CHECK,
+    }
+    if DB_CREATE_ALL:
+        create_schema()
+    if DB_SCHEMA_CHECK != "off":
+        schema = check_schema()
+        report["schema"] = schema
+        if not schema["ok"]:
+            message = (f"schema version {schema['found']} does not match models ({schema['expected']}); "
+                       f"run `python starwars.py init-db`")
+            if DB_SCHEMA_CHECK == "strict":
+                raise SchemaMismatch(message)
+            logger.warning(message)
+    report["startup_seconds"] = round(time.perf_counter() - start, 4)
+    logger.info("startup: import %.1f ms, startup %.1f ms, schema %s",
+                report["import_seconds"] * 1000, report["startup_seconds"] * 1000,
+                report.get("schema", {}).get("ok", "unchecked"))
+    return report
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """FastAPI lifespan: report in app.state.startup_report, pools disposed on shutdown"""
+    import blobs
+    from cache import response_cache
+    from changes import feed
+    from replicas import replica_set
+
+    response_cache.refuse_unshared()  # uvicorn --workers N without Redis (cache.py)
+    app.state.startup_report = startup(getattr(app.state, "import_seconds", 0.0))
+    replica_set.start()
+    await feed.start()
+    # per-row invalidation of blobs.py bodies from every worker's writes
+    follower = asyncio.create_task(blobs.follow_changes()) if blobs.ENABLED else None
+    yield
+    if follower is not None:
+        follower.cancel()
+        try:
+            await follower
+        except asyncio.CancelledError:
+            pass
+    await feed.stop()
+    replica_set.stop()
+    engine.dispose()
@@ -0,0 +1,238 @@
+# Command line tools.
+#
+#   python starwars.py init-db                       # create tables and indexes, stamp the schema version
+#   python starwars.py load data/                    # every <table>.csv/.jsonl in data/
+#   python starwars.py load people.csv characters.jsonl --batch-size 10000
+#   python starwars.py load data/ --rebuild-indexes  # drop/recreate secondary indexes around the load
+#   python starwars.py generate out/ --characters 1000000 --people 200000
+#   python starwars.py explain --threshold 1000      # EXPLAIN every API query, fail on full scans
+#   python starwars.py explain --create-indexes      # add missing declared indexes, then EXPLAIN
+#   python starwars.py overview rebuild              # (re)build character_overview_mat + triggers
+#   python starwars.py overview status               # staleness of character_overview_mat
+#   python starwars.py search rebuild                # (re)build the /search index + sync triggers
+#   python starwars.py stats rebuild                 # (re)build the /stats rollup + triggers
+#   python starwars.py changes install               # change_log + triggers behind /changes
+#   python starwars.py changes prune --keep 100000   # drop all but the newest changes
+#   python starwars.py serve --workers 4 --port 8000 # pre-forked, pre-warmed workers (prefork.py)
+
+import argparse
+import os
+import sys
+import time
+
+
+def cmd_init_db(args):
+    from startup import check_schema, create_schema
+
+    before = check_schema(indexes=True)
+    version = create_schema()
+    print(f"schema version {before['found']} -> {version}")
+    if before.get("missing_indexes"):
+        print(f"created {len(before['missing_indexes'])} missing indexes: {', '.join(before['missing_indexes'])}")
+    after = check_schema(indexes=True)
+    if not after["ok"]:
+        print(f"schema check failed: {after}")
+        return 1
+    return 0
+
+
+def cmd_load(args):
+    from loader import Loader, LOAD_ORDER, LoadError, find_table_files, read_rows
+    from startup import create_schema
+
+    files = {}
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.update(find_table_files(path))
+        else:
+            table = os.path.basename(path).split(".")[0]
+            if table not in LOAD_ORDER:
+                print(f"Cannot tell which table {path} is for (expected <table>.csv/.jsonl)")
+                return 2
+            files[table] = path
+    if not files:
+        print("Nothing to load.")
+        return 2
+
+    create_schema()
+    loader = Loader(batch_size=args.batch_size, rebuild_indexes=args.rebuild_indexes)
+    start = time.perf_counter()
+    try:
+        reports = loader.load_tables({t: read_rows(p) for t, p in files.items()})
+    except LoadError as e:
+        print(f"Load failed: {e}")
+        return 1
+
+    total = 0
+    for report in reports:
+        print(report)
+        for error in report.errors:
+            print(f"    {error}")
+        total += report.read
+    elapsed = time.perf_counter() - start
+    print(f"{'total':<13} {total:>9} read in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)")
+    return 1 if any(r.rejected for r in reports) else 0
+
+
+def cmd_generate(args):
+    from datagen import DEFAULT_SIZES, generate
+
+    sizes = {}
+    for table, default in DEFAULT_SIZES.items():
+        explicit = getattr(args, table)
+        sizes[table] = explicit if explicit is not None else max(1, int(default * args.scale))
+    start = time.perf_counter()
+    written = generate(args.out_dir, sizes, seed=args.seed, skew=args.skew)
+    for table, count in written.items():
+        print(f"{table:<13} {count:>10} rows")
+    print(f"written to {args.out_dir} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def cmd_explain(args):
+    from index_audit import audit, create_indexes
+
+    if args.create_indexes:
+        created = create_indexes()
+        print(f"created {len(created)} missing indexes: {', '.join(created) or '-'}\n")
+    return 1 if audit(threshold=args.threshold, verbose=args.verbose) else 0
+
+
+def cmd_overview(args):
+    import materialized
+
+    if args.action == "status":
+        for key, value in materialized.status().items():
+            print(f"{key:<26} {value}")
+        return 0
+    if args.action == "drop-triggers":
+        # e.g. before a large `load`; run `overview rebuild` afterwards
+        materialized.uninstall()
+        print("triggers dropped; character_overview_mat will go stale until `overview rebuild`")
+        return 0
+    start = time.perf_counter()
+    materialized.install()
+    rows = materialized.rebuild()
+    print(f"character_overview_mat rebuilt: {rows} rows in {time.perf_counter() - start:.2f}s, triggers installed")
+    return 0
+
+
+def cmd_search(args):
+    import search
+
+    if args.action == "status":
+        for key, value in search.status().items():
+            print(f"{key:<14} {value}")
+        return 0
+    start = time.perf_counter()
+    documents = search.rebuild()
+    print(f"search index rebuilt: {documents} documents in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def cmd_stats(args):
+    import stats
+
+    if args.action == "status":
+        for key, value in stats.status().items():
+            print(f"{key:<26} {value}")
+        return 0
+    if args.action == "drop-triggers":
+        stats.uninstall()
+        print("triggers dropped; stats_rollup will go stale until `stats rebuild`")
+        return 0
+    start = time.perf_counter()
+    stats.install()
+    groups = stats.rebuild()
+    print(f"stats_rollup rebuilt: {groups} groups in {time.perf_counter() - start:.2f}s, triggers installed")
+    return 0
+
+
+def cmd_changes(args):
+    import changes
+
+    if args.action == "status":
+        for key, value in changes.status().items():
+            print(f"{key:<16} {value}")
+        return 0
+    if args.action == "drop-triggers":
+        changes.uninstall()
+        print("triggers dropped; writes are no longer recorded in change_log")
+        return 0
+    if args.action == "prune":
+        print(f"change_log pruned: {changes.prune(args.keep)} rows deleted, newest {args.keep} kept")
+        return 0
+    changes.install()
+    print(f"change_log ready, {len(changes.trigger_definitions())} triggers installed")
+    return 0
+
+
+def cmd_serve(args):
+    import prefork
+
+    workers = args.workers if args.workers is not None else prefork.WORKERS
+    return prefork.serve(workers, args.host, args.port, args.log_level, args.access_log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="starwars")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    init = sub.add_parser("init-db", help="Create missing tables/indexes and stamp the schema version")
+    init.set_defaults(func=cmd_init_db)
+
+    load = sub.add_parser("load", help="Bulk load CSV/JSONL files (one per table)")
+    load.add_argument("paths", nargs="+", help="directories and/or <table>.csv|.jsonl files")
+    load.add_argument("--batch-size", type=int, default=5000)
+    load.add_argument("--rebuild-indexes", action="store_true",
+                      help="drop secondary (non-FK) indexes before each table and rebuild after")
+    load.set_defaults(func=cmd_load)
+
+    gen = sub.add_parser("generate", help="Write a synthetic dataset (<table>.jsonl) for `load`")
+    gen.add_argument("out_dir")
+    gen.add_argument("--scale", type=float, default=1.0, help="multiply the default table sizes")
+    gen.add_argument("--seed", type=int, default=42)
+    gen.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for species/affiliation/franchise")
+    for table in ("franchise", "species", "affiliations", "people", "planets",
+                  "films", "tv_series", "books", "games", "characters"):
+        gen.add_argument(f"--{table.replace('_', '-')}", dest=table, type=int, help=f"rows in {table}")
+    gen.set_defaults(func=cmd_generate)
+
+    exp = sub.add_parser("explain", help="EXPLAIN the API's queries and fail on full table scans")
+    exp.add_argument("--threshold", type=int, default=1000, help="row count above which a full scan fails")
+    exp.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    exp.add_argument("--create-indexes", action="store_true",
+                     help="first create the orm_models.py indexes missing from existing tables")
+    exp.set_defaults(func=cmd_explain)
+
+    ov = sub.add_parser("overview", help="Materialized character_overview maintenance")
+    ov.add_argument("action", choices=("rebuild", "status", "drop-triggers"))
+    ov.set_defaults(func=cmd_overview)
+
+    se = sub.add_parser("search", help="Full-text index behind GET /search")
+    se.add_argument("action", choices=("rebuild", "status"))
+    se.set_defaults(func=cmd_search)
+
+    st = sub.add_parser("stats", help="Rollup table behind GET /stats/*")
+    st.add_argument("action", choices=("rebuild", "status", "drop-triggers"))
+    st.set_defaults(func=cmd_stats)
+
+    ch = sub.add_parser("changes", help="change_log table behind GET /changes")
+    ch.add_argument("action", choices=("install", "status", "prune", "drop-triggers"))
+    ch.add_argument("--keep", type=int, default=100000, help="prune: changes to keep")
+    ch.set_defaults(func=cmd_changes)
+
+    sv = sub.add_parser("serve", help="Production server: N pre-forked workers sharing warmed caches")
+    sv.add_argument("--workers", type=int, default=None, help="default: SERVE_WORKERS, else one per core")
+    sv.add_argument("--host", default="127.0.0.1")
+    sv.add_argument("--port", type=int, default=8000)
+    sv.add_argument("--log-level", default="info")
+    sv.add_argument("--access-log", action="store_true")
+    sv.set_defaults(func=cmd_serve)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
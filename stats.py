@@ -0,0 +1,240 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Optional
+
+from sqlalchemy import BigInteger, Integer, String, func, select, text
+
+import triggers
+from database import age_seconds, engine
+from orm_models import Affiliation, Franchise, Species, StatsRollup
+
+# Aggregates behind /stats/*.
+#
+#   python starwars.py stats rebuild   # create stats_rollup + triggers, full refresh
+#   python starwars.py stats status    # rollup vs live GROUP BY, per metric
+#
+# stats_rollup holds one row per (metric, group) with a row count (item_count)
+# and a column sum (total). Triggers (triggers.py) on the source tables add
+# or subtract the written row, so a write costs O(1) and a dashboard read
+# costs O(groups) instead of a scan of films / books / games / tv_series /
+# characters. A row joins its group
+# with one upsert (ON DUPLICATE KEY UPDATE on MySQL, ON CONFLICT DO UPDATE
+# on SQLite), so two writes opening the same new group cannot collide on
+# the primary key. init-db creates the table empty; the routes read it
+# as-is, so run `stats rebuild` once (status reports any drift). Each
+# /stats route takes ?source=live to run the same aggregation straight off
+# the source tables (GROUP BY + window functions either way).
+
+METRICS = ("box_office", "releases", "seasons", "characters_by_affiliation", "characters_by_species")
+
+
+@dataclass
+class Rollup:
+    metric: str
+    table: str
+    group_id: str                       # integer column, NULL stored as -1
+    group_label: Optional[str] = None   # text column, NULL stored as ''
+    label: str = ""                     # constant group_label if no column
+    total: Optional[str] = None         # column summed into total
+
+    def keys(self, row: str):
+        """SQL for (group_id, group_label, value) of one row (NEW / OLD / table name)"""
+        group_id = f"COALESCE({row}.{self.group_id}, -1)"
+        label = f"COALESCE({row}.{self.group_label}, '')" if self.group_label else f"'{self.label}'"
+        value = f"COALESCE({row}.{self.total}, 0)" if self.total else "0"
+        return group_id, label, value
+
+    def live_sql(self) -> str:
+        group_id, label, value = self.keys(self.table)
+        group_by = f"{group_id}, {label}" if self.group_label else group_id
+        return (f"SELECT '{self.metric}' AS metric, {group_id} AS group_id, {label} AS group_label, "
+                f"COUNT(*) AS item_count, SUM({value}) AS total FROM {self.table} GROUP BY {group_by}")
+
+
+ROLLUPS = [
+    Rollup("box_office", "films", "franchise_id", group_label="rating", total="box_office"),
+    # films have no year column
+    Rollup("releases", "books", "publication_year", label="books"),
+    Rollup("releases", "games", "release_year", label="games"),
+    Rollup("releases", "tv_series", "start_year", label="tv_series"),
+    Rollup("seasons", "tv_series", "franchise_id", total="num_seasons"),
+    Rollup("characters_by_affiliation", "characters", "affiliation_id"),
+    Rollup("characters_by_species", "characters", "species_id"),
+]
+
+TABLE = StatsRollup.__tablename__
+SOURCE_TABLES = tuple(dict.fromkeys(r.table for r in ROLLUPS))
+
+
+def _match(rollup: Rollup, row: str) -> str:
+    group_id, label, _ = rollup.keys(row)
+    return f"metric = '{rollup.metric}' AND group_id = {group_id} AND group_label = {label}"
+
+
+def _add(rollup: Rollup, row: str, dialect: str) -> str:
+    """SQL adding one row to its group (created on first use)"""
+    group_id, label, value = rollup.keys(row)
+    increment = f"item_count = item_count + 1, total = total + {value}, updated_at = CURRENT_TIMESTAMP"
+    if dialect in ("mysql", "mariadb"):
+        conflict = f"ON DUPLICATE KEY UPDATE {increment}"
+    else:
+        conflict = f"ON CONFLICT (metric, group_id, group_label) DO UPDATE SET {increment}"
+    return (f"INSERT INTO {TABLE} (metric, group_id, group_label, item_count, total, updated_at) "
+            f"VALUES ('{rollup.metric}', {group_id}, {label}, 1, {value}, CURRENT_TIMESTAMP) {conflict};")
+
+
+def _subtract(rollup: Rollup, row: str) -> str:
+    _, _, value = rollup.keys(row)
+    return (f"UPDATE {TABLE} SET item_count = item_count - 1, total = total - {value}, updated_at = CURRENT_TIMESTAMP "
+            f"WHERE {_match(rollup, row)}; "
+            f"DELETE FROM {TABLE} WHERE {_match(rollup, row)} AND item_count <= 0;")
+
+
+def trigger_definitions(dialect: str = engine.dialect.name):
+    """(name, CREATE TRIGGER sql) for every trigger keeping stats_rollup current"""
+    definitions = []
+    for table in SOURCE_TABLES:
+        rollups = [r for r in ROLLUPS if r.table == table]
+        add = " ".join(_add(r, "NEW", dialect) for r in rollups)
+        subtract = " ".join(_subtract(r, "OLD") for r in rollups)
+        for suffix, event, body in (("ins", "AFTER INSERT", add),
+                                    ("upd", "AFTER UPDATE", subtract + " " + add),
+                                    ("del", "AFTER DELETE", subtract)):
+            definitions.append(triggers.row_trigger(f"trg_stats_{table}_{suffix}", event, table, body))
+    return definitions
+
+
+def install(bind=engine):
+    """Create the table (if missing) and (re)create its triggers"""
+    StatsRollup.__table__.create(bind, checkfirst=True)
+    with bind.begin() as conn:
+        triggers.replace(conn, trigger_definitions(bind.dialect.name))
+
+
+def uninstall(bind=engine):
+    triggers.drop(bind, trigger_definitions(bind.dialect.name))
+
+
+def rebuild(bind=engine) -> int:
+    """Full refresh in one transaction; returns the group count"""
+    with bind.begin() as conn:
+        conn.execute(text(f"DELETE FROM {TABLE}"))
+        for rollup in ROLLUPS:
+            conn.execute(text(
+                f"INSERT INTO {TABLE} (metric, group_id, group_label, item_count, total, updated_at) "
+                f"SELECT metric, group_id, group_label, item_count, total, CURRENT_TIMESTAMP FROM ({rollup.live_sql()}) live"
+            ))
+        return conn.execute(select(func.count()).select_from(StatsRollup)).scalar()
+
+
+def _source(metric: str, source: str):
+    """(group_id, group_label, item_count, total) rows of one metric, from the rollup or live"""
+    if source == "live":
+        sql = " UNION ALL ".join(r.live_sql() for r in ROLLUPS if r.metric == metric)
+        return text(sql).columns(metric=String, group_id=Integer, group_label=String,
+                                 item_count=BigInteger, total=BigInteger).subquery("r")
+    r = StatsRollup.__table__
+    return select(r.c.group_id, r.c.group_label, r.c.item_count, r.c.total).where(r.c.metric == metric).subquery("r")
+
+
+def _rows(stmt, bind) -> List[dict]:
+    with bind.connect() as conn:
+        rows = [dict(row) for row in conn.execute(stmt).mappings()]
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, Decimal):  # MySQL SUM()
+                value = float(value) if key == "share" else int(value)
+            if key == "share" and value is not None:
+                value = round(value, 4)
+            elif (key.endswith("_id") or key == "year") and value == -1:
+                value = None  # NULL-group sentinels
+            elif key in ("rating", "kind") and value == "":
+                value = None
+            row[key] = value
+    return rows
+
+
+def _share(total):
+    """total / grand total over all groups (window over the grouped rows)"""
+    return (total * 1.0 / func.nullif(func.sum(total).over(), 0)).label("share")
+
+
+def box_office(by: str = "franchise", source: str = "rollup", bind=engine) -> List[dict]:
+    """Films and box office per franchise, per rating, or per (franchise, rating)"""
+    r = _source("box_office", source)
+    films, total = func.sum(r.c.item_count), func.sum(r.c.total)
+    columns, keys = [], []
+    stmt_from = r
+    if by in ("franchise", "franchise_rating"):
+        stmt_from = r.outerjoin(Franchise, Franchise.franchise_id == r.c.group_id)
+        columns += [r.c.group_id.label("franchise_id"), Franchise.name.label("franchise")]
+        keys += [r.c.group_id, Franchise.name]
+    if by in ("rating", "franchise_rating"):
+        columns.append(r.c.group_label.label("rating"))
+        keys.append(r.c.group_label)
+    stmt = (select(*columns, films.label("films"), total.label("box_office"), _share(total),
+                   func.rank().over(order_by=total.desc()).label("rank"))
+            .select_from(stmt_from).group_by(*keys).order_by(total.desc(), *keys))
+    return _rows(stmt, bind)
+
+
+def releases(kinds: Optional[List[str]] = None, source: str = "rollup", bind=engine) -> List[dict]:
+    """Releases per (kind, year) with the running total per kind"""
+    r = _source("releases", source)
+    count = func.sum(r.c.item_count)
+    stmt = (select(r.c.group_label.label("kind"), r.c.group_id.label("year"), count.label("releases"),
+                   func.sum(count).over(partition_by=r.c.group_label, order_by=r.c.group_id).label("cumulative"))
+            .group_by(r.c.group_label, r.c.group_id).order_by(r.c.group_label, r.c.group_id))
+    if kinds:
+        stmt = stmt.where(r.c.group_label.in_(kinds))
+    return _rows(stmt, bind)
+
+
+def seasons(source: str = "rollup", bind=engine) -> List[dict]:
+    """TV series and seasons per franchise"""
+    r = _source("seasons", source)
+    series, total = func.sum(r.c.item_count), func.sum(r.c.total)
+    stmt = (select(r.c.group_id.label("franchise_id"), Franchise.name.label("franchise"),
+                   series.label("series"), total.label("seasons"), _share(total))
+            .select_from(r.outerjoin(Franchise, Franchise.franchise_id == r.c.group_id))
+            .group_by(r.c.group_id, Franchise.name).order_by(total.desc(), r.c.group_id))
+    return _rows(stmt, bind)
+
+
+CHARACTER_GROUPS = {
+    "affiliation": ("characters_by_affiliation", Affiliation, Affiliation.affiliation_id),
+    "species": ("characters_by_species", Species, Species.species_id),
+}
+
+
+def characters(by: str = "affiliation", source: str = "rollup", bind=engine) -> List[dict]:
+    """Characters per affiliation or species"""
+    metric, model, pk = CHARACTER_GROUPS[by]
+    r = _source(metric, source)
+    count = func.sum(r.c.item_count)
+    stmt = (select(r.c.group_id.label(f"{by}_id"), model.name.label(by), count.label("characters"), _share(count),
+                   func.rank().over(order_by=count.desc()).label("rank"))
+            .select_from(r.outerjoin(model, pk == r.c.group_id))
+            .group_by(r.c.group_id, model.name).order_by(count.desc(), r.c.group_id))
+    return _rows(stmt, bind)
+
+
+def status(bind=engine) -> dict:
+    """Per metric: rollup groups, groups that differ from the live GROUP BY, last trigger/refresh age.
+
+    drift_groups is non-zero only if writes bypassed the triggers (triggers
+    dropped, or rows changed before `stats rebuild` installed them).
+    """
+    report = {}
+    with bind.connect() as conn:
+        for metric in METRICS:
+            rollup = {(g, l): (i, t) for g, l, i, t in conn.execute(select(_source(metric, "rollup")))}
+            live = {(g, l): (i, t) for g, l, i, t in conn.execute(
+                select(*[c for c in _source(metric, "live").c if c.key != "metric"]))}
+            report[metric] = {
+                "groups": len(rollup),
+                "drift_groups": sum(rollup.get(k) != v for k, v in live.items()) + len(rollup.keys() - live.keys()),
+            }
+        newest = conn.execute(select(func.max(StatsRollup.updated_at))).scalar()
+        report["last_update_age_seconds"] = age_seconds(conn, newest)
+    return report
@@ -0,0 +1,56 @@
+# One throwaway SQLite database for the whole test run: the modules read
+# DATABASE_URL / CACHE_BACKEND once, at import, so every test file shares it
+# and imports the app's modules inside the tests, after the `app` fixture.
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    path = tmp_path_factory.mktemp("starwars") / "sw.sqlite"
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["DB_ECHO"] = "0"
+    os.environ["CACHE_BACKEND"] = "off"  # count real queries, not cache hits
+
+    from loader import Loader
+    from startup import create_schema
+
+    create_schema()
+    Loader().load_tables({
+        "franchise": [{"name": f"Franchise {i}"} for i in range(60)],
+        "species": [{"name": "Human", "classification": "Mammal"}, {"name": "Droid", "classification": "Artificial"}],
+        "affiliations": [{"name": "Rebel Alliance"}, {"name": "Galactic Empire"}],
+        "people": [{"name": f"Person {i}"} for i in range(60)],
+        "films": [{"franchise": f"Franchise {i % 60}", "rating": "PG", "box_office": i} for i in range(120)],
+        "tv_series": [{"franchise": f"Franchise {i % 60}", "title": f"Series {i}"} for i in range(60)],
+        "books": [{"franchise": f"Franchise {i % 60}", "title": f"Book {i}"} for i in range(60)],
+        "games": [{"franchise": f"Franchise {i % 60}", "title": f"Game {i}"} for i in range(60)],
+        "characters": [{"name": f"Character {i}", "person": f"Person {i}", "species": "Human" if i % 2 else "Droid",
+                        "affiliation": "Rebel Alliance" if i % 3 else "Galactic Empire"} for i in range(60)],
+    })
+
+    from api import app
+    return app
+
+
+@pytest.fixture
+def call(app):
+    """call(method, url, **kwargs) -> httpx response, in-process through ASGI"""
+    import httpx
+
+    def send(method: str, url: str, **kwargs):
+        async def request():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.request(method, url, **kwargs)
+
+        return asyncio.run(request())
+
+    return send
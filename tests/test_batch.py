@@ -0,0 +1,33 @@
+# Batch routes (batch.py) against the conftest.py database.
+
+from sqlalchemy import text
+
+
+def test_batch_delete_leaves_no_dangling_foreign_keys(call):
+    from database import engine
+    from etag import table_versions
+
+    created = call("POST", "/people/batch", json=[{"name": "Batch Person A"}, {"name": "Batch Person B"}]).json()
+    ids = [row["person_id"] for row in created["items"]]
+    response = call("POST", "/characters/batch", json=[
+        {"name": f"Batch Character {i}", "person_id": person_id, "species_id": 1, "affiliation_id": 1}
+        for i, person_id in enumerate(ids)
+    ])
+    assert response.json()["created"] == 2
+
+    before = {t: table_versions.version(t) for t in ("characters", "films")}
+    response = call("DELETE", "/people/batch", json={"ids": ids + [10 ** 9]})
+    assert response.status_code == 200, response.text
+    assert response.json()["deleted"] == sorted(ids)
+    assert response.json()["not_found"] == [10 ** 9]
+
+    with engine.connect() as conn:
+        dangling = conn.execute(text(
+            "SELECT count(*) FROM characters c LEFT JOIN people p ON p.person_id = c.person_id "
+            "WHERE c.person_id IS NOT NULL AND p.person_id IS NULL")).scalar()
+        nulled = conn.execute(text(
+            "SELECT count(*) FROM characters WHERE name LIKE 'Batch Character %' AND person_id IS NULL")).scalar()
+    assert dangling == 0
+    assert nulled == 2
+    assert table_versions.version("characters") == before["characters"] + 1  # rows changed
+    assert table_versions.version("films") == before["films"]                # not a child of people
@@ -0,0 +1,44 @@
+# Response cache (cache.py): writes invalidate, per-process counters are
+# refused when several workers would each keep their own.
+
+import pytest
+
+
+@pytest.fixture
+def memory_cache(app, monkeypatch):
+    import api
+    from cache import MemoryBackend, ResponseCache
+
+    response_cache = ResponseCache(MemoryBackend())
+    monkeypatch.setattr(api, "response_cache", response_cache)
+    return response_cache
+
+
+def test_write_invalidates_cached_list(call, memory_cache):
+    first = call("GET", "/species?limit=100").json()
+    assert call("GET", "/species?limit=100").json() == first
+    assert memory_cache.hits == 1
+
+    created = call("POST", "/species", json={"name": "Wookiee", "classification": "Mammal"}).json()
+    names = [s["name"] for s in call("GET", "/species?limit=100").json()["items"]]
+    assert "Wookiee" in names
+    assert memory_cache.misses == 2
+
+    call("DELETE", f"/species/{created['species_id']}")
+    names = [s["name"] for s in call("GET", "/species?limit=100").json()["items"]]
+    assert "Wookiee" not in names
+
+
+def test_per_process_counters_refused_with_several_workers(app, monkeypatch):
+    import cache
+    from cache import MemoryBackend, ResponseCache
+
+    monkeypatch.setattr(cache, "several_workers", lambda: True)
+    assert not ResponseCache(MemoryBackend()).refuse_unshared()
+
+    shared = MemoryBackend()
+    shared.share_counters(cache.SharedCounters(["species:gen"]))
+    assert ResponseCache(shared).refuse_unshared()
+
+    monkeypatch.setattr(cache, "several_workers", lambda: False)
+    assert ResponseCache(MemoryBackend()).refuse_unshared()
@@ -0,0 +1,18 @@
+# Conditional GET (etag.py): 304s only while every worker sees the same
+# version counters.
+
+
+def test_if_modified_since_and_if_none_match(call, monkeypatch):
+    import cache
+
+    first = call("GET", "/films/1")
+    validators = {"if-none-match": first.headers["etag"]}
+    assert call("GET", "/films/1", headers=validators).status_code == 304
+    validators = {"if-modified-since": first.headers["last-modified"]}
+    assert call("GET", "/films/1", headers=validators).status_code == 304
+
+    # in-process counters and several workers: another worker's write may be missing here
+    monkeypatch.setattr(cache, "several_workers", lambda: True)
+    assert call("GET", "/films/1", headers=validators).status_code == 200
+    validators = {"if-none-match": first.headers["etag"]}
+    assert call("GET", "/films/1", headers=validators).status_code == 200
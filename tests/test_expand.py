@@ -0,0 +1,65 @@
+# ?expand= costs a fixed number of SQL statements whatever the page size
+# (expand.py): counted with an engine before_cursor_execute listener on the
+# throwaway SQLite database from conftest.py.
+#
+#   python -m pytest tests/
+
+import asyncio
+
+import pytest
+
+PAGE_SIZES = (5, 20, 60)
+
+
+def count_statements(app, url: str):
+    """(statements, response body) for one GET"""
+    import httpx
+    from sqlalchemy import event
+
+    from database import engine
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def get():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get(url)  # warm-up: pool connect, mapper setup
+            event.listen(engine, "before_cursor_execute", count)
+            try:
+                return await client.get(url)
+            finally:
+                event.remove(engine, "before_cursor_execute", count)
+
+    response = asyncio.run(get())
+    assert response.status_code == 200, response.text
+    return len(statements), response.json()
+
+
+@pytest.mark.parametrize("path, extra", [
+    ("/characters?expand=person", 0),                           # joinedload: same SELECT
+    ("/characters?expand=person,species,affiliation", 0),
+    ("/franchise?expand=films", 1),                             # selectinload: one IN query
+    ("/franchise?expand=films,tv_series,books,games", 4),
+])
+def test_expand_statement_count_is_independent_of_page_size(app, path, extra):
+    base = path.split("?")[0]
+    for limit in PAGE_SIZES:
+        plain, _ = count_statements(app, f"{base}?limit={limit}")
+        expanded, body = count_statements(app, f"{path}&limit={limit}")
+        assert len(body["items"]) == limit
+        assert expanded == plain + extra, f"{path}&limit={limit}: {expanded} statements, {plain} without expand"
+
+
+def test_expanded_rows_are_inlined(app):
+    _, body = count_statements(app, "/characters?expand=person,species,affiliation&limit=3")
+    for item in body["items"]:
+        assert item["person"]["person_id"] == item["person_id"]
+        assert item["species"]["species_id"] == item["species_id"]
+        assert item["affiliation"]["affiliation_id"] == item["affiliation_id"]
+
+    _, body = count_statements(app, "/franchise?expand=films&limit=3")
+    for item in body["items"]:
+        assert [film["franchise_id"] for film in item["films"]] == [item["franchise_id"]] * 2
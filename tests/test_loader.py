@@ -0,0 +1,13 @@
+# Bulk loader (loader.py) on the conftest.py database.
+
+
+def test_non_integral_numbers_are_rejected_not_truncated(app):
+    from loader import Loader
+
+    report = Loader().load_table("books", [
+        {"title": "Heir to the Empire", "franchise": "Franchise 1", "publication_year": 1991.0},
+        {"title": "Dark Force Rising", "franchise": "Franchise 1", "publication_year": 1992.7},
+        {"title": "The Last Command", "franchise": "Franchise 1", "publication_year": "1993.5"},
+    ])
+    assert (report.inserted, report.rejected) == (1, 2)
+    assert "row 2: publication_year: expected a whole number, got 1992.7" in report.errors
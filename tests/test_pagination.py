@@ -0,0 +1,23 @@
+# Keyset cursors (pagination.py): anything we did not hand out is a 400.
+
+import base64
+import json
+
+import pytest
+
+
+def cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_sorted_cursor_round_trip(call):
+    first = call("GET", "/films", params={"sort": "box_office", "limit": 5}).json()
+    second = call("GET", "/films", params={"sort": "box_office", "limit": 5, "after": first["next_cursor"]}).json()
+    assert [f["box_office"] for f in first["items"] + second["items"]] == list(range(10))
+
+
+@pytest.mark.parametrize("value", [[{"a": 1}, 5], [[1], 5], ["100", 5], [True, 5], [1, True], [1, "5"]])
+def test_crafted_sorted_cursor_is_rejected(call, value):
+    response = call("GET", "/films", params={"sort": "box_office", "after": cursor(value)})
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "Invalid cursor"
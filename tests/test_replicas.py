@@ -0,0 +1,25 @@
+# Replica routing (replicas.py): recent writes, not process start, send reads to the primary.
+
+import time
+from types import SimpleNamespace
+
+
+def test_reads_go_to_the_primary_only_after_a_recent_write(app):
+    import replicas
+    from etag import table_versions
+
+    replica = SimpleNamespace(name="replica-1", engine=object())
+
+    def node_after(last_write):
+        route = replicas._Route(replica)
+        token = replicas._current_route.set(route)
+        try:
+            replicas.read_primary_if_modified(last_write)
+        finally:
+            replicas._current_route.reset(token)
+        return route.node
+
+    assert table_versions.last_write(["planets"]) == 0  # no API write yet: boot time does not count
+    assert node_after(table_versions.last_write(["planets"])) == "replica-1"
+    assert node_after(time.time()) == "primary"
+    assert node_after(time.time() - replicas.READ_YOUR_WRITES - 2) == "replica-1"
@@ -0,0 +1,32 @@
+# Search (search.py) on the conftest.py database.
+
+
+def test_trailing_single_letter_is_a_prefix(call):
+    import search
+
+    search.rebuild()
+    call("POST", "/people", json={"name": "Timothy Zahn"})
+    for q in ("timothy z", "timothy za", "timothy zahn"):
+        titles = [item["title"] for item in call("GET", "/search", params={"q": q}).json()["items"]]
+        assert "Timothy Zahn" in titles, q
+    # a lone letter before the last term still has to be a whole word
+    assert call("GET", "/search", params={"q": "t zahn"}).json()["items"] == []
+
+
+def test_source_vocabulary_reads_only_rows_written_since(call):
+    import changes
+    from database import engine
+    from search import SourceVocabulary
+
+    changes.install()
+    vocabulary = SourceVocabulary(engine)
+    vocabulary.load()
+    assert not vocabulary.starting_with("mitthrawnuruodo")
+
+    call("POST", "/people", json={"name": "Mitthrawnuruodo"})
+    reads = []
+    add = vocabulary._add
+    vocabulary._add = lambda conn, source, pks=None: (reads.append((source.table, pks)), add(conn, source, pks))
+    vocabulary.load()
+    assert [w for w, _ in vocabulary.starting_with("mitthrawnuruodo")] == ["mitthrawnuruodo"]
+    assert len(reads) == 1 and reads[0][0] == "people" and len(reads[0][1]) == 1
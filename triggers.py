@@ -0,0 +1,41 @@
+from typing import Iterable, Tuple
+
+# Row-level AFTER INSERT/UPDATE/DELETE triggers behind materialized.py,
+# stats.py, search.py (SQLite) and changes.py.
+#
+# A trigger runs in the writing transaction and fires for every writer:
+# the API routes, the Core bulk writes of batch.py and loader.py, /async
+# and manual SQL, which ORM events would miss. The CREATE TRIGGER text
+# below runs unchanged on MySQL and SQLite (a BEGIN ... END body; MySQL
+# takes the whole statement through exec_driver_sql, no DELIMITER needed).
+#
+# Each module builds its (name, CREATE TRIGGER sql) list and installs it
+# with replace() / drop() from here.
+
+
+def row_trigger(name: str, event: str, table: str, body: str) -> Tuple[str, str]:
+    """(name, CREATE TRIGGER sql); event: AFTER INSERT / AFTER UPDATE / AFTER DELETE"""
+    return name, f"CREATE TRIGGER {name} {event} ON {table} FOR EACH ROW BEGIN {body} END"
+
+
+def replace(conn, definitions: Iterable[Tuple[str, str]]):
+    """Drop and recreate each trigger, in the caller's transaction"""
+    for name, ddl in definitions:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        conn.exec_driver_sql(ddl)
+
+
+def drop(bind, definitions: Iterable[Tuple[str, str]]):
+    with bind.begin() as conn:
+        for name, _ in definitions:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def installed(conn, prefix: str) -> int:
+    """Number of triggers in the database whose name starts with prefix"""
+    if conn.dialect.name == "sqlite":
+        sql = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?"
+    else:
+        sql = ("SELECT COUNT(*) FROM information_schema.triggers "
+               "WHERE trigger_schema = DATABASE() AND trigger_name LIKE %s")
+    return conn.exec_driver_sql(sql, (prefix + "%",)).scalar()